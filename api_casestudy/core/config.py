@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from functools import lru_cache
+from typing import Literal
 
 from pydantic import Field
 from pydantic_settings import BaseSettings
@@ -26,6 +27,44 @@ class Settings(BaseSettings):
         alias="STATE_DB",
         description="Tên MongoDB database dùng để lưu runtime state/logs.",
     )
+    state_persistence_mode: Literal["delta", "snapshot"] = Field(
+        default="delta",
+        alias="STATE_PERSISTENCE_MODE",
+        description="delta: chỉ ghi phần state thay đổi mỗi lượt; snapshot: ghi toàn bộ state như cũ.",
+    )
+    state_checkpoint_interval: int = Field(
+        default=20,
+        alias="STATE_CHECKPOINT_INTERVAL",
+        description="Số turn log giữa hai checkpoint state đầy đủ ở chế độ delta.",
+    )
+
+    graph_cache_size: int = Field(
+        default=32,
+        alias="GRAPH_CACHE_SIZE",
+        description="Số graph đã compile (theo case_id, model) giữ trong bộ nhớ.",
+    )
+    graph_cache_ttl_seconds: float = Field(
+        default=1800.0,
+        alias="GRAPH_CACHE_TTL_SECONDS",
+        description="Thời gian sống của graph đã compile (giây, <=0 để tắt TTL).",
+    )
+
+    bootstrap_snapshot_enabled: bool = Field(
+        default=True,
+        alias="BOOTSTRAP_SNAPSHOT_ENABLED",
+        description="Dùng lại kết quả lượt bootstrap theo (case_id, start_event, model) cho session mới.",
+    )
+    bootstrap_snapshot_cache_size: int = Field(default=64, alias="BOOTSTRAP_SNAPSHOT_CACHE_SIZE")
+    bootstrap_snapshot_ttl_seconds: float = Field(
+        default=1800.0,
+        alias="BOOTSTRAP_SNAPSHOT_TTL_SECONDS",
+        description="Thời gian sống của snapshot bootstrap (giây, <=0 để tắt TTL).",
+    )
+    bulk_session_max_count: int = Field(
+        default=200,
+        alias="BULK_SESSION_MAX_COUNT",
+        description="Số session tối đa trong một request tạo session hàng loạt.",
+    )
 
     version: str = "1.0.0"
 
@@ -1,5 +1,5 @@
 from __future__ import annotations
 
-__all__ = ["get_mongo_client"]
+__all__ = ["get_async_mongo_client", "get_mongo_client"]
 
-from .database import get_mongo_client
+from .database import get_async_mongo_client, get_mongo_client
@@ -1,35 +1,30 @@
 from __future__ import annotations
 
-from typing import Optional
-
-import certifi
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient, MongoClient
 from pymongo.errors import ConfigurationError, PyMongoError
 
 from api_casestudy.core.config import get_settings
-
-_mongo_client: Optional[MongoClient] = None
+from casestudy.app.db.connection import get_connection_manager
 
 
 def get_mongo_client() -> MongoClient:
     """
-    Tạo hoặc trả về MongoDB client dùng chung cho Agent API.
+    Trả về MongoDB client dùng chung cho Agent API (cùng pool với phần còn lại của tiến trình).
     """
-    global _mongo_client
-    if _mongo_client is not None:
-        return _mongo_client
-
     settings = get_settings()
     try:
-        client = MongoClient(
-            settings.mongo_uri,
-            tls=True,
-            tlsCAFile=certifi.where(),
-            serverSelectionTimeoutMS=settings.mongo_timeout_ms,
-        )
-        client.admin.command("ping")
+        return get_connection_manager().verified_client(settings.mongo_uri)
     except (ConfigurationError, PyMongoError, OSError) as exc:
         raise RuntimeError(f"Không thể kết nối MongoDB: {exc}") from exc
 
-    _mongo_client = client
-    return _mongo_client
+
+def get_async_mongo_client() -> AsyncMongoClient:
+    """
+    Trả về AsyncMongoClient dùng chung cho các route async.
+    Client kết nối lười ở lần truy vấn đầu tiên nên không chặn event loop khi khởi tạo.
+    """
+    settings = get_settings()
+    try:
+        return get_connection_manager().async_client(settings.mongo_uri)
+    except (ConfigurationError, PyMongoError) as exc:
+        raise RuntimeError(f"Không thể kết nối MongoDB: {exc}") from exc
@@ -1,9 +1,26 @@
 from __future__ import annotations
 
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from api_casestudy.core.config import get_settings
 from api_casestudy.routers import agent_router
+from casestudy.agent.chains.action_prescore import grading_metrics
+from casestudy.agent.chains.action_score_cache import criterion_score_cache_stats
+from casestudy.agent.chains.budget import prompt_metrics
+from casestudy.app.db.connection import get_connection_manager
+from casestudy.utils.llm_cache import llm_cache_stats
+from casestudy.utils.llm_scheduler import get_llm_scheduler
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    yield
+    # Đóng pool MongoDB (sync + async) dùng chung khi tắt service.
+    await get_connection_manager().aclose()
 
 
 def create_app() -> FastAPI:
@@ -16,6 +33,7 @@ def create_app() -> FastAPI:
         title="CaseStudy Agent API",
         version=settings.version,
         description="Dịch vụ điều phối agent hội thoại cho từng case.",
+        lifespan=lifespan,
     )
 
     app.include_router(agent_router, prefix="/api")
@@ -42,3 +60,45 @@ async def healthcheck() -> dict[str, str]:
     Endpoint kiểm tra tình trạng chạy của service.
     """
     return {"status": "ok"}
+
+
+@app.get("/healthz/mongo")
+async def mongo_healthcheck() -> Dict[str, Any]:
+    """
+    Ping MongoDB và trả về số liệu connection pool dùng chung (kết nối mở/đang dùng, thời gian chờ).
+    """
+    return await run_in_threadpool(get_connection_manager().health, get_settings().mongo_uri)
+
+
+@app.get("/healthz/prompts")
+async def prompt_healthcheck() -> Dict[str, Any]:
+    """
+    Số token prompt theo chain (trung bình, lớn nhất, số lần phải rút gọn) từ khi khởi động.
+    """
+    return prompt_metrics.snapshot()
+
+
+@app.get("/healthz/llm")
+async def llm_healthcheck() -> Dict[str, Any]:
+    """
+    Trạng thái LLM scheduler: độ sâu hàng đợi theo lớp ưu tiên, request đang chạy,
+    mức token bucket, số lần 429/xếp lại và thời gian chờ trung bình.
+    """
+    return get_llm_scheduler().stats()
+
+
+@app.get("/healthz/llm/cache")
+async def llm_cache_healthcheck() -> Dict[str, Any]:
+    """
+    Hit rate của cache phản hồi LLM theo chain (tầng bộ nhớ/lưu trữ) và trạng thái LRU dùng chung.
+    """
+    return llm_cache_stats()
+
+
+@app.get("/healthz/grading")
+async def grading_healthcheck() -> Dict[str, Any]:
+    """
+    Số lượt chấm hành động theo tầng: cache điểm dùng chung, chấm sơ bộ tại chỗ,
+    model nhỏ, model chính.
+    """
+    return {**grading_metrics.snapshot(), "score_cache": criterion_score_cache_stats()}
@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+import json
+import logging
 from functools import lru_cache
+from typing import Any, AsyncIterator, Dict
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 
 from api_casestudy.schemas import (
+    AgentSessionBulkCreateRequest,
+    AgentSessionBulkCreateResponse,
     AgentSessionCreateRequest,
     AgentSessionCreateResponse,
     AgentSessionHistoryResponse,
@@ -14,6 +20,7 @@ from api_casestudy.schemas import (
 from api_casestudy.services import AgentService
 
 router = APIRouter(prefix="/agent", tags=["agent"])
+logger = logging.getLogger(__name__)
 
 
 @lru_cache
@@ -31,7 +38,31 @@ async def create_session_endpoint(
     service: AgentService = Depends(get_agent_service),
 ) -> AgentSessionCreateResponse:
     try:
-        return service.create_session(payload)
+        return await service.acreate_session(payload)
+    except KeyError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    except RuntimeError as exc:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc)) from exc
+
+
+@router.post(
+    "/sessions/bulk",
+    response_model=AgentSessionBulkCreateResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_sessions_endpoint(
+    payload: AgentSessionBulkCreateRequest,
+    service: AgentService = Depends(get_agent_service),
+) -> AgentSessionBulkCreateResponse:
+    """
+    Tạo nhiều session cho một lớp học từ một lượt bootstrap duy nhất.
+    """
+    try:
+        return await service.acreate_sessions(payload)
+    except KeyError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
     except RuntimeError as exc:
@@ -54,7 +85,7 @@ async def send_turn_endpoint(
         )
     payload.session_id = session_id
     try:
-        return service.send_turn(payload)
+        return await service.asend_turn(payload)
     except KeyError as exc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
     except ValueError as exc:
@@ -63,6 +94,49 @@ async def send_turn_endpoint(
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc)) from exc
 
 
+def _format_sse(event: Dict[str, Any]) -> str:
+    data = json.dumps(event.get("data"), ensure_ascii=False, default=str)
+    return f"event: {event['event']}\ndata: {data}\n\n"
+
+
+async def _encode_sse(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    try:
+        async for event in events:
+            yield _format_sse(event)
+    except Exception as exc:  # pragma: no cover - lỗi phát sinh khi stream đã mở
+        logger.warning("Stream lượt agent bị gián đoạn: %s", exc, exc_info=True)
+        yield _format_sse({"event": "error", "data": {"detail": str(exc)}})
+
+
+@router.post("/sessions/{session_id}/turn/stream")
+async def stream_turn_endpoint(
+    session_id: str,
+    payload: AgentTurnRequest,
+    service: AgentService = Depends(get_agent_service),
+) -> StreamingResponse:
+    """
+    Server-Sent Events: `persona` cho lời thoại NPC, `token` cho từng mẩu ai_reply,
+    `done` chứa state cuối (đã lưu) khi graph chạy xong.
+    """
+    if payload.session_id and payload.session_id != session_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="session_id trong payload không trùng với đường dẫn.",
+        )
+    payload.session_id = session_id
+    try:
+        events = service.astream_turn(payload)
+    except KeyError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    return StreamingResponse(
+        _encode_sse(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.delete(
     "/sessions/{session_id}",
     status_code=status.HTTP_204_NO_CONTENT,
@@ -83,7 +157,7 @@ async def get_session_history_endpoint(
     service: AgentService = Depends(get_agent_service),
 ) -> AgentSessionHistoryResponse:
     try:
-        return service.get_session_history(session_id)
+        return await service.aget_session_history(session_id)
     except KeyError as exc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
     except RuntimeError as exc:
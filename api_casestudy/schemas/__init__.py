@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 from .agent import (
+    AgentSessionBulkCreateRequest,
+    AgentSessionBulkCreateResponse,
     AgentSessionCreateRequest,
     AgentSessionCreateResponse,
     AgentSessionHistoryResponse,
@@ -9,6 +11,8 @@ from .agent import (
     AgentTurnResponse,
 )
 __all__ = [
+    "AgentSessionBulkCreateRequest",
+    "AgentSessionBulkCreateResponse",
     "AgentSessionCreateRequest",
     "AgentSessionCreateResponse",
     "AgentSessionHistoryResponse",
@@ -32,6 +32,27 @@ class AgentSessionCreateResponse(BaseModel):
     state: Dict[str, Any]
 
 
+class AgentSessionBulkCreateRequest(BaseModel):
+    case_id: str = Field(..., description="Case ID cần khởi tạo agent.")
+    count: int = Field(..., ge=1, description="Số session cần tạo (ví dụ số học viên trong lớp).")
+    start_event: Optional[str] = Field(
+        default=None,
+        description="Canon event bắt đầu (mặc định: event đầu tiên trong skeleton).",
+    )
+    model_name: Optional[str] = Field(
+        default=None,
+        description="Tên model LLM (nếu bỏ trống dùng mặc định trong agent).",
+    )
+
+
+class AgentSessionBulkCreateResponse(BaseModel):
+    case_id: str
+    session_ids: List[str]
+    state: Dict[str, Any] = Field(
+        ..., description="State sau lượt bootstrap, giống nhau cho mọi session vừa tạo."
+    )
+
+
 class AgentTurnRequest(BaseModel):
     session_id: Optional[str] = Field(
         default=None,
@@ -54,7 +75,10 @@ class AgentTurnResponse(BaseModel):
     state: Dict[str, Any]
 
 class AgentTurnLog(BaseModel):
-    turn_index: int = Field(..., description="Thứ tự lượt trong session.")
+    sequence: Optional[int] = Field(
+        default=None, description="Thứ tự ghi của lượt trong session (tăng dần, dùng để dựng lại state)."
+    )
+    turn_index: int = Field(..., description="Số lượt trong event hiện tại (turn_count).")
     user_action: Optional[str] = Field(
         default=None, description="Hành động người dùng ở lượt này."
     )
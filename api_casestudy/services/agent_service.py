@@ -1,16 +1,23 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
 import uuid
-from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 
 from casestudy.agent import LogicMemory, RuntimeState
+from casestudy.agent.chains.budget import track_prompt_tokens
 from casestudy.agent.const import DEFAULT_MODEL_NAME
 from casestudy.agent.graph import CaseStudyGraphBuilder
-from casestudy.utils import semantic_extract as semantic_utils
+from casestudy.agent.memory_registry import get_logic_memory_registry
+from casestudy.utils.llm_scheduler import PRIORITY_BOOTSTRAP, llm_priority
 
+from api_casestudy.core.config import get_settings
 from api_casestudy.schemas import (
+    AgentSessionBulkCreateRequest,
+    AgentSessionBulkCreateResponse,
     AgentSessionCreateRequest,
     AgentSessionCreateResponse,
     AgentSessionHistoryResponse,
@@ -18,11 +25,24 @@ from api_casestudy.schemas import (
     AgentTurnRequest,
     AgentTurnResponse,
 )
-from api_casestudy.services.state_repository import ConversationStateRepository
+from api_casestudy.services.bootstrap_cache import (
+    BootstrapSnapshot,
+    BootstrapSnapshotCache,
+    SnapshotKey,
+)
+from api_casestudy.services.graph_cache import CompiledGraphCache, CompiledGraphEntry
+from api_casestudy.services.state_repository import (
+    AsyncConversationStateRepository,
+    ConversationStateRepository,
+)
 
 
 logger = logging.getLogger(__name__)
 
+# Node sinh phản hồi facilitator (stream token) và node sinh lời thoại NPC.
+STREAMED_REPLY_NODE = "responder"
+PERSONA_DIALOGUE_NODE = "persona"
+
 
 def _normalize_runtime_state(result) -> RuntimeState:
     if isinstance(result, RuntimeState):
@@ -47,13 +67,6 @@ class _InMemoryStateStore:
         self._state = state
 
 
-def _configure_semantic_module(case_id: str) -> None:
-    """
-    Cập nhật module semantic_extract để load đúng namespace Pinecone cho case_id.
-    """
-    semantic_utils.configure_paths(case_id)
-
-
 @dataclass
 class AgentSession:
     session_id: str
@@ -62,6 +75,10 @@ class AgentSession:
     graph: Any
     state: RuntimeState
     state_store: _InMemoryStateStore
+    # Tuần tự hóa các lượt async của cùng một session.
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+    # Token prompt theo chain của lượt gần nhất (xem chains/budget.py).
+    last_prompt_usage: Dict[str, Dict[str, Any]] = field(default_factory=dict, repr=False)
 
     def to_response(self) -> AgentSessionCreateResponse:
         return AgentSessionCreateResponse(
@@ -70,24 +87,111 @@ class AgentSession:
             state=self.state.to_serializable(),
         )
 
+    def adopt_snapshot(self, snapshot: BootstrapSnapshot) -> None:
+        """
+        Nhận bản sao state bootstrap dùng chung thay vì tự chạy lượt đầu.
+        """
+        self.state = snapshot.clone_state()
+        self.state_store.save(self.state)
+
+    def _invoke_config(self, config: Optional[Dict]) -> Dict[str, Any]:
+        """
+        Graph được dùng chung giữa các session nên state store riêng đi qua `configurable`.
+        """
+        configurable = dict(config or {})
+        configurable["state_store"] = self.state_store
+        return {"configurable": configurable}
+
     def run_turn(self, *, user_action: Optional[str] = None, config: Optional[Dict] = None) -> RuntimeState:
         if user_action is not None:
             cleaned = user_action.strip()
             self.state.user_action = cleaned
-        invoke_config = config or {}
-        result = self.graph.invoke(self.state, config=invoke_config)
+        invoke_config = self._invoke_config(config)
+        with track_prompt_tokens() as usage:
+            result = self.graph.invoke(self.state, config=invoke_config)
+        self.last_prompt_usage = usage
         self.state = _normalize_runtime_state(result)
         self.state_store.save(self.state)
         return self.state
 
+    async def arun_turn(
+        self, *, user_action: Optional[str] = None, config: Optional[Dict] = None
+    ) -> RuntimeState:
+        async with self.lock:
+            if user_action is not None:
+                self.state.user_action = user_action.strip()
+            with track_prompt_tokens() as usage:
+                result = await self.graph.ainvoke(self.state, config=self._invoke_config(config))
+            self.last_prompt_usage = usage
+            self.state = _normalize_runtime_state(result)
+            self.state_store.save(self.state)
+            return self.state
+
+    async def astream_turn(
+        self, *, user_action: Optional[str] = None, config: Optional[Dict] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Chạy một lượt và phát sự kiện ngay khi có: lời thoại NPC khi node persona xong,
+        token `ai_reply` khi LLM của responder trả về. State cuối được cập nhật sau cùng.
+        """
+        async with self.lock:
+            if user_action is not None:
+                self.state.user_action = user_action.strip()
+            final_values = None
+            with track_prompt_tokens() as usage:
+                async for mode, chunk in self.graph.astream(
+                    self.state,
+                    config=self._invoke_config(config),
+                    stream_mode=["messages", "updates", "values"],
+                ):
+                    if mode == "messages":
+                        message, metadata = chunk
+                        if metadata.get("langgraph_node") != STREAMED_REPLY_NODE:
+                            continue
+                        content = message.content
+                        if isinstance(content, str) and content:
+                            yield {"event": "token", "data": {"content": content}}
+                    elif mode == "updates":
+                        persona_update = chunk.get(PERSONA_DIALOGUE_NODE) or {}
+                        branch_updates = persona_update.get("branch_updates") or {}
+                        for line in branch_updates.get("_last_persona_dialogue") or []:
+                            yield {"event": "persona", "data": line}
+                    else:
+                        final_values = chunk
+            self.last_prompt_usage = usage
+            if final_values is None:
+                raise RuntimeError("Graph không trả về state sau khi stream.")
+            self.state = _normalize_runtime_state(final_values)
+            self.state_store.save(self.state)
+
 
 class AgentService:
     """
     Quản lý vòng đời agent sessions, wrap LangGraph runner.
     """
 
-    def __init__(self, state_repo: Optional[ConversationStateRepository] = None) -> None:
+    def __init__(
+        self,
+        state_repo: Optional[ConversationStateRepository] = None,
+        async_state_repo: Optional[AsyncConversationStateRepository] = None,
+    ) -> None:
         self._sessions: Dict[str, AgentSession] = {}
+        settings = get_settings()
+        self._graph_cache = CompiledGraphCache(
+            self._build_graph_entry,
+            max_size=settings.graph_cache_size,
+            ttl_seconds=settings.graph_cache_ttl_seconds,
+        )
+        self._memory_registry = get_logic_memory_registry()
+        # Case bị sửa/xóa (qua change stream hoặc phiên bản mới) thì graph cũ cũng phải bỏ.
+        self._memory_registry.add_listener(self._graph_cache.invalidate)
+        self._snapshots: Optional[BootstrapSnapshotCache] = None
+        if settings.bootstrap_snapshot_enabled:
+            self._snapshots = BootstrapSnapshotCache(
+                max_size=settings.bootstrap_snapshot_cache_size,
+                ttl_seconds=settings.bootstrap_snapshot_ttl_seconds,
+            )
+            self._memory_registry.add_listener(self._snapshots.invalidate)
         try:
             self._state_repo: Optional[ConversationStateRepository] = (
                 state_repo or ConversationStateRepository()
@@ -95,23 +199,80 @@ class AgentService:
         except Exception as exc:  # pragma: no cover - defensive
             logger.warning("Không thể khởi tạo ConversationStateRepository: %s", exc, exc_info=True)
             self._state_repo = None
+        try:
+            self._async_state_repo: Optional[AsyncConversationStateRepository] = (
+                async_state_repo or AsyncConversationStateRepository()
+            )
+        except Exception as exc:  # pragma: no cover - defensive
+            logger.warning(
+                "Không thể khởi tạo AsyncConversationStateRepository: %s", exc, exc_info=True
+            )
+            self._async_state_repo = None
 
     @staticmethod
     def _resolve_model_name(model_name: Optional[str]) -> str:
         return model_name or DEFAULT_MODEL_NAME
 
-    def _compile_graph(
-        self,
-        *,
-        case_id: str,
-        model_name: str,
-        state_store: _InMemoryStateStore,
-    ):
-        _configure_semantic_module(case_id)
-        builder = CaseStudyGraphBuilder(case_id=case_id, model_name=model_name)
-        builder.state_store = state_store
-        return builder.build().compile()
+    def _build_graph_entry(self, case_id: str, model_name: str) -> CompiledGraphEntry:
+        builder = CaseStudyGraphBuilder(
+            case_id=case_id,
+            model_name=model_name,
+            logic_memory=self._memory_registry.get(case_id),
+        )
+        return CompiledGraphEntry(
+            case_id=case_id,
+            model_name=model_name,
+            graph=builder.compile(),
+            logic_memory=builder.logic_memory,
+            created_at=time.monotonic(),
+            scene_cache=builder.scene_cache,
+        )
+
+    def invalidate_case(self, case_id: str) -> int:
+        """
+        Bỏ graph và LogicMemory đã cache của case (ví dụ sau khi case được chỉnh sửa).
+        """
+        removed = self._graph_cache.invalidate(case_id)
+        if self._snapshots is not None:
+            self._snapshots.invalidate(case_id)
+        self._memory_registry.invalidate(case_id)
+        return removed
 
+    def graph_cache_stats(self) -> Dict[str, Any]:
+        return self._graph_cache.stats()
+
+    def logic_memory_stats(self) -> Dict[str, Any]:
+        return self._memory_registry.stats()
+
+    def bootstrap_snapshot_stats(self) -> Optional[Dict[str, Any]]:
+        return self._snapshots.stats() if self._snapshots is not None else None
+
+    @staticmethod
+    def _turn_metadata(
+        session: AgentSession, metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Metadata của turn log kèm token prompt theo chain của lượt vừa chạy.
+        """
+        usage = session.last_prompt_usage
+        if usage:
+            logger.debug(
+                "Session %s: %d token prompt (%s).",
+                session.session_id,
+                sum(entry["tokens"] for entry in usage.values()),
+                ", ".join(f"{chain}={entry['tokens']}" for chain, entry in usage.items()),
+            )
+        return {**(metadata or {}), "prompt_tokens": usage}
+
+    def scene_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Thống kê hit/miss của cache scene summary theo từng graph đang giữ.
+        """
+        return {
+            f"{entry.case_id}:{entry.model_name}": entry.scene_cache.stats()
+            for entry in self._graph_cache.entries()
+            if entry.scene_cache is not None
+        }
 
     def _persist_state(
         self,
@@ -134,23 +295,54 @@ class AgentService:
                 metadata=metadata,
             )
 
-    def create_session(self, payload: AgentSessionCreateRequest) -> AgentSessionCreateResponse:
+    async def _apersist_state(
+        self,
+        *,
+        session_id: str,
+        case_id: str,
+        state: RuntimeState,
+        user_action: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        if not self._async_state_repo:
+            return
+        await self._async_state_repo.save_state(session_id, case_id, state)
+        if user_action is not None or metadata:
+            await self._async_state_repo.append_turn(
+                session_id=session_id,
+                case_id=case_id,
+                user_action=user_action,
+                state=state,
+                metadata=metadata,
+            )
+
+    def _prepare_session(
+        self, payload: AgentSessionCreateRequest
+    ) -> Tuple[AgentSession, Dict[str, Any], Optional[str], LogicMemory]:
+        """
+        Dựng graph và state ban đầu (chưa chạy lượt bootstrap) cho session mới.
+        """
         session_id = uuid.uuid4().hex
         model_name = self._resolve_model_name(payload.model_name)
 
         try:
-            logic_memory = LogicMemory.load(payload.case_id)
+            # Không tốn I/O khi case đã nằm trong registry; trả bản mới nếu case vừa đổi phiên bản.
+            logic_memory = self._memory_registry.get(payload.case_id)
+        except (FileNotFoundError, ValueError) as exc:
+            # Loader báo case không tồn tại (hoặc dữ liệu không đọc được) bằng ValueError.
+            raise KeyError(f"Không tìm thấy dữ liệu logic cho case_id '{payload.case_id}'.") from exc
+        try:
+            entry = self._graph_cache.get(payload.case_id, model_name)
+            if entry.logic_memory is not logic_memory:
+                self._graph_cache.invalidate(payload.case_id)
+                entry = self._graph_cache.get(payload.case_id, model_name)
         except FileNotFoundError as exc:
-            raise ValueError(f"Không tìm thấy dữ liệu logic cho case_id '{payload.case_id}'.") from exc
+            raise KeyError(f"Không tìm thấy dữ liệu logic cho case_id '{payload.case_id}'.") from exc
+        logic_memory = entry.logic_memory
 
         start_event = payload.start_event or logic_memory.first_event or "CE1"
 
         state_store = _InMemoryStateStore()
-        graph = self._compile_graph(
-            case_id=payload.case_id,
-            model_name=model_name,
-            state_store=state_store,
-        )
 
         initial_user_action = payload.user_action.strip() if payload.user_action else None
 
@@ -167,38 +359,226 @@ class AgentService:
             initial_config["start_event"] = payload.start_event
 
         state_store.save(state)
-        self._persist_state(
+        session = AgentSession(
             session_id=session_id,
             case_id=payload.case_id,
+            model_name=model_name,
+            graph=entry.graph,
             state=state,
+            state_store=state_store,
         )
+        return session, initial_config, initial_user_action, logic_memory
+
+    def _snapshot_key(
+        self, session: AgentSession, initial_user_action: Optional[str]
+    ) -> Optional[SnapshotKey]:
+        """
+        Lượt bootstrap chỉ giống nhau giữa các học viên khi chưa có hành động ban đầu.
+        """
+        if self._snapshots is None or initial_user_action:
+            return None
+        return (session.case_id, session.state.current_event, session.model_name)
+
+    @staticmethod
+    def _bootstrap_metadata(session: AgentSession, from_snapshot: bool) -> Dict[str, Any]:
+        metadata = AgentService._turn_metadata(session, {"phase": "initial_bootstrap"})
+        if from_snapshot:
+            metadata["bootstrap_snapshot"] = True
+        return metadata
+
+    def _run_bootstrap(self, session: AgentSession, initial_config: Dict[str, Any]) -> RuntimeState:
         try:
-            result_state = _normalize_runtime_state(
-                graph.invoke(state, config=initial_config)
-            )
+            with llm_priority(PRIORITY_BOOTSTRAP):
+                return session.run_turn(config=initial_config)
         except Exception as exc:  # pragma: no cover - fallback
             raise RuntimeError("Không thể khởi tạo agent session.") from exc
-        state_store.save(result_state)
+
+    async def _arun_bootstrap(
+        self, session: AgentSession, initial_config: Dict[str, Any]
+    ) -> RuntimeState:
+        try:
+            with llm_priority(PRIORITY_BOOTSTRAP):
+                return await session.arun_turn(config=initial_config)
+        except Exception as exc:  # pragma: no cover - fallback
+            raise RuntimeError("Không thể khởi tạo agent session.") from exc
+
+    def _bootstrap_session(self, payload: AgentSessionCreateRequest) -> Tuple[AgentSession, bool]:
+        """
+        Tạo session và chạy (hoặc clone từ snapshot) lượt bootstrap; trả về session và
+        cờ cho biết state lấy từ snapshot.
+        """
+        session, initial_config, initial_user_action, logic_memory = self._prepare_session(payload)
+        key = self._snapshot_key(session, initial_user_action)
+
+        snapshot = self._snapshots.get(key, logic_memory) if key else None
+        if snapshot is None:
+            self._persist_state(
+                session_id=session.session_id,
+                case_id=session.case_id,
+                state=session.state,
+            )
+            if key is None:
+                self._run_bootstrap(session, initial_config)
+            else:
+                snapshot, built = self._snapshots.get_or_create(
+                    key,
+                    logic_memory,
+                    lambda: BootstrapSnapshot.capture(
+                        key,
+                        self._run_bootstrap(session, initial_config),
+                        logic_memory,
+                        session.last_prompt_usage,
+                    ),
+                )
+                if built:
+                    snapshot = None
+        if snapshot is not None:
+            session.adopt_snapshot(snapshot)
+
         self._persist_state(
-            session_id=session_id,
-            case_id=payload.case_id,
-            state=result_state,
+            session_id=session.session_id,
+            case_id=session.case_id,
+            state=session.state,
+            user_action=initial_user_action,
+            metadata=self._bootstrap_metadata(session, snapshot is not None),
+        )
+        self._sessions[session.session_id] = session
+        return session, snapshot is not None
+
+    async def _abootstrap_session(
+        self, payload: AgentSessionCreateRequest
+    ) -> Tuple[AgentSession, bool]:
+        # Dựng graph còn đọc Mongo/Pinecone đồng bộ nên đẩy sang worker thread.
+        session, initial_config, initial_user_action, logic_memory = await asyncio.to_thread(
+            self._prepare_session, payload
+        )
+        key = self._snapshot_key(session, initial_user_action)
+
+        snapshot = self._snapshots.get(key, logic_memory) if key else None
+        if snapshot is None:
+            await self._apersist_state(
+                session_id=session.session_id,
+                case_id=session.case_id,
+                state=session.state,
+            )
+            if key is None:
+                await self._arun_bootstrap(session, initial_config)
+            else:
+
+                async def build() -> BootstrapSnapshot:
+                    state = await self._arun_bootstrap(session, initial_config)
+                    return BootstrapSnapshot.capture(
+                        key, state, logic_memory, session.last_prompt_usage
+                    )
+
+                snapshot, built = await self._snapshots.aget_or_create(key, logic_memory, build)
+                if built:
+                    snapshot = None
+        if snapshot is not None:
+            session.adopt_snapshot(snapshot)
+
+        await self._apersist_state(
+            session_id=session.session_id,
+            case_id=session.case_id,
+            state=session.state,
             user_action=initial_user_action,
-            metadata={"phase": "initial_bootstrap"},
+            metadata=self._bootstrap_metadata(session, snapshot is not None),
         )
+        self._sessions[session.session_id] = session
+        return session, snapshot is not None
 
-        session = AgentSession(
-            session_id=session_id,
+    def create_session(self, payload: AgentSessionCreateRequest) -> AgentSessionCreateResponse:
+        session, _ = self._bootstrap_session(payload)
+        return session.to_response()
+
+    async def acreate_session(
+        self, payload: AgentSessionCreateRequest
+    ) -> AgentSessionCreateResponse:
+        session, _ = await self._abootstrap_session(payload)
+        return session.to_response()
+
+    def _bulk_payload(self, payload: AgentSessionBulkCreateRequest) -> AgentSessionCreateRequest:
+        limit = get_settings().bulk_session_max_count
+        if payload.count > limit:
+            raise ValueError(f"Chỉ tạo được tối đa {limit} session trong một request.")
+        return AgentSessionCreateRequest(
             case_id=payload.case_id,
-            model_name=model_name,
-            graph=graph,
-            state=result_state,
-            state_store=state_store,
+            start_event=payload.start_event,
+            model_name=payload.model_name,
         )
-        self._sessions[session_id] = session
-        return session.to_response()
 
-    def send_turn(self, payload: AgentTurnRequest) -> AgentTurnResponse:
+    def _clone_session(self, source: AgentSession, snapshot: BootstrapSnapshot) -> AgentSession:
+        session = AgentSession(
+            session_id=uuid.uuid4().hex,
+            case_id=source.case_id,
+            model_name=source.model_name,
+            graph=source.graph,
+            state=source.state,
+            state_store=_InMemoryStateStore(),
+        )
+        session.adopt_snapshot(snapshot)
+        self._sessions[session.session_id] = session
+        return session
+
+    def create_sessions(
+        self, payload: AgentSessionBulkCreateRequest
+    ) -> AgentSessionBulkCreateResponse:
+        """
+        Tạo `count` session cho một lớp học: chỉ session đầu chạy (hoặc lấy từ cache)
+        lượt bootstrap, các session còn lại clone từ kết quả đó.
+        """
+        first, _ = self._bootstrap_session(self._bulk_payload(payload))
+        snapshot = BootstrapSnapshot.capture(
+            (first.case_id, first.state.current_event, first.model_name),
+            first.state,
+            self._memory_registry.get(first.case_id),
+        )
+        sessions = [first]
+        for _ in range(payload.count - 1):
+            session = self._clone_session(first, snapshot)
+            self._persist_state(
+                session_id=session.session_id,
+                case_id=session.case_id,
+                state=session.state,
+                metadata=self._bootstrap_metadata(session, True),
+            )
+            sessions.append(session)
+        return AgentSessionBulkCreateResponse(
+            case_id=first.case_id,
+            session_ids=[session.session_id for session in sessions],
+            state=first.state.to_serializable(),
+        )
+
+    async def acreate_sessions(
+        self, payload: AgentSessionBulkCreateRequest
+    ) -> AgentSessionBulkCreateResponse:
+        first, _ = await self._abootstrap_session(self._bulk_payload(payload))
+        # Registry có thể đọc phiên bản case từ Mongo (đồng bộ) nên không gọi trên event loop.
+        logic_memory = await asyncio.to_thread(self._memory_registry.get, first.case_id)
+        snapshot = BootstrapSnapshot.capture(
+            (first.case_id, first.state.current_event, first.model_name),
+            first.state,
+            logic_memory,
+        )
+        clones = [self._clone_session(first, snapshot) for _ in range(payload.count - 1)]
+        await asyncio.gather(
+            *(
+                self._apersist_state(
+                    session_id=session.session_id,
+                    case_id=session.case_id,
+                    state=session.state,
+                    metadata=self._bootstrap_metadata(session, True),
+                )
+                for session in clones
+            )
+        )
+        return AgentSessionBulkCreateResponse(
+            case_id=first.case_id,
+            session_ids=[first.session_id] + [session.session_id for session in clones],
+            state=first.state.to_serializable(),
+        )
+
+    def _resolve_turn(self, payload: AgentTurnRequest) -> Tuple[AgentSession, Dict[str, Any]]:
         session = self._sessions.get(payload.session_id)
         if not session:
             raise KeyError(f"Session '{payload.session_id}' không tồn tại.")
@@ -209,6 +589,10 @@ class AgentService:
         config = {"reset_state": True} if payload.reset_state else {}
         if payload.start_event:
             config["start_event"] = payload.start_event
+        return session, config
+
+    def send_turn(self, payload: AgentTurnRequest) -> AgentTurnResponse:
+        session, config = self._resolve_turn(payload)
 
         state = session.run_turn(user_action=payload.user_input, config=config)
         self._persist_state(
@@ -216,6 +600,24 @@ class AgentService:
             case_id=session.case_id,
             state=state,
             user_action=payload.user_input,
+            metadata=self._turn_metadata(session),
+        )
+        return AgentTurnResponse(
+            session_id=session.session_id,
+            case_id=session.case_id,
+            state=state.to_serializable(),
+        )
+
+    async def asend_turn(self, payload: AgentTurnRequest) -> AgentTurnResponse:
+        session, config = self._resolve_turn(payload)
+
+        state = await session.arun_turn(user_action=payload.user_input, config=config)
+        await self._apersist_state(
+            session_id=session.session_id,
+            case_id=session.case_id,
+            state=state,
+            user_action=payload.user_input,
+            metadata=self._turn_metadata(session),
         )
         return AgentTurnResponse(
             session_id=session.session_id,
@@ -223,13 +625,48 @@ class AgentService:
             state=state.to_serializable(),
         )
 
+    def astream_turn(self, payload: AgentTurnRequest) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Kiểm tra session/payload ngay (để route trả lỗi HTTP trước khi mở stream),
+        rồi trả về async iterator các sự kiện `persona`, `token` và `done`.
+        """
+        session, config = self._resolve_turn(payload)
+        return self._astream_turn(session, config, payload.user_input)
+
+    async def _astream_turn(
+        self,
+        session: AgentSession,
+        config: Dict[str, Any],
+        user_input: str,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        async for event in session.astream_turn(user_action=user_input, config=config):
+            yield event
+
+        state = session.state
+        await self._apersist_state(
+            session_id=session.session_id,
+            case_id=session.case_id,
+            state=state,
+            user_action=user_input,
+            metadata=self._turn_metadata(session),
+        )
+        response = AgentTurnResponse(
+            session_id=session.session_id,
+            case_id=session.case_id,
+            state=state.to_serializable(),
+        )
+        yield {"event": "done", "data": response.model_dump()}
+
     def end_session(self, session_id: str) -> None:
         self._sessions.pop(session_id, None)
 
-    def load_state(self, session_id: str) -> RuntimeState:
+    def load_state(self, session_id: str, sequence: Optional[int] = None) -> RuntimeState:
+        """
+        State mới nhất của session hoặc state ngay sau turn log có `sequence`.
+        """
         if not self._state_repo:
             raise RuntimeError("State repository không khả dụng.")
-        state = self._state_repo.load_state(session_id)
+        state = self._state_repo.load_state(session_id, sequence)
         if state is None:
             raise KeyError(f"Session '{session_id}' không tồn tại trong state store.")
         return state
@@ -246,3 +683,24 @@ class AgentService:
             case_id=metadata["case_id"],
             turns=[AgentTurnLog(**turn) for turn in turn_logs],
         )
+
+    async def aload_state(self, session_id: str, sequence: Optional[int] = None) -> RuntimeState:
+        if not self._async_state_repo:
+            raise RuntimeError("State repository không khả dụng.")
+        state = await self._async_state_repo.load_state(session_id, sequence)
+        if state is None:
+            raise KeyError(f"Session '{session_id}' không tồn tại trong state store.")
+        return state
+
+    async def aget_session_history(self, session_id: str) -> AgentSessionHistoryResponse:
+        if not self._async_state_repo:
+            raise RuntimeError("State repository không khả dụng.")
+        metadata = await self._async_state_repo.get_state_metadata(session_id)
+        if metadata is None:
+            raise KeyError(f"Session '{session_id}' không tồn tại.")
+        turn_logs = await self._async_state_repo.list_turns(session_id)
+        return AgentSessionHistoryResponse(
+            session_id=session_id,
+            case_id=metadata["case_id"],
+            turns=[AgentTurnLog(**turn) for turn in turn_logs],
+        )
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from casestudy.agent import LogicMemory, RuntimeState
+from casestudy.utils.cache import KeyedLocks, LRUCache
+
+# (case_id, start_event, model_name)
+SnapshotKey = Tuple[str, str, str]
+
+
+@dataclass(frozen=True)
+class BootstrapSnapshot:
+    """
+    Kết quả lượt bootstrap (scene mở đầu, persona, lời chào facilitator) của một
+    `(case_id, start_event, model_name)`. State lưu dạng serialized và chỉ được đọc;
+    mỗi session mới nhận một bản sao qua `clone_state`.
+    """
+
+    key: SnapshotKey
+    state: Dict[str, Any]
+    logic_memory: LogicMemory = field(repr=False)
+    prompt_usage: Dict[str, Dict[str, Any]] = field(default_factory=dict, repr=False)
+    created_at: float = field(default_factory=time.monotonic)
+
+    @classmethod
+    def capture(
+        cls,
+        key: SnapshotKey,
+        state: RuntimeState,
+        logic_memory: LogicMemory,
+        prompt_usage: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> "BootstrapSnapshot":
+        return cls(
+            key=key,
+            state=copy.deepcopy(state.to_serializable()),
+            logic_memory=logic_memory,
+            prompt_usage=dict(prompt_usage or {}),
+        )
+
+    def clone_state(self) -> RuntimeState:
+        return RuntimeState.from_serialized(copy.deepcopy(self.state))
+
+
+class BootstrapSnapshotCache:
+    """
+    Cache LRU có TTL cho snapshot bootstrap. Snapshot gắn với đúng đối tượng LogicMemory
+    đã dùng để chạy: khóa nội bộ kèm `id(logic_memory)` (snapshot giữ tham chiếu nên id không
+    bị tái sử dụng) nên khi case đổi phiên bản (registry trả LogicMemory mới) snapshot cũ
+    coi như không có; `invalidate(case_id)` được gọi từ listener của registry.
+
+    Như `CompiledGraphCache`, mỗi khóa chỉ bootstrap một lần tại một thời điểm; các request
+    đồng thời chờ bản đầu tiên rồi clone.
+    """
+
+    def __init__(self, *, max_size: int = 64, ttl_seconds: float = 1800.0) -> None:
+        self._cache = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self._build_locks = KeyedLocks()
+        self._abuild_locks = KeyedLocks(asyncio.Lock)
+
+    def get(self, key: SnapshotKey, logic_memory: LogicMemory) -> Optional[BootstrapSnapshot]:
+        return self._cache.get(_entry_key(key, logic_memory))
+
+    def get_or_create(
+        self,
+        key: SnapshotKey,
+        logic_memory: LogicMemory,
+        build: Callable[[], BootstrapSnapshot],
+    ) -> Tuple[BootstrapSnapshot, bool]:
+        """
+        Trả về `(snapshot, built)`; `built` là True nếu snapshot vừa được tạo bởi lời gọi này.
+        """
+        entry_key = _entry_key(key, logic_memory)
+        snapshot = self._cache.get(entry_key)
+        if snapshot is not None:
+            return snapshot, False
+        with self._build_locks.hold(entry_key) as build_lock, build_lock:
+            snapshot = self._cache.peek(entry_key)
+            if snapshot is not None:
+                return snapshot, False
+            snapshot = build()
+            self._cache.set(entry_key, snapshot)
+            return snapshot, True
+
+    async def aget_or_create(
+        self,
+        key: SnapshotKey,
+        logic_memory: LogicMemory,
+        build: Callable[[], Awaitable[BootstrapSnapshot]],
+    ) -> Tuple[BootstrapSnapshot, bool]:
+        entry_key = _entry_key(key, logic_memory)
+        snapshot = self._cache.get(entry_key)
+        if snapshot is not None:
+            return snapshot, False
+        with self._abuild_locks.hold(entry_key) as build_lock:
+            async with build_lock:
+                snapshot = self._cache.peek(entry_key)
+                if snapshot is not None:
+                    return snapshot, False
+                snapshot = await build()
+                self._cache.set(entry_key, snapshot)
+                return snapshot, True
+
+    def invalidate(self, case_id: Optional[str] = None) -> int:
+        if case_id is None:
+            return self._cache.pop_where(lambda entry_key: True)
+        return self._cache.pop_where(lambda entry_key: entry_key[0][0] == case_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._cache.stats(), "ttl_seconds": self._cache.ttl_seconds or 0}
+
+
+def _entry_key(key: SnapshotKey, logic_memory: LogicMemory) -> Tuple[SnapshotKey, int]:
+    return key, id(logic_memory)
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from casestudy.agent import LogicMemory
+from casestudy.utils.cache import KeyedLocks, LRUCache
+
+GraphKey = Tuple[str, str]
+
+
+@dataclass
+class CompiledGraphEntry:
+    """
+    Graph đã compile cùng LogicMemory của case, dùng chung cho mọi session.
+    """
+
+    case_id: str
+    model_name: str
+    graph: Any
+    logic_memory: LogicMemory
+    created_at: float
+    scene_cache: Optional[LRUCache] = None
+
+
+class CompiledGraphCache:
+    """
+    Cache LRU có TTL cho graph đã compile theo khóa `(case_id, model_name)`.
+
+    Mỗi khóa chỉ được build một lần tại một thời điểm: các request đồng thời
+    cho cùng case sẽ chờ bản build đầu tiên thay vì tự dựng lại chain/Pinecone.
+    """
+
+    def __init__(
+        self,
+        builder: Callable[[str, str], CompiledGraphEntry],
+        *,
+        max_size: int = 32,
+        ttl_seconds: float = 1800.0,
+    ) -> None:
+        self._builder = builder
+        self._cache = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self._build_locks = KeyedLocks()
+
+    def get(self, case_id: str, model_name: str) -> CompiledGraphEntry:
+        key = (case_id, model_name)
+        entry = self._cache.get(key)
+        if entry is not None:
+            return entry
+
+        with self._build_locks.hold(key) as build_lock, build_lock:
+            # Một request khác có thể vừa build xong trong lúc chờ lock.
+            entry = self._cache.peek(key)
+            if entry is not None:
+                return entry
+            entry = self._builder(case_id, model_name)
+            self._cache.set(key, entry)
+            return entry
+
+    def invalidate(self, case_id: Optional[str] = None) -> int:
+        """
+        Xóa các graph của một case (hoặc toàn bộ cache), trả về số entry bị xóa.
+        """
+        if case_id is None:
+            return self._cache.pop_where(lambda key: True)
+        return self._cache.pop_where(lambda key: key[0] == case_id)
+
+    def entries(self) -> List[CompiledGraphEntry]:
+        return self._cache.values()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._cache.stats(), "ttl_seconds": self._cache.ttl_seconds or 0}
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import copy
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from casestudy.utils.cache import LRUCache
+
+# Hai field lớn dần theo số lượt được mã hóa riêng: dialogue_history chỉ ghi phần nối thêm,
+# event_summary chỉ ghi các khóa thay đổi/bị xóa. Các field còn lại ghi nguyên giá trị khi đổi.
+DIALOGUE_FIELD = "dialogue_history"
+SUMMARY_FIELD = "event_summary"
+
+FORMAT_CHECKPOINT = "checkpoint"
+FORMAT_DELTA = "delta"
+
+_MISSING = object()
+
+
+def diff_states(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Tính delta giữa hai state đã serialize (`RuntimeState.to_serializable()`).
+    Delta rỗng ({}) nghĩa là hai state giống nhau.
+    """
+    delta: Dict[str, Any] = {}
+
+    changed = {
+        key: value
+        for key, value in current.items()
+        if key not in (DIALOGUE_FIELD, SUMMARY_FIELD) and previous.get(key, _MISSING) != value
+    }
+    removed = [
+        key for key in previous if key not in current and key not in (DIALOGUE_FIELD, SUMMARY_FIELD)
+    ]
+
+    old_dialogue = previous.get(DIALOGUE_FIELD) or []
+    new_dialogue = current.get(DIALOGUE_FIELD) or []
+    if new_dialogue[: len(old_dialogue)] == old_dialogue:
+        if len(new_dialogue) > len(old_dialogue):
+            delta["dialogue_append"] = new_dialogue[len(old_dialogue):]
+    else:
+        # Lịch sử bị cắt/viết lại (reset session...) thì ghi lại toàn bộ.
+        changed[DIALOGUE_FIELD] = new_dialogue
+
+    old_summary = previous.get(SUMMARY_FIELD) or {}
+    new_summary = current.get(SUMMARY_FIELD) or {}
+    summary_set = {
+        key: value for key, value in new_summary.items() if old_summary.get(key, _MISSING) != value
+    }
+    summary_unset = [key for key in old_summary if key not in new_summary]
+
+    if changed:
+        delta["set"] = changed
+    if removed:
+        delta["unset"] = removed
+    if summary_set:
+        delta["summary_set"] = summary_set
+    if summary_unset:
+        delta["summary_unset"] = summary_unset
+    return delta
+
+
+def apply_state_delta(state: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Áp delta lên state và trả về state mới; `state` đầu vào không bị sửa.
+    """
+    result = dict(state)
+    for key in delta.get("unset", []):
+        result.pop(key, None)
+    result.update(copy.deepcopy(delta.get("set", {})))
+
+    if "dialogue_append" in delta:
+        result[DIALOGUE_FIELD] = list(result.get(DIALOGUE_FIELD) or []) + copy.deepcopy(
+            delta["dialogue_append"]
+        )
+
+    if "summary_set" in delta or "summary_unset" in delta:
+        summary = dict(result.get(SUMMARY_FIELD) or {})
+        for key in delta.get("summary_unset", []):
+            summary.pop(key, None)
+        summary.update(copy.deepcopy(delta.get("summary_set", {})))
+        result[SUMMARY_FIELD] = summary
+    return result
+
+
+def state_update_operations(delta: Dict[str, Any], prefix: str = "state") -> Optional[Dict[str, Any]]:
+    """
+    Chuyển delta thành toán tử update MongoDB ($set/$unset/$push theo đường dẫn con) để chỉ
+    ghi phần thay đổi của document runtime state. Trả None khi có khóa không dùng được trong
+    đường dẫn (chứa "." hoặc bắt đầu bằng "$") — khi đó phải ghi đè cả document.
+    """
+    keys = list(delta.get("set", {})) + list(delta.get("unset", []))
+    keys += list(delta.get("summary_set", {})) + list(delta.get("summary_unset", []))
+    if any(not isinstance(key, str) or "." in key or key.startswith("$") for key in keys):
+        return None
+
+    set_ops: Dict[str, Any] = {f"{prefix}.{key}": value for key, value in delta.get("set", {}).items()}
+    set_ops.update(
+        {f"{prefix}.{SUMMARY_FIELD}.{key}": value for key, value in delta.get("summary_set", {}).items()}
+    )
+    unset_ops: Dict[str, str] = {f"{prefix}.{key}": "" for key in delta.get("unset", [])}
+    unset_ops.update({f"{prefix}.{SUMMARY_FIELD}.{key}": "" for key in delta.get("summary_unset", [])})
+
+    operations: Dict[str, Any] = {}
+    if set_ops:
+        operations["$set"] = set_ops
+    if unset_ops:
+        operations["$unset"] = unset_ops
+    if delta.get("dialogue_append"):
+        operations["$push"] = {f"{prefix}.{DIALOGUE_FIELD}": {"$each": delta["dialogue_append"]}}
+    return operations
+
+
+def replay_turns(
+    documents: Iterable[Dict[str, Any]],
+) -> Iterator[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+    """
+    Dựng lại state đầy đủ của từng turn log (đã sắp theo thứ tự ghi). Document cũ không có
+    `format` được coi là checkpoint. Delta đứng trước checkpoint đầu tiên không dựng được
+    nên trả về state None.
+    """
+    state: Optional[Dict[str, Any]] = None
+    for document in documents:
+        if document.get("format", FORMAT_CHECKPOINT) == FORMAT_CHECKPOINT:
+            state = document.get("state") or None
+        elif state is not None:
+            state = apply_state_delta(state, document.get("delta") or {})
+        yield document, state
+
+
+class StateJournal:
+    """
+    Ghi nhớ state đã lưu gần nhất của từng session trong tiến trình để repository chỉ phải
+    ghi delta: document runtime state được cập nhật theo đường dẫn con, còn turn log chỉ
+    lưu phần thay đổi kèm checkpoint đầy đủ sau mỗi `checkpoint_interval` lượt.
+
+    Session không có trong bộ nhớ (tiến trình vừa khởi động, bị đẩy khỏi LRU...) sẽ được ghi
+    lại đầy đủ ở lần kế tiếp nên không cần đọc lại MongoDB.
+    """
+
+    def __init__(self, *, checkpoint_interval: int = 20, max_sessions: int = 1024) -> None:
+        self.checkpoint_interval = max(1, checkpoint_interval)
+        self._saved = LRUCache(max_size=max_sessions)
+        self._journaled = LRUCache(max_size=max_sessions)
+
+    def plan_state_write(
+        self, session_id: str, snapshot: Dict[str, Any]
+    ) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """
+        Trả về (turn_count đã lưu trước đó, toán tử update) hoặc None nếu cần ghi đè cả document.
+        """
+        previous = self._saved.get(session_id)
+        if previous is None:
+            return None
+        operations = state_update_operations(diff_states(previous, snapshot))
+        if operations is None:
+            return None
+        return previous.get("turn_count", 0), operations
+
+    def remember_state(self, session_id: str, snapshot: Dict[str, Any]) -> None:
+        self._saved.set(session_id, snapshot)
+
+    def plan_turn(self, session_id: str, snapshot: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Các field journal của turn log: `format` cùng `state` (checkpoint) hoặc `delta`.
+        """
+        previous = self._journaled.get(session_id)
+        if previous is None or previous["since_checkpoint"] + 1 >= self.checkpoint_interval:
+            return {"format": FORMAT_CHECKPOINT, "state": snapshot}
+        return {"format": FORMAT_DELTA, "delta": diff_states(previous["state"], snapshot)}
+
+    def remember_turn(self, session_id: str, snapshot: Dict[str, Any], journal_fields: Dict[str, Any]) -> None:
+        previous = self._journaled.get(session_id)
+        if journal_fields["format"] == FORMAT_CHECKPOINT or previous is None:
+            since_checkpoint = 0
+        else:
+            since_checkpoint = previous["since_checkpoint"] + 1
+        self._journaled.set(
+            session_id,
+            {"state": snapshot, "since_checkpoint": since_checkpoint},
+        )
+
+    def forget(self, session_id: str) -> None:
+        self._saved.pop(session_id)
+        self._journaled.pop(session_id)
+
+
+class TurnSequencer:
+    """
+    Cấp `sequence` tăng dần cho turn log của từng session. `turn_index` (= turn_count) bị
+    đặt lại về 0 mỗi khi chuyển event nên không dùng để sắp thứ tự ghi được.
+
+    Số đã cấp gần nhất được nhớ trong tiến trình; session chưa có trong bộ nhớ thì repository
+    đọc `sequence` lớn nhất đã lưu rồi truyền vào `advance`.
+    """
+
+    def __init__(self, *, max_sessions: int = 1024) -> None:
+        self._last = LRUCache(max_size=max_sessions)
+
+    def peek(self, session_id: str) -> Optional[int]:
+        return self._last.get(session_id)
+
+    def advance(self, session_id: str, last_sequence: int) -> int:
+        sequence = last_sequence + 1
+        self._last.set(session_id, sequence)
+        return sequence
+
+    def forget(self, session_id: str) -> None:
+        self._last.pop(session_id)
+
+
+def last_sequence_of(document: Optional[Dict[str, Any]]) -> int:
+    return int(document.get("sequence") or 0) if document else 0
+
+
+def checkpoint_filter(session_id: str, sequence: Optional[int]) -> Dict[str, Any]:
+    query: Dict[str, Any] = {
+        "session_id": session_id,
+        # Turn log cũ (trước khi có journal) không có `format` và luôn chứa state đầy đủ.
+        "format": {"$in": [FORMAT_CHECKPOINT, None]},
+    }
+    if sequence is not None:
+        query["sequence"] = {"$lte": sequence}
+    return query
+
+
+def replay_filter(session_id: str, checkpoint: Dict[str, Any], sequence: Optional[int]) -> Dict[str, Any]:
+    query: Dict[str, Any] = {"session_id": session_id}
+    bounds: Dict[str, Any] = {}
+    # Checkpoint cũ không có `sequence`: đọc cả session, `state_after_checkpoint` bỏ phần trước nó.
+    if checkpoint.get("sequence") is not None:
+        bounds["$gte"] = checkpoint["sequence"]
+    if sequence is not None:
+        bounds["$lte"] = sequence
+    if bounds:
+        query["sequence"] = bounds
+    return query
+
+
+def state_after_checkpoint(
+    checkpoint: Dict[str, Any], documents: Iterable[Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """
+    Áp các delta ghi sau `checkpoint` (documents đã sắp theo sequence, _id) và trả về state cuối.
+    """
+    state: Optional[Dict[str, Any]] = None
+    started = False
+    ordered: List[Dict[str, Any]] = []
+    for document in documents:
+        if document.get("_id") == checkpoint.get("_id"):
+            started = True
+        if started:
+            ordered.append(document)
+    for _, state in replay_turns(ordered or [checkpoint]):
+        pass
+    return state
@@ -1,21 +1,155 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from pymongo import ASCENDING
+from pymongo import ASCENDING, DESCENDING
+from pymongo.asynchronous.collection import AsyncCollection
 from pymongo.collection import Collection
 from pymongo.errors import PyMongoError
 
 from casestudy.agent import RuntimeState
 
 from api_casestudy.core.config import get_settings
-from api_casestudy.db.database import get_mongo_client
+from api_casestudy.db.database import get_async_mongo_client, get_mongo_client
+from api_casestudy.services.state_journal import (
+    StateJournal,
+    TurnSequencer,
+    checkpoint_filter,
+    last_sequence_of,
+    replay_filter,
+    replay_turns,
+    state_after_checkpoint,
+)
+
+# `turn_index` chỉ để hiển thị (turn_count về 0 khi chuyển event); thứ tự ghi là `sequence`.
+TURN_SORT = [("sequence", ASCENDING), ("_id", ASCENDING)]
+LATEST_TURN_SORT = [("sequence", DESCENDING), ("_id", DESCENDING)]
+
+
+def _build_state_document(
+    session_id: str,
+    case_id: str,
+    state: RuntimeState,
+    snapshot: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    return {
+        "session_id": session_id,
+        "case_id": case_id,
+        "turn_count": state.turn_count,
+        "updated_at": datetime.now(timezone.utc),
+        "state": snapshot if snapshot is not None else state.to_serializable(),
+    }
+
+
+def _build_state_update(
+    journal: Optional[StateJournal],
+    session_id: str,
+    case_id: str,
+    state: RuntimeState,
+    snapshot: Dict[str, Any],
+) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    (filter, update) chỉ ghi phần state thay đổi; None khi phải ghi đè cả document.
+    Filter kèm turn_count đã lưu lần trước để không ghi delta lên document đã bị nơi khác sửa.
+    """
+    if journal is None:
+        return None
+    plan = journal.plan_state_write(session_id, snapshot)
+    if plan is None:
+        return None
+    previous_turn_count, operations = plan
+    operations.setdefault("$set", {}).update(
+        {
+            "case_id": case_id,
+            "turn_count": state.turn_count,
+            "updated_at": datetime.now(timezone.utc),
+        }
+    )
+    return {"session_id": session_id, "turn_count": previous_turn_count}, operations
+
+
+def _build_turn_document(
+    *,
+    session_id: str,
+    case_id: str,
+    sequence: int,
+    user_action: Optional[str],
+    state: RuntimeState,
+    metadata: Optional[Dict[str, Any]] = None,
+    journal_fields: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    turn_document: Dict[str, Any] = {
+        "session_id": session_id,
+        "case_id": case_id,
+        "sequence": sequence,
+        "turn_index": state.turn_count,
+        "user_action": user_action or state.user_action,
+        "ai_reply": state.ai_reply,
+        "current_event": state.current_event,
+        "created_at": datetime.now(timezone.utc),
+    }
+    if journal_fields is not None:
+        # Chế độ delta: state đầy đủ chỉ nằm trong checkpoint, các lượt khác lưu `delta`.
+        turn_document.update(journal_fields)
+    else:
+        turn_document.update(
+            scene_summary=state.scene_summary,
+            event_summary=state.event_summary,
+            state=state.to_serializable(),
+        )
+    if metadata:
+        turn_document["metadata"] = metadata
+    return turn_document
+
+
+def _state_from_document(document: Optional[Dict[str, Any]]) -> Optional[RuntimeState]:
+    if not document:
+        return None
+    state_payload = document.get("state")
+    if not state_payload:
+        return None
+    return RuntimeState.from_serialized(state_payload)
+
+
+def _metadata_from_document(document: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if not document:
+        return None
+    return {
+        "session_id": document["session_id"],
+        "case_id": document["case_id"],
+        "turn_count": document.get("turn_count", 0),
+        "updated_at": document.get("updated_at"),
+    }
+
+
+def _turn_from_document(doc: Dict[str, Any], state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    return {
+        "sequence": doc.get("sequence"),
+        "turn_index": doc.get("turn_index", 0),
+        "user_action": doc.get("user_action"),
+        "ai_reply": doc.get("ai_reply"),
+        "current_event": doc.get("current_event"),
+        "created_at": doc.get("created_at"),
+        "state": state if state is not None else doc.get("state", {}),
+    }
+
+
+def _create_journal() -> Optional[StateJournal]:
+    settings = get_settings()
+    if settings.state_persistence_mode != "delta":
+        return None
+    return StateJournal(checkpoint_interval=settings.state_checkpoint_interval)
 
 
 class ConversationStateRepository:
     """
     Lớp phụ trách lưu trữ RuntimeState và turn logs vào MongoDB.
+
+    Ở chế độ `STATE_PERSISTENCE_MODE=delta` (mặc định), document runtime state chỉ được cập
+    nhật phần thay đổi và turn log lưu delta so với lượt trước, kèm checkpoint đầy đủ mỗi
+    `STATE_CHECKPOINT_INTERVAL` lượt; `list_turns`/`load_state` dựng lại state đầy đủ.
+    Turn log được sắp và dựng lại theo `sequence` tăng dần của session.
     """
 
     def __init__(self) -> None:
@@ -25,6 +159,8 @@ class ConversationStateRepository:
 
         self._state_collection: Collection = db["runtime_states"]
         self._turn_collection: Collection = db["turn_logs"]
+        self._journal = _create_journal()
+        self._sequencer = TurnSequencer()
         self._ensure_indexes()
 
     def _ensure_indexes(self) -> None:
@@ -33,29 +169,32 @@ class ConversationStateRepository:
                 "session_id", unique=True, name="session_id_unique_idx"
             )
             self._turn_collection.create_index(
-                [("session_id", ASCENDING), ("turn_index", ASCENDING)],
-                name="session_turn_idx",
+                [("session_id", ASCENDING), ("sequence", ASCENDING)],
+                name="session_sequence_idx",
             )
         except PyMongoError:
             # Không chặn workflow nếu việc tạo index thất bại.
             pass
 
     def save_state(self, session_id: str, case_id: str, state: RuntimeState) -> None:
-        payload = {
-            "session_id": session_id,
-            "case_id": case_id,
-            "turn_count": state.turn_count,
-            "updated_at": datetime.now(timezone.utc),
-            "state": state.to_serializable(),
-        }
+        snapshot = state.to_serializable()
+        update = _build_state_update(self._journal, session_id, case_id, state, snapshot)
         try:
-            self._state_collection.replace_one(
-                {"session_id": session_id},
-                payload,
-                upsert=True,
+            matched = update is not None and (
+                self._state_collection.update_one(*update).matched_count > 0
             )
+            if not matched:
+                self._state_collection.replace_one(
+                    {"session_id": session_id},
+                    _build_state_document(session_id, case_id, state, snapshot),
+                    upsert=True,
+                )
         except PyMongoError as exc:
+            if self._journal is not None:
+                self._journal.forget(session_id)
             raise RuntimeError("Không thể lưu runtime state vào MongoDB.") from exc
+        if self._journal is not None:
+            self._journal.remember_state(session_id, snapshot)
 
     def append_turn(
         self,
@@ -66,68 +205,223 @@ class ConversationStateRepository:
         state: RuntimeState,
         metadata: Optional[Dict[str, Any]] = None,
     ) -> None:
-        turn_document: Dict[str, Any] = {
-            "session_id": session_id,
-            "case_id": case_id,
-            "turn_index": state.turn_count,
-            "user_action": user_action or state.user_action,
-            "ai_reply": state.ai_reply,
-            "current_event": state.current_event,
-            "scene_summary": state.scene_summary,
-            "event_summary": state.event_summary,
-            "state": state.to_serializable(),
-        }
-        if metadata:
-            turn_document["metadata"] = metadata
+        snapshot = state.to_serializable()
+        journal_fields = (
+            self._journal.plan_turn(session_id, snapshot) if self._journal is not None else None
+        )
         try:
+            last_sequence = self._sequencer.peek(session_id)
+            if last_sequence is None:
+                last_sequence = last_sequence_of(
+                    self._turn_collection.find_one({"session_id": session_id}, sort=LATEST_TURN_SORT)
+                )
+            turn_document = _build_turn_document(
+                session_id=session_id,
+                case_id=case_id,
+                sequence=self._sequencer.advance(session_id, last_sequence),
+                user_action=user_action,
+                state=state,
+                metadata=metadata,
+                journal_fields=journal_fields,
+            )
             self._turn_collection.insert_one(turn_document)
         except PyMongoError as exc:
+            self._sequencer.forget(session_id)
             raise RuntimeError("Không thể ghi turn log vào MongoDB.") from exc
+        if self._journal is not None:
+            self._journal.remember_turn(session_id, snapshot, journal_fields)
 
-    def load_state(self, session_id: str) -> Optional[RuntimeState]:
+    def load_state(self, session_id: str, sequence: Optional[int] = None) -> Optional[RuntimeState]:
+        """
+        State mới nhất của session, hoặc state sau turn log có `sequence` (dựng lại từ turn logs).
+        Thiếu document runtime state thì cũng dựng lại từ turn logs.
+        """
+        if sequence is None:
+            try:
+                document = self._state_collection.find_one({"session_id": session_id})
+            except PyMongoError as exc:
+                raise RuntimeError("Không thể đọc runtime state từ MongoDB.") from exc
+            if document:
+                return _state_from_document(document)
+        payload = self.reconstruct_state(session_id, sequence)
+        return RuntimeState.from_serialized(payload) if payload else None
+
+    def reconstruct_state(
+        self, session_id: str, sequence: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Dựng state (đã serialize) sau turn log `sequence` (mặc định lượt cuối): checkpoint gần
+        nhất trước đó cộng các delta phía sau.
+        """
         try:
-            document = self._state_collection.find_one({"session_id": session_id})
+            checkpoint = self._turn_collection.find_one(
+                checkpoint_filter(session_id, sequence),
+                sort=LATEST_TURN_SORT,
+            )
+            if checkpoint is None:
+                return None
+            documents = list(
+                self._turn_collection.find(replay_filter(session_id, checkpoint, sequence)).sort(
+                    TURN_SORT
+                )
+            )
         except PyMongoError as exc:
-            raise RuntimeError("Không thể đọc runtime state từ MongoDB.") from exc
-        if not document:
-            return None
-        state_payload = document.get("state")
-        if not state_payload:
-            return None
-        return RuntimeState.from_serialized(state_payload)
+            raise RuntimeError("Không thể dựng lại runtime state từ turn logs.") from exc
+        return state_after_checkpoint(checkpoint, documents)
 
     def get_state_metadata(self, session_id: str) -> Optional[Dict[str, Any]]:
         try:
             document = self._state_collection.find_one({"session_id": session_id})
         except PyMongoError as exc:
             raise RuntimeError("Không thể đọc metadata runtime state.") from exc
-        if not document:
-            return None
-        return {
-            "session_id": document["session_id"],
-            "case_id": document["case_id"],
-            "turn_count": document.get("turn_count", 0),
-            "updated_at": document.get("updated_at"),
-        }
+        return _metadata_from_document(document)
 
     def list_turns(self, session_id: str) -> List[Dict[str, Any]]:
         try:
-            cursor = self._turn_collection.find({"session_id": session_id}).sort(
-                "turn_index", ASCENDING
+            documents = list(
+                self._turn_collection.find({"session_id": session_id}).sort(TURN_SORT)
             )
         except PyMongoError as exc:
             raise RuntimeError("Không thể truy vấn turn logs từ MongoDB.") from exc
 
-        turns: List[Dict[str, Any]] = []
-        for doc in cursor:
-            turns.append(
-                {
-                    "turn_index": doc.get("turn_index", 0),
-                    "user_action": doc.get("user_action"),
-                    "ai_reply": doc.get("ai_reply"),
-                    "current_event": doc.get("current_event"),
-                    "created_at": doc.get("created_at"),
-                    "state": doc.get("state", {}),
-                }
+        return [_turn_from_document(doc, state) for doc, state in replay_turns(documents)]
+
+
+class AsyncConversationStateRepository:
+    """
+    Phiên bản async của ConversationStateRepository dùng AsyncMongoClient,
+    để các route async không chặn event loop khi ghi/đọc state.
+    """
+
+    def __init__(self) -> None:
+        settings = get_settings()
+        client = get_async_mongo_client()
+        db = client[settings.state_db]
+
+        self._state_collection: AsyncCollection = db["runtime_states"]
+        self._turn_collection: AsyncCollection = db["turn_logs"]
+        self._journal = _create_journal()
+        self._sequencer = TurnSequencer()
+        self._indexes_ready = False
+
+    async def _ensure_indexes(self) -> None:
+        if self._indexes_ready:
+            return
+        self._indexes_ready = True
+        try:
+            await self._state_collection.create_index(
+                "session_id", unique=True, name="session_id_unique_idx"
+            )
+            await self._turn_collection.create_index(
+                [("session_id", ASCENDING), ("sequence", ASCENDING)],
+                name="session_sequence_idx",
             )
-        return turns
+        except PyMongoError:
+            # Không chặn workflow nếu việc tạo index thất bại.
+            pass
+
+    async def save_state(self, session_id: str, case_id: str, state: RuntimeState) -> None:
+        await self._ensure_indexes()
+        snapshot = state.to_serializable()
+        update = _build_state_update(self._journal, session_id, case_id, state, snapshot)
+        try:
+            matched = update is not None and (
+                (await self._state_collection.update_one(*update)).matched_count > 0
+            )
+            if not matched:
+                await self._state_collection.replace_one(
+                    {"session_id": session_id},
+                    _build_state_document(session_id, case_id, state, snapshot),
+                    upsert=True,
+                )
+        except PyMongoError as exc:
+            if self._journal is not None:
+                self._journal.forget(session_id)
+            raise RuntimeError("Không thể lưu runtime state vào MongoDB.") from exc
+        if self._journal is not None:
+            self._journal.remember_state(session_id, snapshot)
+
+    async def append_turn(
+        self,
+        *,
+        session_id: str,
+        case_id: str,
+        user_action: Optional[str],
+        state: RuntimeState,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        await self._ensure_indexes()
+        snapshot = state.to_serializable()
+        journal_fields = (
+            self._journal.plan_turn(session_id, snapshot) if self._journal is not None else None
+        )
+        try:
+            last_sequence = self._sequencer.peek(session_id)
+            if last_sequence is None:
+                last_sequence = last_sequence_of(
+                    await self._turn_collection.find_one(
+                        {"session_id": session_id}, sort=LATEST_TURN_SORT
+                    )
+                )
+            turn_document = _build_turn_document(
+                session_id=session_id,
+                case_id=case_id,
+                sequence=self._sequencer.advance(session_id, last_sequence),
+                user_action=user_action,
+                state=state,
+                metadata=metadata,
+                journal_fields=journal_fields,
+            )
+            await self._turn_collection.insert_one(turn_document)
+        except PyMongoError as exc:
+            self._sequencer.forget(session_id)
+            raise RuntimeError("Không thể ghi turn log vào MongoDB.") from exc
+        if self._journal is not None:
+            self._journal.remember_turn(session_id, snapshot, journal_fields)
+
+    async def load_state(
+        self, session_id: str, sequence: Optional[int] = None
+    ) -> Optional[RuntimeState]:
+        if sequence is None:
+            try:
+                document = await self._state_collection.find_one({"session_id": session_id})
+            except PyMongoError as exc:
+                raise RuntimeError("Không thể đọc runtime state từ MongoDB.") from exc
+            if document:
+                return _state_from_document(document)
+        payload = await self.reconstruct_state(session_id, sequence)
+        return RuntimeState.from_serialized(payload) if payload else None
+
+    async def reconstruct_state(
+        self, session_id: str, sequence: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        try:
+            checkpoint = await self._turn_collection.find_one(
+                checkpoint_filter(session_id, sequence),
+                sort=LATEST_TURN_SORT,
+            )
+            if checkpoint is None:
+                return None
+            cursor = self._turn_collection.find(
+                replay_filter(session_id, checkpoint, sequence)
+            ).sort(TURN_SORT)
+            documents = [doc async for doc in cursor]
+        except PyMongoError as exc:
+            raise RuntimeError("Không thể dựng lại runtime state từ turn logs.") from exc
+        return state_after_checkpoint(checkpoint, documents)
+
+    async def get_state_metadata(self, session_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            document = await self._state_collection.find_one({"session_id": session_id})
+        except PyMongoError as exc:
+            raise RuntimeError("Không thể đọc metadata runtime state.") from exc
+        return _metadata_from_document(document)
+
+    async def list_turns(self, session_id: str) -> List[Dict[str, Any]]:
+        try:
+            cursor = self._turn_collection.find({"session_id": session_id}).sort(TURN_SORT)
+            documents = [doc async for doc in cursor]
+        except PyMongoError as exc:
+            raise RuntimeError("Không thể truy vấn turn logs từ MongoDB.") from exc
+
+        return [_turn_from_document(doc, state) for doc, state in replay_turns(documents)]
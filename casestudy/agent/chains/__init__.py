@@ -1,16 +1,27 @@
-from .base import create_chat_model
-from .scene import create_scene_summary_chain
+from .base import ChainCallable, ainvoke_chain, create_chat_model
+from .scene import create_cached_scene_summary_chain, create_scene_summary_chain
 from .persona import create_persona_digest_chain, create_persona_dialogue_chain
 from .policy import create_policy_lookup_chain
 from .action import create_action_evaluator_chain
+from .action_prescore import ActionPreScorer, grading_metrics
+from .action_score_cache import CriterionScoreCache, get_criterion_score_cache
 from .responder import create_responder_chain
+from .conversation import create_conversation_summary_chain
 
 __all__ = [
+    "ActionPreScorer",
+    "ChainCallable",
+    "CriterionScoreCache",
+    "ainvoke_chain",
     "create_chat_model",
     "create_scene_summary_chain",
+    "create_cached_scene_summary_chain",
     "create_persona_digest_chain",
     "create_persona_dialogue_chain",
     "create_policy_lookup_chain",
     "create_action_evaluator_chain",
+    "grading_metrics",
+    "get_criterion_score_cache",
     "create_responder_chain",
+    "create_conversation_summary_chain",
 ]
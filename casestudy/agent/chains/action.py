@@ -1,12 +1,26 @@
 from __future__ import annotations
 
 import json
-import copy
-from typing import Any, Dict, List, Optional
+import logging
+from typing import Any, Dict, List, Optional, Tuple
 
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import Runnable
+
+from .action_prescore import (
+    GRADER_CACHE,
+    GRADER_LLM,
+    GRADER_LLM_SMALL,
+    GRADER_LOCAL,
+    ActionPreScorer,
+    grading_metrics,
+)
+from .action_score_cache import CriterionScoreCache, ScoreScope
+from .base import ChainCallable
+from .budget import PromptBudget, PromptSection
+from ..const import DEFAULT_CASE_ID
+
+logger = logging.getLogger(__name__)
 
 SUCCESS_LEVEL_SCORES = [5, 4, 3, 2, 1]
 
@@ -38,6 +52,7 @@ def _normalize_levels(levels_data: Optional[List[Any]], fallback_description: st
 def normalize_success_criteria(raw_criteria: Optional[List[Any]]) -> List[Dict[str, Any]]:
     """
     Convert raw success criteria (strings or rubric dicts) into a consistent rubric structure.
+    An explicit `id` on a rubric dict is preserved.
     """
     if not raw_criteria:
         return []
@@ -54,12 +69,14 @@ def normalize_success_criteria(raw_criteria: Optional[List[Any]]) -> List[Dict[s
         if not description and not levels_data:
             continue
 
-        normalized.append(
-            {
-                "description": description or f"Tiêu chí {idx}",
-                "levels": _normalize_levels(levels_data, description),
-            }
-        )
+        entry: Dict[str, Any] = {
+            "description": description or f"Tiêu chí {idx}",
+            "levels": _normalize_levels(levels_data, description),
+        }
+        # Giữ ID do tác giả rubric đặt để EventGraph dùng làm ID tiêu chí ổn định.
+        if isinstance(criterion, dict) and str(criterion.get("id") or "").strip():
+            entry["id"] = str(criterion["id"]).strip()
+        normalized.append(entry)
     return normalized
 
 
@@ -83,6 +100,24 @@ def format_rubric_for_prompt(rubric: List[Dict[str, Any]]) -> str:
     return "\n".join(blocks)
 
 
+def _with_criterion_ids(
+    result: Dict[str, Any],
+    criterion_ids: Optional[List[str]],
+    satisfied: List[int],
+    partial: List[int],
+    remaining: List[int],
+) -> Dict[str, Any]:
+    """
+    Khi payload có `criterion_ids`, bổ sung ID tiêu chí theo từng nhóm để node action
+    lưu ID gọn vào event_summary thay vì cả rubric.
+    """
+    if criterion_ids is not None:
+        result["satisfied_criterion_ids"] = [criterion_ids[pos] for pos in satisfied]
+        result["partial_criterion_ids"] = [criterion_ids[pos] for pos in partial]
+        result["remaining_criterion_ids"] = [criterion_ids[pos] for pos in remaining]
+    return result
+
+
 def score_to_status(score: Optional[int]) -> str:
     if score is None:
         return "not_met"
@@ -97,7 +132,11 @@ def create_action_evaluator_chain(
     llm,
     *,
     parse_error_fallback: str = "pending",
-) -> Runnable:
+    small_llm=None,
+    prescorer: Optional[ActionPreScorer] = None,
+    score_cache: Optional[CriterionScoreCache] = None,
+    case_id: str = DEFAULT_CASE_ID,
+) -> ChainCallable:
     """
     Evaluate learner actions against canon event success criteria using an LLM.
 
@@ -107,6 +146,14 @@ def create_action_evaluator_chain(
     that are satisfied are removed from the outstanding list; the rest remain for future
     attempts. When every criterion is satisfied, the event passes.
 
+    Grading is cascaded: `prescorer` settles clear misses locally (non-attempts and
+    actions unrelated to every criterion; it never passes a criterion), `small_llm` grades the rest and the main
+    `llm` only sees turns the small model leaves borderline (a 2-3 score) or unparseable.
+    Before any of that, `score_cache` supplies per-criterion scores already given to
+    another learner for the same (near-)identical action; only the remaining criteria are
+    graded and the LLM scores are stored back. The result carries a `grader` field
+    ("cache", "local", "llm_small" or "llm") and each tier is counted in `grading_metrics`.
+
     Parameters
     ----------
     llm:
@@ -114,6 +161,13 @@ def create_action_evaluator_chain(
     parse_error_fallback:
         Status to emit when the LLM response cannot be parsed as the expected JSON
         schema. Defaults to `"pending"` so callers can retry with updated input.
+    small_llm:
+        Optional cheaper model tried before `llm`.
+    prescorer:
+        Optional local scorer; None sends every turn with an action to the LLM tiers.
+    score_cache:
+        Optional cross-learner cache keyed by `case_id`, the payload's `event_id` and
+        criterion ID; used only when the payload carries an `event_id`.
     """
 
     if llm is None:
@@ -155,44 +209,66 @@ def create_action_evaluator_chain(
 
     parser = StrOutputParser()
     chain = prompt | llm | parser
+    small_chain = prompt | small_llm | parser if small_llm is not None else None
+    # Rubric quyết định điểm nên không bao giờ bị rút gọn; chỉ cắt hành động quá dài.
+    budget = PromptBudget(
+        "action",
+        [
+            PromptSection("user_action", priority=1, min_tokens=200),
+            PromptSection("success_criteria", priority=2, fixed=True),
+        ],
+    )
 
-    def evaluate(payload: Dict[str, Any]) -> Dict[str, Any]:
+    def _prepare(payload: Dict[str, Any]):
+        """
+        Trả về (kết quả sớm, None) khi không cần gọi LLM, ngược lại (None, (inputs, rubric)).
+        """
         user_action = (payload.get("user_action") or "").strip()
         success_criteria_input: Optional[List[Any]] = payload.get("success_criteria")
         if success_criteria_input is None:
             # Backwards compatibility with older payloads.
             success_criteria_input = payload.get("required_actions", [])
 
-        rubric_criteria = normalize_success_criteria(success_criteria_input)
+        # Node action gửi kèm rubric đã chuẩn hóa, bản render và ID tiêu chí lấy từ cache.
+        rubric_text: Optional[str] = payload.get("rubric_text")
+        criterion_ids: Optional[List[str]] = payload.get("criterion_ids")
+        if rubric_text is None:
+            rubric_criteria = normalize_success_criteria(success_criteria_input)
+        else:
+            rubric_criteria = list(success_criteria_input)
 
+        # Hai trường hợp không cần chấm vẫn được tính vào tầng local của grading_metrics.
         if not rubric_criteria:
-            return {
+            grading_metrics.record(GRADER_LOCAL)
+            return _with_criterion_ids({
                 "status": "pass",
                 "matched_actions": [],
                 "satisfied_success_criteria": [],
                 "partial_success_criteria": [],
                 "remaining_success_criteria": [],
                 "scores": [],
-            }
+                "grader": GRADER_LOCAL,
+            }, criterion_ids, [], [], []), None
 
         if not user_action:
-            return {
+            grading_metrics.record(GRADER_LOCAL)
+            return _with_criterion_ids({
                 "status": "pending",
                 "matched_actions": [],
                 "satisfied_success_criteria": [],
                 "partial_success_criteria": [],
                 "remaining_success_criteria": rubric_criteria,
                 "scores": [],
-            }
+                "grader": GRADER_LOCAL,
+            }, criterion_ids, [], [], list(range(len(rubric_criteria)))), None
 
-        rubric_text = format_rubric_for_prompt(rubric_criteria)
+        inputs = budget.fit({
+            "user_action": user_action,
+            "success_criteria": rubric_text or format_rubric_for_prompt(rubric_criteria),
+        })
+        return None, (user_action, inputs, rubric_criteria, criterion_ids)
 
-        response = chain.invoke(
-            {
-                "user_action": user_action,
-                "success_criteria": rubric_text,
-            }
-        )
+    def _parse(response: str) -> Dict[int, Dict[str, Any]]:
         try:
             parsed = json.loads(response)
         except json.JSONDecodeError:
@@ -219,21 +295,34 @@ def create_action_evaluator_chain(
             score = max(min(score, SUCCESS_LEVEL_SCORES[0]), SUCCESS_LEVEL_SCORES[-1])
             analysis = str(item.get("analysis", "")).strip()
             evaluation_map[idx] = {"score": score, "analysis": analysis}
-
+        return evaluation_map
+
+    def _interpret(
+        evaluation_map: Dict[int, Dict[str, Any]],
+        rubric_criteria: List[Dict[str, Any]],
+        criterion_ids: Optional[List[str]],
+        grader: str,
+    ) -> Dict[str, Any]:
+        grading_metrics.record(grader)
         if not evaluation_map:
-            return {
+            return _with_criterion_ids({
                 "status": parse_error_fallback,
                 "matched_actions": [],
                 "satisfied_success_criteria": [],
                 "partial_success_criteria": [],
                 "remaining_success_criteria": rubric_criteria,
                 "scores": [],
-            }
+                "grader": grader,
+            }, criterion_ids, [], [], list(range(len(rubric_criteria))))
 
         satisfied: List[str] = []
         partial: List[str] = []
         remaining: List[Dict[str, Any]] = []
         scores: List[Dict[str, Any]] = []
+        # Vị trí (0-based) của tiêu chí theo từng nhóm, dùng để trả về ID tiêu chí.
+        satisfied_pos: List[int] = []
+        partial_pos: List[int] = []
+        remaining_pos: List[int] = []
 
         for idx, criterion in enumerate(rubric_criteria, start=1):
             eval_result = evaluation_map.get(idx) or {}
@@ -252,13 +341,17 @@ def create_action_evaluator_chain(
 
             if status_value == "satisfied":
                 satisfied.append(criterion["description"])
+                satisfied_pos.append(idx - 1)
             elif status_value == "partial":
                 partial.append(criterion["description"])
+                partial_pos.append(idx - 1)
                 score_numeric = score_value if isinstance(score_value, int) else None
                 if score_numeric is None or score_numeric < 3:
-                    remaining.append(copy.deepcopy(criterion))
+                    remaining.append(criterion)
+                    remaining_pos.append(idx - 1)
             else:
-                remaining.append(copy.deepcopy(criterion))
+                remaining.append(criterion)
+                remaining_pos.append(idx - 1)
 
         if not remaining:
             status = "pass"
@@ -267,13 +360,136 @@ def create_action_evaluator_chain(
         else:
             status = "pending"
 
-        return {
+        return _with_criterion_ids({
             "status": status,
             "matched_actions": satisfied,
             "satisfied_success_criteria": satisfied,
             "partial_success_criteria": partial,
             "remaining_success_criteria": remaining,
             "scores": scores,
-        }
+            "grader": grader,
+        }, criterion_ids, satisfied_pos, partial_pos, remaining_pos)
+
+    def _settled(evaluation_map: Dict[int, Dict[str, Any]], criteria_count: int) -> bool:
+        """
+        Kết quả của model nhỏ được dùng khi đủ điểm cho mọi tiêu chí và không có điểm 2-3.
+        """
+        return len(evaluation_map) >= criteria_count and all(
+            item["score"] not in (2, 3) for item in evaluation_map.values()
+        )
 
-    return evaluate
+    model_name = str(getattr(llm, "model_name", None) or type(llm).__name__)
+
+    def _cache_scope(
+        payload: Dict[str, Any],
+        rubric_criteria: List[Dict[str, Any]],
+        criterion_ids: Optional[List[str]],
+    ) -> Tuple[Optional[ScoreScope], List[Tuple[str, Dict[str, Any]]]]:
+        event_id = payload.get("event_id")
+        if score_cache is None or not event_id:
+            return None, []
+        keys = criterion_ids or [criterion["description"] for criterion in rubric_criteria]
+        return (case_id, model_name, event_id), list(zip(keys, rubric_criteria))
+
+    def _subset(
+        user_action: str,
+        inputs: Dict[str, Any],
+        rubric_criteria: List[Dict[str, Any]],
+        pending: List[int],
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        if len(pending) == len(rubric_criteria):
+            return inputs, rubric_criteria
+        subset = [rubric_criteria[pos - 1] for pos in pending]
+        return budget.fit({
+            "user_action": user_action,
+            "success_criteria": format_rubric_for_prompt(subset),
+        }), subset
+
+    def _grade(
+        user_action: str, inputs: Dict[str, Any], rubric_criteria: List[Dict[str, Any]]
+    ) -> Tuple[Dict[int, Dict[str, Any]], str]:
+        if prescorer is not None:
+            local = prescorer.score(user_action, rubric_criteria)
+            if local is not None:
+                return local, GRADER_LOCAL
+        if small_chain is not None:
+            try:
+                evaluation_map = _parse(small_chain.invoke(inputs))
+            except Exception as exc:
+                logger.warning("Model chấm nhỏ lỗi, chuyển lên model chính: %s", exc)
+                evaluation_map = {}
+            if _settled(evaluation_map, len(rubric_criteria)):
+                return evaluation_map, GRADER_LLM_SMALL
+        return _parse(chain.invoke(inputs)), GRADER_LLM
+
+    async def _agrade(
+        user_action: str, inputs: Dict[str, Any], rubric_criteria: List[Dict[str, Any]]
+    ) -> Tuple[Dict[int, Dict[str, Any]], str]:
+        if prescorer is not None:
+            local = await prescorer.ascore(user_action, rubric_criteria)
+            if local is not None:
+                return local, GRADER_LOCAL
+        if small_chain is not None:
+            try:
+                evaluation_map = _parse(await small_chain.ainvoke(inputs))
+            except Exception as exc:
+                logger.warning("Model chấm nhỏ lỗi, chuyển lên model chính: %s", exc)
+                evaluation_map = {}
+            if _settled(evaluation_map, len(rubric_criteria)):
+                return evaluation_map, GRADER_LLM_SMALL
+        return _parse(await chain.ainvoke(inputs)), GRADER_LLM
+
+    def _merge(
+        cached: Dict[int, Dict[str, Any]],
+        pending: List[int],
+        graded: Dict[int, Dict[str, Any]],
+        grader: str,
+        scope: Optional[ScoreScope],
+        keyed: List[Tuple[str, Dict[str, Any]]],
+        user_action: str,
+        vector,
+    ) -> Dict[int, Dict[str, Any]]:
+        """
+        Đưa điểm của các tiêu chí vừa chấm về vị trí trong rubric đầy đủ, lưu điểm LLM vào cache.
+        Lỗi parse (không có điểm nào) giữ nguyên hành vi cũ: trả về map rỗng.
+        """
+        if not graded:
+            return {}
+        fresh = {pending[idx - 1]: item for idx, item in graded.items() if 0 < idx <= len(pending)}
+        if scope is not None and grader in (GRADER_LLM, GRADER_LLM_SMALL):
+            score_cache.store(scope, keyed, user_action, fresh, vector)
+        return {**cached, **fresh}
+
+    def evaluate(payload: Dict[str, Any]) -> Dict[str, Any]:
+        early_result, prepared = _prepare(payload)
+        if prepared is None:
+            return early_result
+        user_action, inputs, rubric_criteria, criterion_ids = prepared
+        scope, keyed = _cache_scope(payload, rubric_criteria, criterion_ids)
+        cached, vector = score_cache.lookup(scope, keyed, user_action) if scope else ({}, None)
+        pending = [pos for pos in range(1, len(rubric_criteria) + 1) if pos not in cached]
+        if not pending:
+            return _interpret(cached, rubric_criteria, criterion_ids, GRADER_CACHE)
+        sub_inputs, subset = _subset(user_action, inputs, rubric_criteria, pending)
+        graded, grader = _grade(user_action, sub_inputs, subset)
+        evaluation_map = _merge(cached, pending, graded, grader, scope, keyed, user_action, vector)
+        return _interpret(evaluation_map, rubric_criteria, criterion_ids, grader)
+
+    async def aevaluate(payload: Dict[str, Any]) -> Dict[str, Any]:
+        early_result, prepared = _prepare(payload)
+        if prepared is None:
+            return early_result
+        user_action, inputs, rubric_criteria, criterion_ids = prepared
+        scope, keyed = _cache_scope(payload, rubric_criteria, criterion_ids)
+        cached, vector = (
+            await score_cache.alookup(scope, keyed, user_action) if scope else ({}, None)
+        )
+        pending = [pos for pos in range(1, len(rubric_criteria) + 1) if pos not in cached]
+        if not pending:
+            return _interpret(cached, rubric_criteria, criterion_ids, GRADER_CACHE)
+        sub_inputs, subset = _subset(user_action, inputs, rubric_criteria, pending)
+        graded, grader = await _agrade(user_action, sub_inputs, subset)
+        evaluation_map = _merge(cached, pending, graded, grader, scope, keyed, user_action, vector)
+        return _interpret(evaluation_map, rubric_criteria, criterion_ids, grader)
+
+    return ChainCallable(evaluate, aevaluate)
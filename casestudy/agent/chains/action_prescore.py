@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..const import ACTION_PRESCORE_EMBED_MISS
+
+logger = logging.getLogger(__name__)
+
+GRADER_CACHE = "cache"
+GRADER_LOCAL = "local"
+GRADER_LLM_SMALL = "llm_small"
+GRADER_LLM = "llm"
+GRADER_TIERS = (GRADER_CACHE, GRADER_LOCAL, GRADER_LLM_SMALL, GRADER_LLM)
+
+_NON_WORD_RE = re.compile(r"[^0-9a-z]+")
+_PUNCTUATION_RE = re.compile(r"[\W_]+")
+# Từ chức năng không mang nội dung hành động (đã bỏ dấu).
+_STOPWORDS = frozenset(
+    "va voi cho cua la thi ma de o tai trong tren duoi nay kia do mot cac nhung "
+    "toi ban anh chi em ho minh se da dang can phai hay hoac neu khi roi".split()
+)
+# Từ phủ định (giữ dấu): "không gọi 115" ngược nghĩa với "gọi 115" dù gần như cùng chữ.
+NEGATIONS = frozenset("không chưa chẳng chả đừng ko khong".split())
+# Câu không phải là một nỗ lực hành động: chấm 1 cho mọi tiêu chí mà không cần LLM.
+# So trên văn bản giữ dấu; dạng không dấu chỉ giữ lại khi không trùng với từ có nghĩa khác
+# ("da" có thể là "dạ" hay "đá", "roi" là "rồi" hay "rơi").
+_NON_ATTEMPTS = frozenset(
+    {
+        "ok", "oke", "okay", "uh", "um", "uhm", "hmm", "à", "ừ", "ừm", "dạ", "vâng", "có",
+        "rồi", "xong", "tiếp", "tiếp tục", "tiếp đi", "next", "continue", "bắt đầu",
+        "ok tiếp tục", "tôi không biết", "không biết", "chưa biết", "sao", "gì",
+        "tiep tuc", "tiep di", "bat dau", "ok tiep tuc", "khong biet", "toi khong biet",
+        "chua biet",
+    }
+)
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """
+    NFC, chữ thường (casefold), thay dấu câu bằng khoảng trắng; giữ nguyên dấu tiếng Việt
+    ("bó nẹp" và "bỏ nẹp" là hai hành động khác nhau).
+    """
+    normalized = unicodedata.normalize("NFC", text or "").casefold()
+    return " ".join(_PUNCTUATION_RE.sub(" ", normalized).split())
+
+
+def fold_vietnamese(text: Optional[str]) -> str:
+    """
+    Bỏ dấu tiếng Việt, chữ thường, thay ký tự không phải chữ/số bằng khoảng trắng.
+    """
+    normalized = unicodedata.normalize("NFD", (text or "").replace("đ", "d").replace("Đ", "D"))
+    without_marks = "".join(ch for ch in normalized if unicodedata.category(ch) != "Mn")
+    return _NON_WORD_RE.sub(" ", without_marks.lower()).strip()
+
+
+def has_negation(text: Optional[str]) -> bool:
+    return bool(set(normalize_text(text).split()) & NEGATIONS)
+
+
+def _content_tokens(folded: str) -> FrozenSet[str]:
+    return frozenset(token for token in folded.split() if token not in _STOPWORDS)
+
+
+class GradingMetrics:
+    """
+    Số lượt chấm theo tầng (cache / local / llm_small / llm) trong toàn tiến trình.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {tier: 0 for tier in GRADER_TIERS}
+
+    def record(self, tier: str) -> None:
+        with self._lock:
+            self._counts[tier] = self._counts.get(tier, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        total = sum(counts.values())
+        return {
+            "turns": total,
+            "by_grader": counts,
+            "local_rate": round(counts[GRADER_LOCAL] / total, 3) if total else 0.0,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = {tier: 0 for tier in GRADER_TIERS}
+
+
+grading_metrics = GradingMetrics()
+
+
+class ActionPreScorer:
+    """
+    Chấm sơ bộ một lượt học viên trước khi gọi LLM. Tầng này chỉ chấm các trường hợp chắc
+    chắn không đạt: câu không phải nỗ lực hành động ("ok", "tiếp tục") và hành động hoàn toàn
+    không liên quan đến mọi tiêu chí còn lại (không chung từ nào, cosine embedding thấp).
+
+    Mọi trường hợp có thể đạt đều trả None để chain chuyển lên LLM: khớp chữ không phân biệt
+    được "bó nẹp" với "bỏ nẹp" hay "... rồi tháo ra". Không có embeddings thì chỉ các câu
+    không phải nỗ lực hành động được chấm tại chỗ.
+    """
+
+    def __init__(self, embeddings=None, *, embed_miss: float = ACTION_PRESCORE_EMBED_MISS) -> None:
+        self.embeddings = embeddings
+        self.embed_miss = embed_miss
+
+    def score(
+        self, user_action: str, rubric: Sequence[Dict[str, Any]]
+    ) -> Optional[Dict[int, Dict[str, Any]]]:
+        if normalize_text(user_action) in _NON_ATTEMPTS:
+            return self._non_attempt(rubric)
+        if self.embeddings is None:
+            return None
+        candidates = self._candidates(rubric)
+        try:
+            texts = [user_action, *(text for _, text in candidates)]
+            similarities = self._cosines(self.embeddings.embed_documents(texts))
+        except Exception as exc:
+            logger.warning("Không tính được embedding cho chấm sơ bộ: %s", exc)
+            return None
+        return self._decide(user_action, rubric, candidates, similarities)
+
+    async def ascore(
+        self, user_action: str, rubric: Sequence[Dict[str, Any]]
+    ) -> Optional[Dict[int, Dict[str, Any]]]:
+        if normalize_text(user_action) in _NON_ATTEMPTS:
+            return self._non_attempt(rubric)
+        if self.embeddings is None:
+            return None
+        candidates = self._candidates(rubric)
+        try:
+            texts = [user_action, *(text for _, text in candidates)]
+            similarities = self._cosines(await self.embeddings.aembed_documents(texts))
+        except Exception as exc:
+            logger.warning("Không tính được embedding cho chấm sơ bộ: %s", exc)
+            return None
+        return self._decide(user_action, rubric, candidates, similarities)
+
+    @staticmethod
+    def _non_attempt(rubric: Sequence[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        return {
+            idx: {"score": 1, "analysis": "Lượt này không mô tả hành động nào."}
+            for idx in range(1, len(rubric) + 1)
+        }
+
+    @staticmethod
+    def _candidates(rubric: Sequence[Dict[str, Any]]) -> List[Tuple[int, str]]:
+        """
+        Các đoạn so khớp của rubric: `(id tiêu chí, mô tả chung hoặc mô tả một mức)`.
+        """
+        candidates: List[Tuple[int, str]] = []
+        for idx, criterion in enumerate(rubric, start=1):
+            candidates.append((idx, criterion.get("description", "")))
+            for level in criterion.get("levels", []):
+                descriptor = str(level.get("descriptor", "")).strip()
+                if descriptor:
+                    candidates.append((idx, descriptor))
+        return candidates
+
+    @staticmethod
+    def _cosines(vectors: Sequence[Sequence[float]]) -> List[float]:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1)
+        norms[norms == 0] = 1.0
+        matrix = matrix / norms[:, None]
+        return (matrix[1:] @ matrix[0]).tolist()
+
+    def _decide(
+        self,
+        user_action: str,
+        rubric: Sequence[Dict[str, Any]],
+        candidates: List[Tuple[int, str]],
+        similarities: List[float],
+    ) -> Optional[Dict[int, Dict[str, Any]]]:
+        # Chung từ được so trên dạng bỏ dấu: khớp rộng hơn nên chỉ làm tầng local chấm ít hơn.
+        action_tokens = _content_tokens(fold_vietnamese(user_action))
+        related = set()
+        for (idx, text), cosine in zip(candidates, similarities):
+            if cosine >= self.embed_miss or _content_tokens(fold_vietnamese(text)) & action_tokens:
+                related.add(idx)
+        if related:
+            return None
+        return {
+            idx: {"score": 1, "analysis": "Hành động không liên quan đến tiêu chí này."}
+            for idx in range(1, len(rubric) + 1)
+        }
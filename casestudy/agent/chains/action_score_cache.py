@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ...app.core.config import get_settings
+from ...utils.cache import LRUCache, hash_text
+from ..const import ACTION_SCORE_CACHE_BUCKET_SIZE
+from .action_prescore import has_negation, normalize_text
+
+logger = logging.getLogger(__name__)
+
+# (case_id, model, event_id)
+ScoreScope = Tuple[str, str, str]
+
+
+def criterion_version(criterion: Dict[str, Any]) -> str:
+    """
+    Phiên bản của một tiêu chí theo nội dung rubric (mô tả + các mức): sửa rubric thì
+    điểm đã cache của tiêu chí đó tự hết hiệu lực.
+    """
+    return hash_text(json.dumps(criterion, ensure_ascii=False, sort_keys=True))[:16]
+
+
+class CriterionScoreCache:
+    """
+    Cache điểm theo từng tiêu chí dùng chung giữa các học viên: khóa
+    `(case_id, model, event_id, criterion id, phiên bản rubric, hành động đã chuẩn hóa)`,
+    giá trị là `{"score", "analysis"}` do LLM chấm. Hành động được chuẩn hóa giữ dấu
+    ("bó nẹp" và "bỏ nẹp" không dùng chung điểm).
+
+    Khi có `embeddings` và `similarity` > 0, hành động chưa gặp nguyên văn còn được so với
+    các hành động đã chấm của cùng tiêu chí; cosine >= `similarity` thì dùng lại điểm đó.
+    Hành động có phủ định ("không gọi 115") chỉ được so với hành động cũng có phủ định.
+    """
+
+    def __init__(
+        self,
+        *,
+        embeddings=None,
+        max_size: int = 4_096,
+        ttl_seconds: Optional[float] = None,
+        similarity: float = 0.0,
+        bucket_size: int = ACTION_SCORE_CACHE_BUCKET_SIZE,
+    ) -> None:
+        self.embeddings = embeddings if similarity > 0 else None
+        self.similarity = similarity
+        self.bucket_size = max(1, bucket_size)
+        self.exact = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self.near = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self._lock = threading.Lock()
+        self.near_hits = 0
+
+    def lookup(
+        self,
+        scope: ScoreScope,
+        criteria: Sequence[Tuple[str, Dict[str, Any]]],
+        user_action: str,
+    ) -> Tuple[Dict[int, Dict[str, Any]], Optional[np.ndarray]]:
+        """
+        Trả về điểm đã cache theo vị trí tiêu chí (1-based) và vector của hành động
+        (nếu đã phải tính) để `store` dùng lại.
+        """
+        hits, pending = self._exact(scope, criteria, user_action)
+        if not pending or self.embeddings is None:
+            return hits, None
+        try:
+            vector = _unit(self.embeddings.embed_query(user_action))
+        except Exception as exc:
+            logger.warning("Không tính được embedding cho cache điểm: %s", exc)
+            return hits, None
+        hits.update(self._near(scope, criteria, pending, vector, has_negation(user_action)))
+        return hits, vector
+
+    async def alookup(
+        self,
+        scope: ScoreScope,
+        criteria: Sequence[Tuple[str, Dict[str, Any]]],
+        user_action: str,
+    ) -> Tuple[Dict[int, Dict[str, Any]], Optional[np.ndarray]]:
+        hits, pending = self._exact(scope, criteria, user_action)
+        if not pending or self.embeddings is None:
+            return hits, None
+        try:
+            vector = _unit(await self.embeddings.aembed_query(user_action))
+        except Exception as exc:
+            logger.warning("Không tính được embedding cho cache điểm: %s", exc)
+            return hits, None
+        hits.update(self._near(scope, criteria, pending, vector, has_negation(user_action)))
+        return hits, vector
+
+    def store(
+        self,
+        scope: ScoreScope,
+        criteria: Sequence[Tuple[str, Dict[str, Any]]],
+        user_action: str,
+        evaluations: Dict[int, Dict[str, Any]],
+        vector: Optional[np.ndarray] = None,
+    ) -> None:
+        action_key = _normalize_action(user_action)
+        for pos, (criterion_key, criterion) in enumerate(criteria, start=1):
+            evaluation = evaluations.get(pos)
+            if evaluation is None:
+                continue
+            bucket_key = self._bucket_key(scope, criterion_key, criterion)
+            value = {"score": evaluation["score"], "analysis": evaluation.get("analysis", "")}
+            self.exact.set((*bucket_key, action_key), value)
+            if vector is not None:
+                near_key = (*bucket_key, has_negation(user_action))
+                with self._lock:
+                    bucket = list(self.near.get(near_key) or [])
+                    bucket.append((vector, value))
+                    self.near.set(near_key, bucket[-self.bucket_size:])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            near_hits = self.near_hits
+        return {"exact": self.exact.stats(), "near_hits": near_hits, "similarity": self.similarity}
+
+    def _bucket_key(
+        self, scope: ScoreScope, criterion_key: str, criterion: Dict[str, Any]
+    ) -> Tuple[Hashable, ...]:
+        return (*scope, criterion_key, criterion_version(criterion))
+
+    def _exact(
+        self,
+        scope: ScoreScope,
+        criteria: Sequence[Tuple[str, Dict[str, Any]]],
+        user_action: str,
+    ) -> Tuple[Dict[int, Dict[str, Any]], List[int]]:
+        action_key = _normalize_action(user_action)
+        hits: Dict[int, Dict[str, Any]] = {}
+        pending: List[int] = []
+        for pos, (criterion_key, criterion) in enumerate(criteria, start=1):
+            value = self.exact.get((*self._bucket_key(scope, criterion_key, criterion), action_key))
+            if value is None:
+                pending.append(pos)
+            else:
+                hits[pos] = dict(value)
+        return hits, pending
+
+    def _near(
+        self,
+        scope: ScoreScope,
+        criteria: Sequence[Tuple[str, Dict[str, Any]]],
+        pending: Sequence[int],
+        vector: np.ndarray,
+        negated: bool,
+    ) -> Dict[int, Dict[str, Any]]:
+        hits: Dict[int, Dict[str, Any]] = {}
+        for pos in pending:
+            criterion_key, criterion = criteria[pos - 1]
+            bucket = self.near.get((*self._bucket_key(scope, criterion_key, criterion), negated))
+            if not bucket:
+                continue
+            matrix = np.stack([item[0] for item in bucket])
+            similarities = matrix @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.similarity:
+                hits[pos] = dict(bucket[best][1])
+        if hits:
+            with self._lock:
+                self.near_hits += len(hits)
+        return hits
+
+
+def _normalize_action(user_action: str) -> str:
+    return normalize_text(user_action)
+
+
+def _unit(vector: Sequence[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(array))
+    return array / norm if norm else array
+
+
+_score_cache: Optional[CriterionScoreCache] = None
+_score_cache_lock = threading.Lock()
+
+
+def get_criterion_score_cache(embeddings=None) -> Optional[CriterionScoreCache]:
+    """
+    Cache điểm dùng chung của tiến trình (mọi graph/session), None nếu bị tắt trong settings.
+    """
+    global _score_cache
+    settings = get_settings()
+    if not settings.action_score_cache_enabled:
+        return None
+    with _score_cache_lock:
+        if _score_cache is None:
+            _score_cache = CriterionScoreCache(
+                embeddings=embeddings,
+                max_size=settings.action_score_cache_size,
+                ttl_seconds=settings.action_score_cache_ttl_seconds,
+                similarity=settings.action_score_cache_similarity,
+            )
+        return _score_cache
+
+
+def criterion_score_cache_stats() -> Optional[Dict[str, Any]]:
+    """
+    Thống kê cache điểm mà không khởi tạo nó (None nếu chưa graph nào dùng).
+    """
+    with _score_cache_lock:
+        cache = _score_cache
+    return cache.stats() if cache is not None else None
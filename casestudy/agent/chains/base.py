@@ -1,16 +1,74 @@
 from __future__ import annotations
 
-from typing import Optional
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional
 
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
 from langchain_openai import ChatOpenAI
 
+from ...app.core.config import get_settings
+from ...utils.llm_cache import get_llm_response_cache
+from ...utils.llm_scheduler import estimate_tokens, get_llm_scheduler
 from ..const import DEFAULT_MODEL_NAME
 
 
+class ScheduledChatOpenAI(ChatOpenAI):
+    """
+    ChatOpenAI đi qua LLM scheduler dùng chung: mỗi lời gọi (kể cả stream) xếp hàng theo
+    lớp ưu tiên hiện tại (`llm_priority`) và quota RPM/TPM của cả tiến trình.
+    """
+
+    def _reserved_tokens(self, messages: List[BaseMessage], kwargs: Dict[str, Any]) -> int:
+        prompt_tokens = sum(estimate_tokens(str(message.content)) for message in messages)
+        completion_tokens = (
+            kwargs.get("max_tokens")
+            or self.max_tokens
+            or get_settings().llm_completion_tokens_estimate
+        )
+        return prompt_tokens + completion_tokens
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        generate = super()._generate
+        return get_llm_scheduler().run(
+            lambda: generate(messages, stop=stop, run_manager=run_manager, **kwargs),
+            tokens=self._reserved_tokens(messages, kwargs),
+            used_tokens=_total_tokens,
+        )
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        agenerate = super()._agenerate
+        return await get_llm_scheduler().arun(
+            lambda: agenerate(messages, stop=stop, run_manager=run_manager, **kwargs),
+            tokens=self._reserved_tokens(messages, kwargs),
+            used_tokens=_total_tokens,
+        )
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        stream = super()._stream
+        return get_llm_scheduler().stream(
+            lambda: stream(messages, stop=stop, run_manager=run_manager, **kwargs),
+            tokens=self._reserved_tokens(messages, kwargs),
+        )
+
+    def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        astream = super()._astream
+        return get_llm_scheduler().astream(
+            lambda: astream(messages, stop=stop, run_manager=run_manager, **kwargs),
+            tokens=self._reserved_tokens(messages, kwargs),
+        )
+
+
+def _total_tokens(result: ChatResult) -> Optional[int]:
+    usage = (result.llm_output or {}).get("token_usage") or {}
+    return usage.get("total_tokens")
+
+
 def create_chat_model(
     model_name: Optional[str] = None,
     *,
     temperature: float = 0.2,
+    cache_namespace: Optional[str] = None,
 ) -> ChatOpenAI:
     """
     Factory to keep a single place for ChatOpenAI configuration.
@@ -21,6 +79,56 @@ def create_chat_model(
         Override default OpenAI chat model if provided.
     temperature:
         Creativity level for downstream prompts.
+    cache_namespace:
+        Tên chain muốn dùng cache phản hồi khớp chính xác (xem `LLM_CACHE_CHAINS`);
+        bỏ trống với chain cần câu trả lời mới mỗi lần.
+
+    Lỗi 429/tạm thời do scheduler xếp lại hàng đợi nên client OpenAI không tự retry.
+    Cache hit trả về trước khi vào scheduler nên không tốn quota.
     """
     resolved_model = model_name or DEFAULT_MODEL_NAME
-    return ChatOpenAI(model=resolved_model, temperature=temperature)
+    cache = get_llm_response_cache(cache_namespace) if cache_namespace else None
+    return ScheduledChatOpenAI(
+        model=resolved_model,
+        temperature=temperature,
+        max_retries=0,
+        cache=cache,
+    )
+
+
+class ChainCallable:
+    """
+    Pair the sync and async entry points of a chain.
+
+    Nodes keep calling `chain(payload)` on the sync path and `await chain.ainvoke(payload)`
+    on the async path. Without an async implementation the sync one runs in a worker thread.
+    """
+
+    def __init__(
+        self,
+        func: Callable[[Dict[str, Any]], Any],
+        afunc: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]] = None,
+    ) -> None:
+        self.func = func
+        self.afunc = afunc
+
+    def __call__(self, payload: Dict[str, Any]) -> Any:
+        return self.func(payload)
+
+    def invoke(self, payload: Dict[str, Any]) -> Any:
+        return self.func(payload)
+
+    async def ainvoke(self, payload: Dict[str, Any]) -> Any:
+        if self.afunc is None:
+            return await asyncio.to_thread(self.func, payload)
+        return await self.afunc(payload)
+
+
+async def ainvoke_chain(chain, payload: Dict[str, Any]) -> Any:
+    """
+    Await a chain callable, falling back to a worker thread for plain sync callables.
+    """
+    ainvoke = getattr(chain, "ainvoke", None)
+    if ainvoke is not None:
+        return await ainvoke(payload)
+    return await asyncio.to_thread(chain, payload)
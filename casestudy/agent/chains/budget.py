@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence
+
+from ..const import DEFAULT_MODEL_NAME, PROMPT_BUDGETS
+
+logger = logging.getLogger(__name__)
+
+TRUNCATION_MARKER = "…(đã rút gọn)"
+# Section ngắn hơn mức này không đáng rút gọn (chủ yếu là chuỗi mặc định "Không có.").
+_MIN_TRUNCATABLE_TOKENS = 20
+# Ước lượng khi không có bảng mã tiktoken (môi trường offline): tiếng Việt có dấu
+# trung bình khoảng 3 ký tự mỗi token.
+_CHARS_PER_TOKEN = 3
+
+
+@lru_cache(maxsize=8)
+def _encoding(model_name: str):
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as exc:
+        logger.warning("Không tải được bảng mã tiktoken (%s); đếm token theo ước lượng ký tự.", exc)
+        return None
+
+
+def count_tokens(text: Optional[str], model_name: str = DEFAULT_MODEL_NAME) -> int:
+    if not text:
+        return 0
+    encoding = _encoding(model_name)
+    if encoding is None:
+        return -(-len(text) // _CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(
+    text: str,
+    max_tokens: int,
+    *,
+    keep: str = "head",
+    model_name: str = DEFAULT_MODEL_NAME,
+) -> str:
+    """
+    Cắt `text` còn tối đa `max_tokens` token. Cắt theo dòng trước (giữ dòng đầu với
+    keep="head", dòng cuối với keep="tail"), chỉ cắt giữa dòng khi một dòng đã vượt ngân sách.
+    """
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text, model_name) <= max_tokens:
+        return text
+
+    budget = max_tokens - count_tokens(TRUNCATION_MARKER, model_name)
+    lines = text.splitlines()
+    ordered = lines if keep == "head" else list(reversed(lines))
+    kept: List[str] = []
+    used = 0
+    for line in ordered:
+        cost = count_tokens(line, model_name) + 1
+        if used + cost > budget:
+            if not kept:
+                kept.append(_cut_line(line, max(0, budget), keep, model_name))
+            break
+        kept.append(line)
+        used += cost
+
+    if keep == "head":
+        return "\n".join(kept + [TRUNCATION_MARKER])
+    return "\n".join([TRUNCATION_MARKER] + list(reversed(kept)))
+
+
+def _cut_line(line: str, max_tokens: int, keep: str, model_name: str) -> str:
+    encoding = _encoding(model_name)
+    if encoding is None:
+        limit = max_tokens * _CHARS_PER_TOKEN
+        return line[:limit] if keep == "head" else line[-limit:] if limit else ""
+    tokens = encoding.encode(line, disallowed_special=())
+    tokens = tokens[:max_tokens] if keep == "head" else tokens[-max_tokens:] if max_tokens else []
+    return encoding.decode(tokens)
+
+
+@dataclass(frozen=True)
+class PromptSection:
+    """
+    Một biến trong prompt chịu ngân sách. Section `priority` thấp bị rút gọn trước;
+    `min_tokens` là phần luôn giữ lại; `keep` chọn giữ đầu ("head") hay cuối ("tail").
+    Section `fixed` chỉ được đếm, không bao giờ bị rút gọn (ví dụ rubric chấm điểm).
+    """
+
+    name: str
+    priority: int
+    keep: str = "head"
+    min_tokens: int = 0
+    fixed: bool = False
+
+
+class PromptMetrics:
+    """
+    Số liệu token prompt theo chain trong toàn tiến trình.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._chains: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, chain: str, sections: Mapping[str, int], truncated: Sequence[str]) -> None:
+        total = sum(sections.values())
+        with self._lock:
+            entry = self._chains.setdefault(
+                chain,
+                {"calls": 0, "tokens": 0, "max_tokens": 0, "truncated_calls": 0, "sections": {}},
+            )
+            entry["calls"] += 1
+            entry["tokens"] += total
+            entry["max_tokens"] = max(entry["max_tokens"], total)
+            if truncated:
+                entry["truncated_calls"] += 1
+            for name, tokens in sections.items():
+                entry["sections"][name] = entry["sections"].get(name, 0) + tokens
+
+        usage = _turn_usage.get()
+        if usage is not None:
+            turn_entry = usage.setdefault(chain, {"calls": 0, "tokens": 0, "truncated": []})
+            turn_entry["calls"] += 1
+            turn_entry["tokens"] += total
+            turn_entry["truncated"].extend(name for name in truncated if name not in turn_entry["truncated"])
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                chain: {
+                    "calls": entry["calls"],
+                    "avg_tokens": round(entry["tokens"] / entry["calls"], 1),
+                    "max_tokens": entry["max_tokens"],
+                    "truncated_calls": entry["truncated_calls"],
+                    "avg_section_tokens": {
+                        name: round(tokens / entry["calls"], 1)
+                        for name, tokens in entry["sections"].items()
+                    },
+                }
+                for chain, entry in self._chains.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._chains.clear()
+
+
+prompt_metrics = PromptMetrics()
+_turn_usage: ContextVar[Optional[Dict[str, Dict[str, Any]]]] = ContextVar(
+    "prompt_turn_usage", default=None
+)
+
+
+@contextmanager
+def track_prompt_tokens() -> Iterator[Dict[str, Dict[str, Any]]]:
+    """
+    Gom token prompt của mọi chain chạy trong khối `with` (một lượt graph), theo chain.
+    Node chạy song song vẫn ghi vào cùng dict vì LangGraph sao chép context sang task/thread.
+    """
+    usage: Dict[str, Dict[str, Any]] = {}
+    token = _turn_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _turn_usage.reset(token)
+
+
+class PromptBudget:
+    """
+    Ngân sách token cho các biến của một prompt. `fit` đếm token từng section, rút gọn
+    các section ưu tiên thấp khi tổng vượt `max_tokens` rồi ghi số liệu vào `prompt_metrics`.
+    Phần chữ cố định của template không tính vào ngân sách.
+    """
+
+    def __init__(
+        self,
+        chain: str,
+        sections: Sequence[PromptSection],
+        *,
+        max_tokens: Optional[int] = None,
+        model_name: str = DEFAULT_MODEL_NAME,
+    ) -> None:
+        self.chain = chain
+        self.sections = {section.name: section for section in sections}
+        self.max_tokens = max_tokens if max_tokens is not None else PROMPT_BUDGETS.get(chain)
+        self.model_name = model_name
+
+    def fit(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        fitted = dict(inputs)
+        counts = {
+            name: count_tokens(str(fitted[name]), self.model_name)
+            for name in self.sections
+            if name in fitted
+        }
+        truncated: List[str] = []
+        overflow = sum(counts.values()) - (self.max_tokens or 0)
+        if self.max_tokens and overflow > 0:
+            for section in sorted(self.sections.values(), key=lambda item: item.priority):
+                if overflow <= 0:
+                    break
+                if section.fixed:
+                    continue
+                current = counts.get(section.name, 0)
+                if current <= _MIN_TRUNCATABLE_TOKENS:
+                    continue
+                target = max(section.min_tokens, current - overflow)
+                if target >= current:
+                    continue
+                text = truncate_to_tokens(
+                    str(fitted[section.name]), target, keep=section.keep, model_name=self.model_name
+                )
+                fitted[section.name] = text
+                new_count = count_tokens(text, self.model_name)
+                overflow -= current - new_count
+                counts[section.name] = new_count
+                truncated.append(section.name)
+
+        prompt_metrics.record(self.chain, counts, truncated)
+        return fitted
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from ..const import DEFAULT_CASE_ID
+from .base import ChainCallable
+from .budget import PromptBudget, PromptSection
+
+
+def format_dialogue(lines: Iterable[Dict[str, str]], empty: str = "Chưa có hội thoại.") -> str:
+    return "\n".join(
+        f"{turn.get('speaker', 'unknown')}: {turn.get('content', '')}" for turn in lines
+    ) or empty
+
+
+def create_conversation_summary_chain(
+    llm,
+    *,
+    case_id: str = DEFAULT_CASE_ID,
+) -> ChainCallable:
+    """
+    Gộp các dòng hội thoại cũ vào bản tóm tắt hiện có. Bản tóm tắt có độ dài giới hạn
+    nên prompt của các chain dùng nó không phình theo số lượt.
+    """
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                (
+                    "Bạn ghi chép diễn biến một buổi mô phỏng tình huống y khoa giữa học viên "
+                    "và các nhân vật. Chỉ giữ lại thông tin còn cần cho các lượt sau."
+                ),
+            ),
+            (
+                "human",
+                (
+                    "Case ID: {case_id}\n"
+                    "Tóm tắt hiện tại: {previous_summary}\n\n"
+                    "Các dòng hội thoại mới cần gộp vào:\n{dialogue}\n\n"
+                    "Viết lại bản tóm tắt (tối đa 120 từ, tiếng Việt): các hành động học viên đã làm, "
+                    "thông tin nhân vật đã cung cấp, yêu cầu còn bỏ ngỏ. Không thêm nhận xét."
+                ),
+            ),
+        ]
+    )
+    chain = prompt | llm | StrOutputParser()
+    budget = PromptBudget(
+        "conversation",
+        [
+            PromptSection("dialogue", priority=1, keep="tail", min_tokens=300),
+            PromptSection("previous_summary", priority=2, keep="tail"),
+        ],
+    )
+
+    def _build_inputs(payload: Dict[str, Any]) -> Dict[str, Any]:
+        return budget.fit({
+            "case_id": case_id,
+            "previous_summary": payload.get("previous_summary") or "Chưa có.",
+            "dialogue": format_dialogue(payload.get("dialogue", [])),
+        })
+
+    def summarize(payload: Dict[str, Any]) -> str:
+        return chain.invoke(_build_inputs(payload)).strip()
+
+    async def asummarize(payload: Dict[str, Any]) -> str:
+        return (await chain.ainvoke(_build_inputs(payload))).strip()
+
+    return ChainCallable(summarize, asummarize)
@@ -1,12 +1,15 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Iterable, List
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
 
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import Runnable
 
-from ..const import DEFAULT_CASE_ID
+from ..const import DEFAULT_CASE_ID, PERSONA_SEARCH_WORKERS
+from .base import ChainCallable
+from .budget import PromptBudget, PromptSection
 
 
 def create_persona_digest_chain(
@@ -15,7 +18,7 @@ def create_persona_digest_chain(
     *,
     case_id: str = DEFAULT_CASE_ID,
     top_k: int = 2,
-) -> Runnable:
+) -> ChainCallable:
     """
     Build a chain that consolidates persona details into short operational digests.
     The prompt avoids assumptions about persona structure so it can adapt to
@@ -45,36 +48,89 @@ def create_persona_digest_chain(
         ]
     )
     chain = prompt | llm | StrOutputParser()
+    budget = PromptBudget("persona_digest", [PromptSection("documents", priority=1)])
 
-    def build_digest(payload: Dict[str, Any]) -> str:
-        persona_ids: Iterable[str] = payload.get("persona_ids", [])
-        documents: List[str] = []
+    def _build_query(payload: Dict[str, Any], persona_id: str) -> str:
+        return payload.get(
+            "query_template",
+            "Thông tin nhân vật {persona_id} trong mô phỏng",
+        ).format(persona_id=persona_id)
+
+    def _format_results(documents: List[str], persona_id: str, results) -> None:
+        if not results:
+            documents.append(f"[{persona_id}] Không tìm thấy dữ liệu nhân vật.")
+            return
+        for doc in results:
+            documents.append(
+                f"[{doc.metadata.get('persona_id', persona_id)}] {doc.page_content}"
+            )
 
+    def _format_documents(persona_ids: List[str], grouped: Dict[str, List[Any]]) -> str:
+        documents: List[str] = []
         for persona_id in persona_ids:
-            query = payload.get(
-                "query_template",
-                "Thông tin nhân vật {persona_id} trong mô phỏng",
-            ).format(persona_id=persona_id)
-            results = persona_index.similarity_search(query, k=top_k)
-            if not results:
-                documents.append(f"[{persona_id}] Không tìm thấy dữ liệu nhân vật.")
-            else:
-                for doc in results:
-                    documents.append(
-                        f"[{doc.metadata.get('persona_id', persona_id)}] {doc.page_content}"
-                    )
+            _format_results(documents, persona_id, grouped.get(persona_id))
+        return "\n".join(documents) or "Không có dữ liệu nhân vật."
+
+    embedder = getattr(persona_index, "embeddings", None)
 
-        formatted_docs = "\n".join(documents) or "Không có dữ liệu nhân vật."
-        return chain.invoke({"case_id": case_id, "documents": formatted_docs})
+    def _retrieve(payload: Dict[str, Any], persona_ids: List[str]) -> Dict[str, List[Any]]:
+        """
+        Embed mọi truy vấn trong một lần gọi rồi tìm kiếm song song theo từng persona.
+        """
+        queries = [_build_query(payload, persona_id) for persona_id in persona_ids]
+        if embedder is not None:
+            vectors = embedder.embed_documents(queries)
 
-    return build_digest
+            def search(vector):
+                return persona_index.similarity_search_by_vector(vector, k=top_k)
+
+            inputs = vectors
+        else:
+
+            def search(query):
+                return persona_index.similarity_search(query, k=top_k)
+
+            inputs = queries
+
+        if len(inputs) <= 1:
+            results = [search(item) for item in inputs]
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(inputs), PERSONA_SEARCH_WORKERS)) as pool:
+                results = list(pool.map(search, inputs))
+        return dict(zip(persona_ids, results))
+
+    async def _aretrieve(payload: Dict[str, Any], persona_ids: List[str]) -> Dict[str, List[Any]]:
+        queries = [_build_query(payload, persona_id) for persona_id in persona_ids]
+        if embedder is not None:
+            vectors = await embedder.aembed_documents(queries)
+            searches = [
+                persona_index.asimilarity_search_by_vector(vector, k=top_k) for vector in vectors
+            ]
+        else:
+            searches = [persona_index.asimilarity_search(query, k=top_k) for query in queries]
+        results = await asyncio.gather(*searches)
+        return dict(zip(persona_ids, results))
+
+    def build_digest(payload: Dict[str, Any]) -> str:
+        persona_ids: List[str] = list(payload.get("persona_ids", []))
+        grouped = _retrieve(payload, persona_ids) if persona_ids else {}
+        formatted_docs = _format_documents(persona_ids, grouped)
+        return chain.invoke(budget.fit({"case_id": case_id, "documents": formatted_docs}))
+
+    async def abuild_digest(payload: Dict[str, Any]) -> str:
+        persona_ids: List[str] = list(payload.get("persona_ids", []))
+        grouped = await _aretrieve(payload, persona_ids) if persona_ids else {}
+        formatted_docs = _format_documents(persona_ids, grouped)
+        return await chain.ainvoke(budget.fit({"case_id": case_id, "documents": formatted_docs}))
+
+    return ChainCallable(build_digest, abuild_digest)
 
 
 def create_persona_dialogue_chain(
     llm,
     *,
     case_id: str = DEFAULT_CASE_ID,
-) -> Runnable:
+) -> ChainCallable:
     """
     Generate short in-character dialogue snippets for active personas.
     Output must be JSON array with persona_id + utterance fields so downstream
@@ -98,6 +154,7 @@ def create_persona_dialogue_chain(
                     "Tóm tắt bối cảnh hiện tại: {scene_summary}\n"
                     "Hành động mới nhất của học viên: {user_action}\n"
                     "Trạng thái nhân vật:\n{persona_slate}\n"
+                    "Diễn biến trước đó: {conversation_summary}\n"
                     "Đoạn hội thoại gần nhất:\n{recent_history}\n\n"
                     "Yêu cầu:\n"
                     "- Chỉ tạo lời thoại cho những nhân vật phù hợp để phản ứng.\n"
@@ -110,17 +167,32 @@ def create_persona_dialogue_chain(
         ]
     )
     chain = prompt | llm | StrOutputParser()
+    budget = PromptBudget(
+        "persona_dialogue",
+        [
+            PromptSection("recent_history", priority=1, keep="tail"),
+            PromptSection("conversation_summary", priority=2, keep="tail"),
+            PromptSection("scene_summary", priority=3, keep="tail", min_tokens=150),
+            PromptSection("persona_slate", priority=4, min_tokens=300),
+            PromptSection("user_action", priority=5, min_tokens=150),
+        ],
+    )
+
+    def _build_inputs(payload: Dict[str, Any]) -> Dict[str, Any]:
+        return budget.fit({
+            "case_id": case_id,
+            "event_title": payload.get("event_title", "Sự kiện"),
+            "scene_summary": payload.get("scene_summary", "Chưa có dữ liệu."),
+            "user_action": payload.get("user_action", "Chưa ghi nhận."),
+            "persona_slate": payload.get("persona_slate", "Không có nhân vật."),
+            "recent_history": payload.get("recent_history", "Chưa có hội thoại."),
+            "conversation_summary": payload.get("conversation_summary") or "Chưa có.",
+        })
 
     def generate(payload: Dict[str, Any]) -> str:
-        return chain.invoke(
-            {
-                "case_id": case_id,
-                "event_title": payload.get("event_title", "Sự kiện"),
-                "scene_summary": payload.get("scene_summary", "Chưa có dữ liệu."),
-                "user_action": payload.get("user_action", "Chưa ghi nhận."),
-                "persona_slate": payload.get("persona_slate", "Không có nhân vật."),
-                "recent_history": payload.get("recent_history", "Chưa có hội thoại."),
-            }
-        )
-
-    return generate
+        return chain.invoke(_build_inputs(payload))
+
+    async def agenerate(payload: Dict[str, Any]) -> str:
+        return await chain.ainvoke(_build_inputs(payload))
+
+    return ChainCallable(generate, agenerate)
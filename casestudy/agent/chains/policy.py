@@ -2,21 +2,17 @@ from __future__ import annotations
 
 from typing import Any, Dict, List
 
-from langchain_core.runnables import Runnable
 
+from .base import ChainCallable
 
-def create_policy_lookup_chain(policy_index, *, top_k: int = 3) -> Runnable:
+
+def create_policy_lookup_chain(policy_index, *, top_k: int = 3) -> ChainCallable:
     """
     Lightweight retrieval-only chain for policy and safety guidance.
     Returns structured dictionaries to make downstream nodes deterministic.
     """
 
-    def lookup(payload: Dict[str, Any]) -> List[Dict[str, str]]:
-        user_action = (payload.get("user_action") or "").strip()
-        if not user_action:
-            return []
-
-        results = policy_index.similarity_search(user_action, k=top_k)
+    def _to_flags(results) -> List[Dict[str, str]]:
         return [
             {
                 "policy_id": doc.metadata.get("policy_id", f"policy_{idx}"),
@@ -25,4 +21,16 @@ def create_policy_lookup_chain(policy_index, *, top_k: int = 3) -> Runnable:
             for idx, doc in enumerate(results, start=1)
         ]
 
-    return lookup
+    def lookup(payload: Dict[str, Any]) -> List[Dict[str, str]]:
+        user_action = (payload.get("user_action") or "").strip()
+        if not user_action:
+            return []
+        return _to_flags(policy_index.similarity_search(user_action, k=top_k))
+
+    async def alookup(payload: Dict[str, Any]) -> List[Dict[str, str]]:
+        user_action = (payload.get("user_action") or "").strip()
+        if not user_action:
+            return []
+        return _to_flags(await policy_index.asimilarity_search(user_action, k=top_k))
+
+    return ChainCallable(lookup, alookup)
@@ -4,9 +4,11 @@ from typing import Any, Dict, List, Sequence, Union
 
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import Runnable
 
 from ..const import DEFAULT_CASE_ID
+from .base import ChainCallable
+from .budget import PromptBudget, PromptSection
+from .conversation import format_dialogue
 
 
 def _stringify_criteria(values: Union[str, Sequence[Any], None]) -> str:
@@ -31,7 +33,7 @@ def create_responder_chain(
     llm,
     *,
     case_id: str = DEFAULT_CASE_ID,
-) -> Runnable:
+) -> ChainCallable:
     """
     Generate facilitator-style feedback for the trainee using the consolidated state.
     The prompt emphasises coaching language that should transfer across case studies.
@@ -55,7 +57,8 @@ def create_responder_chain(
                     "Tiêu chí đã đạt: {completed_success_criteria}\n"
                     "Tiêu chí cần chú ý: {partial_success_criteria}\n"
                     "Nhân vật đang hiện diện: {persona_overview}\n"
-                    "Lịch sử hội thoại: {dialogue_history}\n"
+                    "Diễn biến trước đó: {conversation_summary}\n"
+                    "Hội thoại gần nhất: {dialogue_history}\n"
                     "Vi phạm hoặc lưu ý policy: {policy_flags}\n"
                     "Số lượt đã dùng: {turn_count}\n"
                     "Giới hạn lượt: {max_turns}\n"
@@ -72,13 +75,25 @@ def create_responder_chain(
         ]
     )
     chain = prompt | llm | StrOutputParser()
+    budget = PromptBudget(
+        "responder",
+        [
+            PromptSection("dialogue_history", priority=1, keep="tail"),
+            PromptSection("policy_flags", priority=2),
+            PromptSection("conversation_summary", priority=2, keep="tail"),
+            PromptSection("persona_overview", priority=3, min_tokens=100),
+            PromptSection("scene_summary", priority=3, keep="tail", min_tokens=150),
+            PromptSection("partial_success_criteria", priority=4, min_tokens=100),
+            PromptSection("completed_success_criteria", priority=4, min_tokens=100),
+            PromptSection("success_criteria", priority=5, min_tokens=300),
+            PromptSection("system_notice", priority=6, fixed=True),
+            PromptSection("user_action", priority=6, min_tokens=150),
+        ],
+    )
 
-    def respond(payload: Dict[str, Any]) -> str:
+    def _build_inputs(payload: Dict[str, Any]) -> Dict[str, Any]:
         dialogue_history: List[Dict[str, str]] = payload.get("dialogue_history", [])
-        history_text = "\n".join(
-            f"{turn.get('speaker', 'unknown')}: {turn.get('content', '')}"
-            for turn in dialogue_history
-        ) or "Chưa có hội thoại."
+        history_text = format_dialogue(dialogue_history)
 
         success_criteria = payload.get("success_criteria")
         if success_criteria is None:
@@ -115,22 +130,27 @@ def create_responder_chain(
         turn_count = payload.get("turn_count", 0)
         system_notice = payload.get("system_notice") or "Không có."
 
-        return chain.invoke(
-            {
-                "case_id": case_id,
-                "event_title": payload.get("event_title", "Sự kiện"),
-                "scene_summary": payload.get("scene_summary", "Chưa có dữ liệu."),
-                "success_criteria": success_criteria_text,
-                "completed_success_criteria": completed_text,
-                "partial_success_criteria": partial_text,
-                "persona_overview": payload.get("persona_overview", "Không có."),
-                "dialogue_history": history_text,
-                "policy_flags": policy_text,
-                "user_action": payload.get("user_action", "Chưa ghi nhận."),
-                "turn_count": turn_count,
-                "max_turns": max_turns_text,
-                "system_notice": system_notice,
-            }
-        )
-
-    return respond
+        return budget.fit({
+            "case_id": case_id,
+            "event_title": payload.get("event_title", "Sự kiện"),
+            "scene_summary": payload.get("scene_summary", "Chưa có dữ liệu."),
+            "success_criteria": success_criteria_text,
+            "completed_success_criteria": completed_text,
+            "partial_success_criteria": partial_text,
+            "persona_overview": payload.get("persona_overview", "Không có."),
+            "dialogue_history": history_text,
+            "conversation_summary": payload.get("conversation_summary") or "Chưa có.",
+            "policy_flags": policy_text,
+            "user_action": payload.get("user_action", "Chưa ghi nhận."),
+            "turn_count": turn_count,
+            "max_turns": max_turns_text,
+            "system_notice": system_notice,
+        })
+
+    def respond(payload: Dict[str, Any]) -> str:
+        return chain.invoke(_build_inputs(payload))
+
+    async def arespond(payload: Dict[str, Any]) -> str:
+        return await chain.ainvoke(_build_inputs(payload))
+
+    return ChainCallable(respond, arespond)
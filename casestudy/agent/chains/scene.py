@@ -1,12 +1,14 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import Runnable
 
-from ..const import DEFAULT_CASE_ID
+from ...utils.cache import LRUCache, hash_text, normalize_cache_text
+from ..const import DEFAULT_CASE_ID, SCENE_CACHE_SIZE
+from .base import ChainCallable, ainvoke_chain
+from .budget import PromptBudget, PromptSection
 
 
 def create_scene_summary_chain(
@@ -14,7 +16,7 @@ def create_scene_summary_chain(
     llm,
     *,
     case_id: str = DEFAULT_CASE_ID,
-) -> Runnable:
+) -> ChainCallable:
     """
     Build a concise scene summarisation chain that works for any case study.
 
@@ -38,6 +40,7 @@ def create_scene_summary_chain(
                     "Canon Event: {event_title}\n"
                     "Mô tả ngắn gọn từ logic memory: {event_description}\n\n"
                     "Tóm tắt hiện tại (nếu có): {previous_summary}\n"
+                    "Diễn biến hội thoại trước đó: {conversation_summary}\n"
                     "Hành động mới nhất của học viên: {user_action}\n\n"
                     "Thông tin bổ sung từ Semantic Memory:\n{documents}\n\n"
                     "Yêu cầu: Viết 3-4 câu tiếng Việt, thể hiện rõ môi trường, "
@@ -50,26 +53,89 @@ def create_scene_summary_chain(
         ]
     )
     chain = prompt | llm | StrOutputParser()
+    budget = PromptBudget(
+        "scene",
+        [
+            PromptSection("documents", priority=1),
+            PromptSection("conversation_summary", priority=2, keep="tail"),
+            PromptSection("previous_summary", priority=3, keep="tail", min_tokens=150),
+            PromptSection("event_description", priority=4, min_tokens=150),
+            PromptSection("user_action", priority=5, min_tokens=150),
+        ],
+    )
 
-    def summarize(payload: Dict[str, Any]) -> str:
+    def _build_query(payload: Dict[str, Any]) -> str:
         query_parts = [
             payload.get("query"),
             payload.get("event_description"),
             payload.get("user_action"),
         ]
-        query = " ".join(part for part in query_parts if part) or ""
-        documents = scene_retriever.invoke(query)
+        return " ".join(part for part in query_parts if part) or ""
+
+    def _build_inputs(payload: Dict[str, Any], documents) -> Dict[str, Any]:
         formatted_docs = "\n".join(f"- {doc.page_content}" for doc in documents) or "- Không tìm thấy dữ liệu."
+        return budget.fit({
+            "case_id": case_id,
+            "event_title": payload.get("event_title", "Sự kiện"),
+            "event_description": payload.get("event_description", ""),
+            "documents": formatted_docs,
+            "previous_summary": payload.get("previous_summary", "Chưa có dữ liệu."),
+            "conversation_summary": payload.get("conversation_summary") or "Chưa có.",
+            "user_action": payload.get("user_action", "Chưa ghi nhận."),
+        })
+
+    def summarize(payload: Dict[str, Any]) -> str:
+        documents = scene_retriever.invoke(_build_query(payload))
+        return chain.invoke(_build_inputs(payload, documents))
+
+    async def asummarize(payload: Dict[str, Any]) -> str:
+        documents = await scene_retriever.ainvoke(_build_query(payload))
+        return await chain.ainvoke(_build_inputs(payload, documents))
+
+    return ChainCallable(summarize, asummarize)
+
 
-        return chain.invoke(
-            {
-                "case_id": case_id,
-                "event_title": payload.get("event_title", "Sự kiện"),
-                "event_description": payload.get("event_description", ""),
-                "documents": formatted_docs,
-                "previous_summary": payload.get("previous_summary", "Chưa có dữ liệu."),
-                "user_action": payload.get("user_action", "Chưa ghi nhận."),
-            }
+def create_cached_scene_summary_chain(
+    scene_chain,
+    *,
+    case_id: str = DEFAULT_CASE_ID,
+    cache: Optional[LRUCache] = None,
+) -> ChainCallable:
+    """
+    Đặt cache LRU trước scene chain, khóa theo
+    `(case_id, current_event, hash(previous_summary), hash(conversation_summary),
+    user_action đã chuẩn hóa)`. Tóm tắt hội thoại chỉ đổi khi cửa sổ hội thoại bị gộp.
+
+    Cùng một sự kiện, cùng bối cảnh trước đó và cùng hành động thì bản tóm tắt
+    không đổi, nên có thể bỏ qua cả bước truy vấn Pinecone lẫn lời gọi LLM.
+    """
+    cache = cache if cache is not None else LRUCache(max_size=SCENE_CACHE_SIZE)
+
+    def _cache_key(payload: Dict[str, Any]):
+        return (
+            case_id,
+            payload.get("event_id") or payload.get("event_title"),
+            hash_text(payload.get("previous_summary")),
+            hash_text(payload.get("conversation_summary")),
+            normalize_cache_text(payload.get("user_action")),
         )
 
-    return summarize
+    def summarize(payload: Dict[str, Any]) -> str:
+        key = _cache_key(payload)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+        summary = scene_chain(payload)
+        cache.set(key, summary)
+        return summary
+
+    async def asummarize(payload: Dict[str, Any]) -> str:
+        key = _cache_key(payload)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+        summary = await ainvoke_chain(scene_chain, payload)
+        cache.set(key, summary)
+        return summary
+
+    return ChainCallable(summarize, asummarize)
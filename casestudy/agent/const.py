@@ -3,6 +3,32 @@ from pathlib import Path
 DEFAULT_CASE_ID = "drowning_pool_001"
 DEFAULT_MODEL_NAME = "gpt-4o-mini"
 
+# Số bản tóm tắt bối cảnh giữ lại trong cache của mỗi graph.
+SCENE_CACHE_SIZE = 512
+# Số rubric (theo event và tập tiêu chí còn lại) đã render sẵn trong cache của mỗi graph.
+RUBRIC_CACHE_SIZE = 256
+# Cửa sổ hội thoại đưa nguyên văn vào prompt. Khi phần chưa tóm tắt vượt quá
+# DIALOGUE_WINDOW_SIZE dòng, các dòng cũ được gộp vào bản tóm tắt và chỉ giữ lại
+# DIALOGUE_WINDOW_KEEP dòng gần nhất, nên LLM tóm tắt chạy vài lượt một lần.
+DIALOGUE_WINDOW_SIZE = 12
+DIALOGUE_WINDOW_KEEP = 6
+# Ngân sách token cho phần biến của prompt từng chain (xem chains/budget.py).
+PROMPT_BUDGETS = {
+    "scene": 1500,
+    "persona_digest": 2000,
+    "persona_dialogue": 1200,
+    "action": 1500,
+    "responder": 1800,
+    "conversation": 1500,
+}
+# Ngưỡng chấm sơ bộ hành động (chains/action_prescore.py): cosine embedding dưới mức này
+# (và không chung từ nào) thì coi hành động hoàn toàn không liên quan đến tiêu chí.
+ACTION_PRESCORE_EMBED_MISS = 0.25
+# Số hành động đã chấm giữ lại cho mỗi tiêu chí để tra cứu gần đúng bằng embedding.
+ACTION_SCORE_CACHE_BUCKET_SIZE = 256
+# Số truy vấn persona chạy song song trong một lượt digest.
+PERSONA_SEARCH_WORKERS = 6
+
 RUNTIME_STATE_DIRNAME = "runtime_state"
 RUNTIME_STATE_FILENAME = "runtime_state.json"
 
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from ..utils.cache import hash_text, normalize_cache_text
+from .chains.action import normalize_success_criteria
+
+
+@dataclass(frozen=True)
+class EventNode:
+    """
+    Canon event đã chuẩn hóa sẵn cho các node LangGraph: rubric, persona xuất hiện,
+    cạnh on_success/on_fail và khoảng cách tới sự kiện kết thúc.
+    """
+
+    id: str
+    title: str
+    description: str
+    # Tiêu chí nguyên bản và rubric đã chuẩn hóa; `criterion_ids` khớp thứ tự rubric và là dạng
+    # được lưu trong event_summary. ID lấy từ `id` của tiêu chí hoặc băm mô tả (xem
+    # `_criterion_ids`) nên không đổi khi rubric được sắp xếp lại hay chèn thêm tiêu chí.
+    success_criteria: Tuple[Any, ...]
+    rubric: Tuple[Dict[str, Any], ...]
+    criterion_ids: Tuple[str, ...]
+    criteria_labels: Mapping[str, str]
+    # Dấu vân tay của bộ ID; lưu kèm state để ingress biết khi nào cần ánh xạ lại.
+    rubric_version: str
+    persona_ids: Tuple[str, ...]
+    timeout_turn: int
+    on_success: Optional[str]
+    on_fail: Optional[str]
+    reachable: bool = True
+    # Số lần pass liên tiếp (đi theo on_success) để tới sự kiện cuối; None nếu không tới được.
+    depth_to_finish: Optional[int] = None
+
+    @property
+    def is_terminal(self) -> bool:
+        return not self.on_success
+
+    def criterion(self, criterion_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return self.rubric[self.criterion_ids.index(criterion_id)]
+        except ValueError:
+            return None
+
+    def describe(self, criterion_ids: Sequence[str]) -> List[str]:
+        return [self.criteria_labels.get(criterion_id, criterion_id) for criterion_id in criterion_ids]
+
+    def to_criterion_ids(
+        self,
+        items: Optional[Sequence[Any]],
+        stored_labels: Optional[Mapping[str, str]] = None,
+    ) -> List[str]:
+        """
+        Chuyển danh sách tiêu chí trong event_summary về ID. Chấp nhận cả state cũ
+        lưu mô tả (chuỗi) hoặc rubric dict; `stored_labels` (map `{event}_criteria` đã lưu
+        trong state) cho phép dịch ID của phiên bản rubric trước qua mô tả của chúng.
+        Mục không khớp tiêu chí nào bị bỏ qua.
+        """
+        if items is None:
+            return list(self.criterion_ids)
+        by_description = {
+            normalize_cache_text(label): criterion_id
+            for criterion_id, label in self.criteria_labels.items()
+        }
+        resolved: List[str] = []
+        for item in items:
+            if isinstance(item, dict):
+                item = str(item.get("description", "")).strip()
+            item = str(item).strip()
+            if stored_labels and item in stored_labels:
+                criterion_id = by_description.get(normalize_cache_text(stored_labels[item]))
+            elif item in self.criterion_ids:
+                criterion_id = item
+            else:
+                criterion_id = by_description.get(normalize_cache_text(item))
+            if criterion_id and criterion_id not in resolved:
+                resolved.append(criterion_id)
+        return resolved
+
+    def reconcile(self, event_summary: Dict[str, Any]) -> bool:
+        """
+        Đưa tiến độ tiêu chí của sự kiện này trong `event_summary` về bộ ID hiện tại khi
+        rubric đã đổi kể từ lúc state được lưu. Tiêu chí mới (hoặc bị sửa mô tả) chưa hoàn
+        thành được thêm vào remaining. Trả về True nếu state đã được ánh xạ lại.
+        """
+        version_key = f"{self.id}_rubric_version"
+        if event_summary.get(version_key) == self.rubric_version:
+            return False
+
+        labels_key = f"{self.id}_criteria"
+        remaining_key = f"{self.id}_remaining_success_criteria"
+        completed_key = f"{self.id}_completed_success_criteria"
+        partial_key = f"{self.id}_partial"
+        stored_labels = event_summary.get(labels_key) or {}
+
+        completed = self.to_criterion_ids(event_summary.get(completed_key) or [], stored_labels)
+        if remaining_key in event_summary:
+            remaining = [
+                criterion_id
+                for criterion_id in self.to_criterion_ids(event_summary[remaining_key], stored_labels)
+                if criterion_id not in completed
+            ]
+            known = {*completed, *remaining}
+            remaining.extend(cid for cid in self.criterion_ids if cid not in known)
+        else:
+            remaining = [cid for cid in self.criterion_ids if cid not in completed]
+
+        event_summary[labels_key] = dict(self.criteria_labels)
+        event_summary[remaining_key] = remaining
+        event_summary[completed_key] = completed
+        event_summary[partial_key] = [
+            criterion_id
+            for criterion_id in self.to_criterion_ids(event_summary.get(partial_key) or [], stored_labels)
+            if criterion_id in remaining
+        ]
+        event_summary[version_key] = self.rubric_version
+        return True
+
+
+@dataclass(frozen=True)
+class EventGraph:
+    """
+    Chỉ mục bất biến của skeleton, dựng một lần khi nạp LogicMemory.
+    `issues` liệt kê cạnh trỏ tới sự kiện không tồn tại, persona không tồn tại,
+    sự kiện không thể tới và sự kiện không bao giờ dẫn tới kết thúc.
+    """
+
+    nodes: Mapping[str, EventNode]
+    start: Optional[str]
+    issues: Tuple[str, ...]
+
+    def get(self, event_id: Optional[str]) -> Optional[EventNode]:
+        if not event_id:
+            return None
+        return self.nodes.get(event_id)
+
+    @classmethod
+    def compile(
+        cls,
+        canon_events: Mapping[str, Mapping[str, Any]],
+        event_sequence: Sequence[str],
+        personas: Mapping[str, Any],
+    ) -> "EventGraph":
+        issues: List[str] = []
+        start = event_sequence[0] if event_sequence else None
+
+        edges: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        for event_id, event in canon_events.items():
+            on_success = event.get("on_success") or None
+            on_fail = event.get("on_fail") or None
+            for label, target in (("on_success", on_success), ("on_fail", on_fail)):
+                if target and target not in canon_events:
+                    issues.append(f"{event_id}.{label} trỏ tới sự kiện không tồn tại '{target}'.")
+            edges[event_id] = (on_success, on_fail)
+
+        reachable = _reachable_from(start, edges)
+        depths = _depths_to_finish(edges)
+
+        nodes: Dict[str, EventNode] = {}
+        for event_id in event_sequence:
+            event = canon_events[event_id]
+            persona_ids: List[str] = []
+            for appearance in event.get("npc_appearance", []) or []:
+                persona_id = (appearance or {}).get("persona_id")
+                if persona_id in personas:
+                    persona_ids.append(persona_id)
+                elif persona_id:
+                    issues.append(f"{event_id}.npc_appearance tham chiếu persona không tồn tại '{persona_id}'.")
+
+            if event_id not in reachable:
+                issues.append(f"Sự kiện '{event_id}' không thể tới từ sự kiện bắt đầu '{start}'.")
+            if depths.get(event_id) is None:
+                issues.append(f"Sự kiện '{event_id}' không bao giờ dẫn tới sự kiện kết thúc.")
+
+            timeout = event.get("timeout_turn")
+            success_criteria = tuple(event.get("success_criteria", []) or [])
+            rubric = tuple(normalize_success_criteria(list(success_criteria)))
+            criterion_ids = _criterion_ids(rubric)
+            nodes[event_id] = EventNode(
+                id=event_id,
+                title=event.get("title", event_id),
+                description=event.get("description", ""),
+                success_criteria=success_criteria,
+                rubric=rubric,
+                criterion_ids=criterion_ids,
+                criteria_labels=MappingProxyType(
+                    {cid: criterion["description"] for cid, criterion in zip(criterion_ids, rubric)}
+                ),
+                rubric_version=hash_text("\n".join(criterion_ids))[:12],
+                persona_ids=tuple(persona_ids),
+                timeout_turn=timeout if isinstance(timeout, int) and timeout > 0 else 0,
+                on_success=edges[event_id][0],
+                on_fail=edges[event_id][1],
+                reachable=event_id in reachable,
+                depth_to_finish=depths.get(event_id),
+            )
+
+        return cls(nodes=MappingProxyType(nodes), start=start, issues=tuple(issues))
+
+
+def _criterion_ids(rubric: Sequence[Mapping[str, Any]]) -> Tuple[str, ...]:
+    """
+    ID ổn định cho từng tiêu chí: `id` do tác giả đặt nếu có, ngược lại "C" + 8 ký tự đầu
+    của hash mô tả đã chuẩn hóa; trùng lặp được thêm hậu tố "-2", "-3"...
+    """
+    ids: List[str] = []
+    for criterion in rubric:
+        base = str(criterion.get("id") or "").strip()
+        if not base:
+            base = "C" + hash_text(normalize_cache_text(criterion.get("description")))[:8]
+        criterion_id = base
+        suffix = 2
+        while criterion_id in ids:
+            criterion_id = f"{base}-{suffix}"
+            suffix += 1
+        ids.append(criterion_id)
+    return tuple(ids)
+
+
+def _reachable_from(
+    start: Optional[str],
+    edges: Mapping[str, Tuple[Optional[str], Optional[str]]],
+) -> set:
+    if start is None or start not in edges:
+        return set()
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        for target in edges[queue.popleft()]:
+            if target in edges and target not in seen:
+                seen.add(target)
+                queue.append(target)
+    return seen
+
+
+def _depths_to_finish(
+    edges: Mapping[str, Tuple[Optional[str], Optional[str]]],
+) -> Dict[str, Optional[int]]:
+    """
+    Đi theo chuỗi on_success của từng sự kiện; chuỗi lặp vòng hoặc trỏ tới sự kiện
+    không tồn tại thì không có depth.
+    """
+    depths: Dict[str, Optional[int]] = {}
+    for event_id in edges:
+        path: List[str] = []
+        current: Optional[str] = event_id
+        while current is not None and current not in depths and current not in path:
+            if current not in edges:
+                current = None
+                break
+            path.append(current)
+            on_success = edges[current][0]
+            if not on_success:
+                depths[current] = 0
+                path.pop()
+                break
+            current = on_success
+
+        if current is None or current in path:
+            tail: Optional[int] = None
+        else:
+            tail = depths[current]
+        for offset, node_id in enumerate(reversed(path), start=1):
+            depths[node_id] = None if tail is None else tail + offset
+    return depths
@@ -1,24 +1,32 @@
 from __future__ import annotations
 
+import logging
 from typing import Optional
 
 from langgraph.graph import END, StateGraph
 
 from .chains import (
+    ActionPreScorer,
     create_action_evaluator_chain,
+    create_cached_scene_summary_chain,
     create_chat_model,
+    create_conversation_summary_chain,
     create_persona_digest_chain,
     create_persona_dialogue_chain,
     create_policy_lookup_chain,
     create_responder_chain,
     create_scene_summary_chain,
+    get_criterion_score_cache,
 )
-from .const import DEFAULT_CASE_ID
+from .const import DEFAULT_CASE_ID, RUBRIC_CACHE_SIZE, SCENE_CACHE_SIZE
 from .memory import LogicMemory
+from .memory_registry import get_logic_memory_registry
 from .nodes import (
     build_action_node,
+    build_conversation_memory_node,
     build_egress_node,
     build_ingress_node,
+    build_join_node,
     build_persona_dialogue_node,
     build_policy_node,
     build_responder_node,
@@ -26,9 +34,16 @@ from .nodes import (
     build_state_update_node,
     build_transition_node,
 )
+from .persona_digest import ensure_persona_digests
 from .runtime_store import RuntimeStateStore
 from .state import RuntimeState
-from ..utils.semantic_extract import load_indices
+from ..app.core.config import get_settings as get_app_settings
+from ..utils.cache import LRUCache
+from ..utils.llm_cache import get_llm_response_cache
+from ..utils.llm_scheduler import PRIORITY_BOOTSTRAP, llm_priority
+from ..utils.semantic_extract import embeddings as semantic_embeddings, load_indices
+
+logger = logging.getLogger(__name__)
 
 
 class CaseStudyGraphBuilder:
@@ -42,36 +57,74 @@ class CaseStudyGraphBuilder:
         *,
         model_name: Optional[str] = None,
         llm=None,
+        logic_memory: Optional[LogicMemory] = None,
     ) -> None:
         self.case_id = case_id
-        self.logic_memory = LogicMemory.load(case_id)
+        self.logic_memory = logic_memory or get_logic_memory_registry().get(case_id)
         self.state_store = RuntimeStateStore(case_id)
+        self.model_name = model_name
+        self._llm_override = llm
         self.llm = llm or create_chat_model(model_name)
 
         try:
-            scene_index, persona_index, policy_index = load_indices()
+            scene_index, persona_index, policy_index = load_indices(case_id)
         except Exception as exc:
             raise RuntimeError(
-                "Không thể tải Semantic Memory từ Pinecone. Vui lòng kiểm tra cấu hình và namespace."
+                "Không thể tải Semantic Memory (Pinecone/local). Vui lòng kiểm tra SEMANTIC_BACKEND và namespace."
             ) from exc
 
-        self.scene_chain = create_scene_summary_chain(
-            scene_index.as_retriever(search_kwargs={"k": 4}),
-            self.llm,
+        self.scene_cache = LRUCache(max_size=SCENE_CACHE_SIZE)
+        self.scene_chain = create_cached_scene_summary_chain(
+            create_scene_summary_chain(
+                scene_index.as_retriever(search_kwargs={"k": 4}),
+                self._chain_llm("scene"),
+                case_id=case_id,
+            ),
             case_id=case_id,
+            cache=self.scene_cache,
         )
         self.persona_chain = create_persona_digest_chain(
             persona_index,
-            self.llm,
+            self._chain_llm("persona_digest"),
             case_id=case_id,
         )
         self.persona_dialogue_chain = create_persona_dialogue_chain(
             self.llm,
             case_id=case_id,
         )
+        try:
+            with llm_priority(PRIORITY_BOOTSTRAP):
+                ensure_persona_digests(self.logic_memory, self.persona_chain)
+        except Exception as exc:
+            # Node semantic sẽ tự gọi persona_chain cho những persona chưa có digest.
+            logger.warning("Không tính trước được persona digest cho case '%s': %s", case_id, exc)
         self.policy_chain = create_policy_lookup_chain(policy_index)
-        self.action_chain = create_action_evaluator_chain(llm=self.llm)
+        settings = get_app_settings()
+        self.action_chain = create_action_evaluator_chain(
+            llm=self._chain_llm("action"),
+            small_llm=(
+                create_chat_model(settings.action_small_model, cache_namespace="action")
+                if settings.action_small_model and llm is None
+                else None
+            ),
+            prescorer=(
+                ActionPreScorer(semantic_embeddings) if settings.action_prescore_enabled else None
+            ),
+            score_cache=get_criterion_score_cache(semantic_embeddings),
+            case_id=case_id,
+        )
+        self.rubric_cache = LRUCache(max_size=RUBRIC_CACHE_SIZE)
         self.responder_chain = create_responder_chain(self.llm, case_id=case_id)
+        self.conversation_chain = create_conversation_summary_chain(self.llm, case_id=case_id)
+
+    def _chain_llm(self, chain: str):
+        """
+        LLM cho một chain: chain có trong `LLM_CACHE_CHAINS` dùng model riêng gắn cache phản hồi,
+        còn lại (hoặc khi truyền `llm` từ ngoài vào) dùng chung `self.llm`.
+        """
+        if self._llm_override is None and get_llm_response_cache(chain) is not None:
+            return create_chat_model(self.model_name, cache_namespace=chain)
+        return self.llm
 
     def build(self) -> StateGraph:
         graph = StateGraph(RuntimeState)
@@ -99,8 +152,11 @@ class CaseStudyGraphBuilder:
         graph.add_node("policy", build_policy_node(self.policy_chain))
         graph.add_node(
             "action",
-            build_action_node(self.logic_memory, self.action_chain),
+            build_action_node(
+                self.logic_memory, self.action_chain, rubric_cache=self.rubric_cache
+            ),
         )
+        graph.add_node("join", build_join_node())
         graph.add_node(
             "transition",
             build_transition_node(self.logic_memory),
@@ -110,17 +166,21 @@ class CaseStudyGraphBuilder:
             build_responder_node(self.logic_memory, self.responder_chain),
         )
         graph.add_node("state_update", build_state_update_node())
+        graph.add_node("conversation", build_conversation_memory_node(self.conversation_chain))
         graph.add_node("egress", build_egress_node(self.state_store))
 
         graph.set_entry_point("ingress")
+        # Policy và action chỉ đọc user_action nên chạy song song với nhánh scene/persona.
         graph.add_edge("ingress", "semantic")
+        graph.add_edge("ingress", "policy")
+        graph.add_edge("ingress", "action")
         graph.add_edge("semantic", "persona")
-        graph.add_edge("persona", "policy")
-        graph.add_edge("policy", "action")
-        graph.add_edge("action", "transition")
+        graph.add_edge(["persona", "policy", "action"], "join")
+        graph.add_edge("join", "transition")
         graph.add_edge("transition", "responder")
         graph.add_edge("responder", "state_update")
-        graph.add_edge("state_update", "egress")
+        graph.add_edge("state_update", "conversation")
+        graph.add_edge("conversation", "egress")
         graph.add_edge("egress", END)
 
         return graph
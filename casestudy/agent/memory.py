@@ -1,11 +1,14 @@
 from __future__ import annotations
 
-
-from dataclasses import dataclass
+import logging
+from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional, Tuple
 
-from casestudy.app.core.config import get_settings as get_app_settings
-from casestudy.app.db.database import get_mongo_client
+from casestudy.app.crud.case_crud import fetch_case_bundle
+
+from .event_graph import EventGraph, EventNode
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -15,23 +18,36 @@ class LogicMemory:
     event_sequence: List[str]
     personas: Dict[str, Dict[str, Any]]
     context: Dict[str, Any]
+    # persona_id -> digest đã tính sẵn (xem persona_digest.ensure_persona_digests).
+    persona_digests: Dict[str, str] = field(default_factory=dict)
+    # Chỉ mục skeleton dựng một lần (rubric, persona, cạnh chuyển tiếp); xem event_graph.py.
+    event_graph: EventGraph = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.event_graph = EventGraph.compile(self.canon_events, self.event_sequence, self.personas)
 
     @classmethod
     def load(cls, case_id: str) -> "LogicMemory":
         context, personas, skeleton = _load_case_payload(case_id)
         events = skeleton.get("canon_events", [])
 
-        return cls(
+        memory = cls(
             case_id=case_id,
             canon_events={event["id"]: event for event in events if event.get("id")},
             event_sequence=[event["id"] for event in events if event.get("id")],
             personas={persona["id"]: persona for persona in personas if persona.get("id")},
             context=context.get("initial_context") or context,
         )
+        for issue in memory.event_graph.issues:
+            logger.warning("Skeleton case '%s': %s", case_id, issue)
+        return memory
 
     def get_event(self, event_id: str) -> Optional[Dict[str, Any]]:
         return self.canon_events.get(event_id)
 
+    def get_node(self, event_id: Optional[str]) -> Optional[EventNode]:
+        return self.event_graph.get(event_id)
+
     def get_persona(self, persona_id: str) -> Optional[Dict[str, Any]]:
         return self.personas.get(persona_id)
 
@@ -58,14 +74,8 @@ def _load_case_payload(case_id: str) -> Tuple[Dict[str, Any], List[Dict[str, Any
 
 
 def _load_from_mongo(case_id: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]], Dict[str, Any]]:
-    client = get_mongo_client()
-    if client is None:
+    try:
+        bundle = fetch_case_bundle(case_id)
+    except RuntimeError:
         return {}, [], {}
-
-    settings = get_app_settings()
-    db = client[settings.mongo_db]
-
-    context = db.contexts.find_one({"case_id": case_id}, {"_id": 0}) or {}
-    personas = list(db.personas.find({"case_id": case_id}, {"_id": 0}) or [])
-    skeleton = db.skeletons.find_one({"case_id": case_id}, {"_id": 0}) or {}
-    return context, personas, skeleton
+    return bundle.context or {}, bundle.personas, bundle.skeleton or {}
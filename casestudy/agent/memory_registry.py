@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from casestudy.app.core.config import get_settings as get_app_settings
+from casestudy.app.crud.case_crud import fetch_case_version, watch_case_versions
+
+from .memory import LogicMemory
+
+logger = logging.getLogger(__name__)
+
+InvalidationListener = Callable[[str], None]
+
+
+@dataclass
+class _RegistryEntry:
+    memory: LogicMemory
+    version: Optional[int]
+    checked_at: float
+
+
+class LogicMemoryRegistry:
+    """
+    Cache LogicMemory dùng chung trong tiến trình theo `case_id` kèm phiên bản nội dung.
+
+    Phiên bản lấy từ collection `case_versions` (được tăng mỗi khi case bị ghi/xóa).
+    Khi change stream hoạt động, entry chỉ bị bỏ khi có sự kiện nên case "nóng" không tốn
+    truy vấn nào; nếu không (MongoDB standalone, mất kết nối...) registry kiểm tra lại phiên
+    bản sau mỗi `poll_seconds`.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], LogicMemory] = LogicMemory.load,
+        version_reader: Callable[[str], int] = fetch_case_version,
+        *,
+        poll_seconds: float = 5.0,
+        max_size: int = 128,
+    ) -> None:
+        self._loader = loader
+        self._version_reader = version_reader
+        self._poll_seconds = poll_seconds
+        self._max_size = max(1, max_size)
+        self._entries: "OrderedDict[str, _RegistryEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._listeners: List[InvalidationListener] = []
+        self._watch_thread: Optional[threading.Thread] = None
+        self._watching = False
+        self.hits = 0
+        self.version_checks = 0
+        self.loads = 0
+        self.invalidations = 0
+
+    def get(self, case_id: str) -> LogicMemory:
+        entry = self._fresh_entry(case_id)
+        if entry is not None:
+            return entry.memory
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(case_id, threading.Lock())
+        with load_lock:
+            entry = self._fresh_entry(case_id)
+            if entry is not None:
+                return entry.memory
+
+            with self._lock:
+                current = self._entries.get(case_id)
+            # Đọc phiên bản trước khi tải: nếu case bị sửa trong lúc tải, lần kiểm tra sau sẽ thấy.
+            version = self._read_version(case_id)
+            if current is not None and version is not None and version == current.version:
+                current.checked_at = time.monotonic()
+                return current.memory
+
+            try:
+                memory = self._loader(case_id)
+            except Exception:
+                if current is None:
+                    raise
+                logger.warning("Không tải lại được LogicMemory của case '%s', dùng bản cũ.", case_id)
+                current.checked_at = time.monotonic()
+                return current.memory
+
+            self._store(case_id, _RegistryEntry(memory, version, time.monotonic()))
+            if current is not None:
+                self._notify(case_id)
+            return memory
+
+    def invalidate(self, case_id: Optional[str] = None) -> int:
+        """
+        Bỏ LogicMemory của một case (hoặc toàn bộ), trả về số entry bị xóa.
+        """
+        with self._lock:
+            if case_id is None:
+                removed = list(self._entries)
+                self._entries.clear()
+            else:
+                removed = [case_id] if self._entries.pop(case_id, None) is not None else []
+            self.invalidations += len(removed)
+        for removed_id in removed:
+            self._notify(removed_id)
+        return len(removed)
+
+    def add_listener(self, listener: InvalidationListener) -> None:
+        """
+        Đăng ký hàm được gọi với `case_id` mỗi khi LogicMemory của case thay đổi.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def start_watching(self) -> bool:
+        """
+        Chạy change stream trên `case_versions` ở thread nền; trả False nếu không mở được
+        (khi đó registry tiếp tục dùng cơ chế polling).
+        """
+        if self._watch_thread is not None and self._watch_thread.is_alive():
+            return True
+        try:
+            stream = watch_case_versions()
+        except Exception as exc:
+            logger.info("Không mở được change stream case_versions (%s); dùng polling.", exc)
+            return False
+        self._watching = True
+        self._watch_thread = threading.Thread(
+            target=self._consume, args=(stream,), name="logic-memory-watch", daemon=True
+        )
+        self._watch_thread.start()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self._max_size,
+                "watching": self._watching,
+                "poll_seconds": self._poll_seconds,
+                "hits": self.hits,
+                "version_checks": self.version_checks,
+                "loads": self.loads,
+                "invalidations": self.invalidations,
+            }
+
+    def _fresh_entry(self, case_id: str) -> Optional[_RegistryEntry]:
+        with self._lock:
+            entry = self._entries.get(case_id)
+            if entry is None:
+                return None
+            if self._watching or time.monotonic() - entry.checked_at < self._poll_seconds:
+                self._entries.move_to_end(case_id)
+                self.hits += 1
+                return entry
+            return None
+
+    def _read_version(self, case_id: str) -> Optional[int]:
+        with self._lock:
+            self.version_checks += 1
+        try:
+            return self._version_reader(case_id)
+        except Exception as exc:
+            logger.debug("Không đọc được phiên bản case '%s': %s", case_id, exc)
+            return None
+
+    def _store(self, case_id: str, entry: _RegistryEntry) -> None:
+        with self._lock:
+            self.loads += 1
+            self._entries[case_id] = entry
+            self._entries.move_to_end(case_id)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def _notify(self, case_id: str) -> None:
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(case_id)
+            except Exception as exc:  # pragma: no cover - defensive
+                logger.warning("Listener invalidation LogicMemory lỗi: %s", exc)
+
+    def _consume(self, stream) -> None:
+        try:
+            with stream:
+                for change in stream:
+                    case_id = (change.get("documentKey") or {}).get("_id")
+                    if case_id:
+                        self.invalidate(str(case_id))
+        except Exception as exc:
+            logger.warning("Change stream case_versions dừng (%s); chuyển sang polling.", exc)
+        finally:
+            self._watching = False
+
+
+_registry: Optional[LogicMemoryRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_logic_memory_registry() -> LogicMemoryRegistry:
+    """
+    Registry dùng chung của tiến trình, cấu hình qua LOGIC_MEMORY_* trong settings.
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                settings = get_app_settings()
+                registry = LogicMemoryRegistry(
+                    poll_seconds=settings.logic_memory_poll_seconds,
+                    max_size=settings.logic_memory_cache_size,
+                )
+                if settings.logic_memory_watch:
+                    registry.start_watching()
+                _registry = registry
+    return _registry
@@ -3,9 +3,11 @@ from .semantic import build_semantic_node
 from .persona import build_persona_dialogue_node
 from .policy import build_policy_node
 from .action import build_action_node
+from .join import build_join_node
 from .transition import build_transition_node
 from .responder import build_responder_node
 from .state_update import build_state_update_node
+from .conversation import build_conversation_memory_node
 from .egress import build_egress_node
 
 __all__ = [
@@ -14,8 +16,10 @@ __all__ = [
     "build_persona_dialogue_node",
     "build_policy_node",
     "build_action_node",
+    "build_join_node",
     "build_transition_node",
     "build_responder_node",
     "build_state_update_node",
+    "build_conversation_memory_node",
     "build_egress_node",
 ]
@@ -1,58 +1,103 @@
 from __future__ import annotations
 
-from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from ...utils.cache import LRUCache
+from ..chains.base import ainvoke_chain
+from ..const import RUBRIC_CACHE_SIZE
+from ..event_graph import EventNode
 from ..memory import LogicMemory
 from ..state import RuntimeState
-from typing import Any
-from ..chains.action import normalize_success_criteria
+from typing import Any, Dict, List, Optional, Tuple
+from ..chains.action import format_rubric_for_prompt, normalize_success_criteria
 
 def build_action_node(
     logic_memory: LogicMemory,
     action_chain,
+    *,
+    rubric_cache: Optional[LRUCache] = None,
 ) -> Any:
     """
     Evaluate learner actions against the current canon event requirements.
+    Results are staged in `branch_updates` and merged by the join node.
+    Criteria are tracked in `event_summary` as compact IDs (see EventNode.criterion_ids);
+    the rubric subset and its rendered prompt text are cached per remaining-ID signature.
     """
+    rubric_cache = rubric_cache if rubric_cache is not None else LRUCache(max_size=RUBRIC_CACHE_SIZE)
 
-    def evaluate(state: RuntimeState, _: RunnableConfig = None) -> RuntimeState:
+    def _rubric_for(node: EventNode, criterion_ids: List[str]) -> Tuple[List[Dict[str, Any]], str]:
+        key = (node.id, tuple(criterion_ids))
+        cached = rubric_cache.get(key)
+        if cached is None:
+            rubric = [node.criterion(criterion_id) for criterion_id in criterion_ids]
+            cached = (rubric, format_rubric_for_prompt(rubric))
+            rubric_cache.set(key, cached)
+        return cached
+
+    def _build_payload(state: RuntimeState) -> Dict[str, Any]:
         event_id = state.current_event
-        event = logic_memory.get_event(event_id)
+        node = logic_memory.get_node(event_id)
+        remaining = state.event_summary.get(f"{event_id}_remaining_success_criteria")
 
-        success_criteria_source = normalize_success_criteria(event.get("success_criteria", [])) if event else []
-        remaining_key = f"{event_id}_remaining_success_criteria"
-        completed_key = f"{event_id}_completed_success_criteria"
+        if node is None:
+            return {
+                "user_action": state.user_action,
+                "event_id": event_id,
+                "success_criteria": normalize_success_criteria(remaining or []),
+            }
 
-        remaining_success_criteria = state.event_summary.get(remaining_key)
-        if remaining_success_criteria is None:
-            remaining_success_criteria = list(success_criteria_source)
-        else:
-            remaining_success_criteria = normalize_success_criteria(remaining_success_criteria)
+        criterion_ids = node.to_criterion_ids(remaining)
+        rubric, rubric_text = _rubric_for(node, criterion_ids)
+        return {
+            "user_action": state.user_action,
+            "event_id": event_id,
+            "success_criteria": rubric,
+            "rubric_text": rubric_text,
+            "criterion_ids": criterion_ids,
+        }
 
+    def _build_update(
+        state: RuntimeState,
+        payload: Dict[str, Any],
+        result: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        event_id = state.current_event
+        remaining_key = f"{event_id}_remaining_success_criteria"
+        completed_key = f"{event_id}_completed_success_criteria"
         existing_completed = state.event_summary.get(completed_key, [])
 
-        result = action_chain(
-            {
-                "user_action": state.user_action,
-                "success_criteria": remaining_success_criteria,
-            }
-        )
-
-        updated_remaining = result.get("remaining_success_criteria", remaining_success_criteria)
-        satisfied_now = result.get("satisfied_success_criteria", [])
-        partial_matches = result.get("partial_success_criteria", [])
+        node = logic_memory.get_node(event_id)
+        if node is not None and "remaining_criterion_ids" in result:
+            existing_completed = node.to_criterion_ids(existing_completed)
+            updated_remaining = result["remaining_criterion_ids"]
+            satisfied_now = result.get("satisfied_criterion_ids", [])
+            partial_matches = result.get("partial_criterion_ids", [])
+        else:
+            updated_remaining = result.get("remaining_success_criteria", payload["success_criteria"])
+            satisfied_now = result.get("satisfied_success_criteria", [])
+            partial_matches = result.get("partial_success_criteria", [])
 
         updated_completed = [
             *existing_completed,
             *(criterion for criterion in satisfied_now if criterion not in existing_completed),
         ]
 
-        state.event_summary[event_id] = result.get("status", "pending")
-        state.event_summary[f"{event_id}_matched"] = result.get("matched_actions", [])
-        state.event_summary[f"{event_id}_scores"] = result.get("scores", [])
-        state.event_summary[remaining_key] = updated_remaining
-        state.event_summary[completed_key] = updated_completed
-        state.event_summary[f"{event_id}_partial"] = partial_matches
+        return {
+            "branch_updates": {
+                event_id: result.get("status", "pending"),
+                f"{event_id}_matched": result.get("matched_actions", []),
+                f"{event_id}_scores": result.get("scores", []),
+                remaining_key: updated_remaining,
+                completed_key: updated_completed,
+                f"{event_id}_partial": partial_matches,
+            }
+        }
+
+    def evaluate(state: RuntimeState, _: RunnableConfig = None) -> Dict[str, Any]:
+        payload = _build_payload(state)
+        return _build_update(state, payload, action_chain(payload))
 
-        return state
+    async def aevaluate(state: RuntimeState, _: RunnableConfig = None) -> Dict[str, Any]:
+        payload = _build_payload(state)
+        return _build_update(state, payload, await ainvoke_chain(action_chain, payload))
 
-    return evaluate
+    return RunnableLambda(evaluate, afunc=aevaluate, name="action")
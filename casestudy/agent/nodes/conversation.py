@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+
+from ..chains.base import ainvoke_chain
+from ..const import DIALOGUE_WINDOW_KEEP, DIALOGUE_WINDOW_SIZE
+from ..state import ConversationMemory, RuntimeState
+
+logger = logging.getLogger(__name__)
+
+
+def build_conversation_memory_node(
+    summary_chain,
+    *,
+    window_size: int = DIALOGUE_WINDOW_SIZE,
+    keep: int = DIALOGUE_WINDOW_KEEP,
+) -> Any:
+    """
+    Giữ cửa sổ hội thoại có giới hạn: khi số dòng chưa tóm tắt vượt `window_size`,
+    gộp các dòng cũ vào `state.conversation.summary` và chỉ để lại `keep` dòng gần nhất.
+    Lỗi LLM không chặn lượt chơi; cửa sổ vẫn bị cắt ở `window_size` khi đưa vào prompt.
+    """
+    keep = max(0, min(keep, window_size))
+
+    def _overflow(state: RuntimeState) -> Optional[Tuple[List[Dict[str, str]], int]]:
+        history = state.dialogue_history
+        start = min(state.conversation.summarized_count, len(history))
+        if len(history) - start <= window_size:
+            return None
+        end = len(history) - keep
+        return history[start:end], end
+
+    def _payload(state: RuntimeState, lines: List[Dict[str, str]]) -> Dict[str, Any]:
+        return {"previous_summary": state.conversation.summary, "dialogue": lines}
+
+    def _apply(state: RuntimeState, summary: str, end: int) -> RuntimeState:
+        state.conversation = ConversationMemory(
+            summary=summary or state.conversation.summary,
+            summarized_count=end,
+        )
+        return state
+
+    def summarize(state: RuntimeState, _: RunnableConfig = None) -> RuntimeState:
+        overflow = _overflow(state)
+        if overflow is None:
+            return state
+        lines, end = overflow
+        try:
+            summary = summary_chain(_payload(state, lines))
+        except Exception as exc:
+            logger.warning("Không tóm tắt được hội thoại, giữ bản tóm tắt cũ: %s", exc)
+            return state
+        return _apply(state, summary, end)
+
+    async def asummarize(state: RuntimeState, _: RunnableConfig = None) -> RuntimeState:
+        overflow = _overflow(state)
+        if overflow is None:
+            return state
+        lines, end = overflow
+        try:
+            summary = await ainvoke_chain(summary_chain, _payload(state, lines))
+        except Exception as exc:
+            logger.warning("Không tóm tắt được hội thoại, giữ bản tóm tắt cũ: %s", exc)
+            return state
+        return _apply(state, summary, end)
+
+    return RunnableLambda(summarize, afunc=asummarize, name="conversation")
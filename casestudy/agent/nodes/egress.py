@@ -9,10 +9,14 @@ from typing import Any
 def build_egress_node(state_store: RuntimeStateStore) -> Any:
     """
     Persist runtime state and expose it for downstream tools (e.g., UI, logging).
+    A per-session store passed via `configurable["state_store"]` takes precedence,
+    which lets one compiled graph serve many sessions.
     """
 
-    def egress(state: RuntimeState, _: RunnableConfig = None) -> RuntimeState:
-        state_store.save(state)
+    def egress(state: RuntimeState, config: RunnableConfig = None) -> RuntimeState:
+        configurable = (config or {}).get("configurable") or {}
+        target_store = configurable.get("state_store") or state_store
+        target_store.save(state)
         return state
 
     return egress
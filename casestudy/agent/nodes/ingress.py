@@ -18,25 +18,27 @@ def build_ingress_node(
     """
 
     def _apply_event_limits(state: RuntimeState, event_id: str) -> None:
-        event = logic_memory.get_event(event_id) if event_id else None
-        state.max_turns = event.get("timeout_turn", 0) if event else 0
+        node = logic_memory.get_node(event_id)
+        state.max_turns = node.timeout_turn if node else 0
 
     def ingress(state: RuntimeState, config: RunnableConfig = None) -> RuntimeState:
         cfg = dict(config or {})
+        # LangGraph chuyển các key tùy biến của config vào `configurable`.
+        configurable = cfg.get("configurable") or {}
 
-        explicit_start = cfg.get("start_event")
-        should_reset = cfg.get("reset_state", False)
+        explicit_start = configurable.get("start_event", cfg.get("start_event"))
+        should_reset = configurable.get("reset_state", cfg.get("reset_state", False))
 
         if should_reset:
             target_event = explicit_start or default_event
             state.current_event = target_event
             state.turn_count = 0
-            state.dialogue_history.clear()
+            state.reset_dialogue()
             state.event_summary.clear()
         elif explicit_start:
             state.current_event = explicit_start
             state.turn_count = 0
-            state.dialogue_history.clear()
+            state.reset_dialogue()
 
         if not state.current_event:
             state.current_event = default_event
@@ -45,17 +47,11 @@ def build_ingress_node(
         state.event_summary["_last_persona_dialogue"] = []
         _apply_event_limits(state, state.current_event)
 
-        current_event = logic_memory.get_event(state.current_event)
-        if current_event:
-            remaining_key = f"{state.current_event}_remaining_success_criteria"
-            completed_key = f"{state.current_event}_completed_success_criteria"
-            partial_key = f"{state.current_event}_partial"
-
-            state.event_summary.setdefault(
-                remaining_key, list(current_event.get("success_criteria", []))
-            )
-            state.event_summary.setdefault(completed_key, [])
-            state.event_summary.setdefault(partial_key, [])
+        current_node = logic_memory.get_node(state.current_event)
+        if current_node is not None:
+            # Rubric có thể đã đổi kể từ lượt trước (case được sửa giữa phiên): ánh xạ lại
+            # tiến độ tiêu chí sang bộ ID hiện tại trước khi action node đọc.
+            current_node.reconcile(state.event_summary)
 
         return state
 
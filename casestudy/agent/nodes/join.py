@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from langchain_core.runnables import RunnableConfig
+
+from ..state import RuntimeState
+from typing import Any, Dict
+
+def build_join_node() -> Any:
+    """
+    Merge partial updates produced by the parallel semantic/policy/action branches.
+    """
+
+    def join(state: RuntimeState, _: RunnableConfig = None) -> Dict[str, Any]:
+        event_summary = dict(state.event_summary)
+        event_summary.update(state.branch_updates or {})
+        return {"event_summary": event_summary, "branch_updates": None}
+
+    return join
@@ -1,21 +1,16 @@
 from __future__ import annotations
 
 import json
-from typing import Any, Dict, Iterable, List
+from typing import Any, Dict, List, Optional
 
-from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 
+from ..chains.base import ainvoke_chain
+from ..chains.conversation import format_dialogue
 from ..memory import LogicMemory
 from ..state import PersonaState, RuntimeState
 
 
-def _format_recent_history(history: Iterable[Dict[str, str]], limit: int = 5) -> str:
-    window = list(history)[-limit:]
-    if not window:
-        return "Chưa có hội thoại."
-    return "\n".join(f"{turn.get('speaker', 'unknown')}: {turn.get('content', '')}" for turn in window)
-
-
 def _format_persona_slate(personas: Dict[str, PersonaState]) -> str:
     if not personas:
         return "Không có nhân vật."
@@ -88,36 +83,39 @@ def build_persona_dialogue_node(
     Generate NPC dialogue snippets in reaction to the learner action.
     """
 
-    def persona_dialogue(state: RuntimeState, _: RunnableConfig = None) -> RuntimeState:
+    def _build_payload(state: RuntimeState) -> Optional[Dict[str, Any]]:
         if not state.active_personas:
-            return state
+            return None
 
         user_action = state.user_action or ""
         if not user_action.strip():
-            return state
-
-        event = logic_memory.get_event(state.current_event)
-        event_title = event.get("title", state.current_event) if event else state.current_event
-
-        persona_slate = _format_persona_slate(state.active_personas)
-        recent_history = _format_recent_history(state.dialogue_history)
-
-        raw_output = persona_dialogue_chain(
-            {
-                "event_title": event_title,
-                "scene_summary": state.scene_summary or "Chưa có dữ liệu.",
-                "user_action": user_action,
-                "persona_slate": persona_slate,
-                "recent_history": recent_history,
-            }
-        )
-
+            return None
+
+        node = logic_memory.get_node(state.current_event)
+        event_title = node.title if node else state.current_event
+
+        return {
+            "event_title": event_title,
+            "scene_summary": state.scene_summary or "Chưa có dữ liệu.",
+            "user_action": user_action,
+            "persona_slate": _format_persona_slate(state.active_personas),
+            "recent_history": format_dialogue(state.recent_dialogue(limit=5)),
+            "conversation_summary": state.conversation.summary,
+        }
+
+    def persona_dialogue(state: RuntimeState, _: RunnableConfig = None) -> Dict[str, Any]:
+        payload = _build_payload(state)
+        if payload is None:
+            return {}
+        persona_lines = _parse_persona_dialogue(persona_dialogue_chain(payload))
+        return {"branch_updates": {"_last_persona_dialogue": persona_lines}}
+
+    async def apersona_dialogue(state: RuntimeState, _: RunnableConfig = None) -> Dict[str, Any]:
+        payload = _build_payload(state)
+        if payload is None:
+            return {}
+        raw_output = await ainvoke_chain(persona_dialogue_chain, payload)
         persona_lines = _parse_persona_dialogue(raw_output)
-        if not persona_lines:
-            state.event_summary["_last_persona_dialogue"] = []
-            return state
-
-        state.event_summary["_last_persona_dialogue"] = persona_lines
-        return state
+        return {"branch_updates": {"_last_persona_dialogue": persona_lines}}
 
-    return persona_dialogue
+    return RunnableLambda(persona_dialogue, afunc=apersona_dialogue, name="persona")
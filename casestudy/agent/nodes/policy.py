@@ -1,16 +1,20 @@
 from __future__ import annotations
 
-from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from ..chains.base import ainvoke_chain
 from ..state import RuntimeState
-from typing import Any
+from typing import Any, Dict
 
 def build_policy_node(policy_chain) -> Any:
     """
     Attach nearest policy guidance based on the latest user action.
     """
 
-    def policy(state: RuntimeState, _: RunnableConfig = None) -> RuntimeState:
-        state.policy_flags = policy_chain({"user_action": state.user_action})
-        return state
+    def policy(state: RuntimeState, _: RunnableConfig = None) -> Dict[str, Any]:
+        return {"policy_flags": policy_chain({"user_action": state.user_action})}
 
-    return policy
+    async def apolicy(state: RuntimeState, _: RunnableConfig = None) -> Dict[str, Any]:
+        flags = await ainvoke_chain(policy_chain, {"user_action": state.user_action})
+        return {"policy_flags": flags}
+
+    return RunnableLambda(policy, afunc=apolicy, name="policy")
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
-from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from ..chains.base import ainvoke_chain
 from ..memory import LogicMemory
 from ..state import RuntimeState
-from typing import Any
+from typing import Any, Dict
 
 def build_responder_node(
     logic_memory: LogicMemory,
@@ -13,9 +14,9 @@ def build_responder_node(
     Produce facilitator feedback via the responder chain.
     """
 
-    def respond(state: RuntimeState, _: RunnableConfig = None) -> RuntimeState:
+    def _build_payload(state: RuntimeState) -> Dict[str, Any]:
         event_id = state.current_event
-        event = logic_memory.get_event(event_id)
+        node = logic_memory.get_node(event_id)
         persona_overview = [
             f"{persona.name} ({persona.role}) - cảm xúc: {persona.emotion}"
             for persona in state.active_personas.values()
@@ -25,33 +26,47 @@ def build_responder_node(
         completed_key = f"{event_id}_completed_success_criteria"
         partial_key = f"{event_id}_partial"
 
-        base_success = event.get("success_criteria", []) if event else []
-        remaining_success = state.event_summary.get(remaining_key, base_success)
+        remaining_success = state.event_summary.get(remaining_key)
         completed_success = state.event_summary.get(completed_key, [])
         partial_success = state.event_summary.get(partial_key, [])
+        if node is not None:
+            # event_summary lưu ID tiêu chí; prompt cần mô tả đầy đủ.
+            remaining_success = node.describe(node.to_criterion_ids(remaining_success))
+            completed_success = node.describe(node.to_criterion_ids(completed_success))
+            partial_success = node.describe(node.to_criterion_ids(partial_success))
+        elif remaining_success is None:
+            remaining_success = []
 
-        ai_reply = responder_chain(
-            {
-                "event_title": event.get("title", event_id) if event else event_id,
-                "scene_summary": state.scene_summary or "Chưa có dữ liệu.",
-                "success_criteria": remaining_success,
-                "completed_success_criteria": completed_success,
-                "partial_success_criteria": partial_success,
-                # Provide legacy key until downstream consumers migrate fully.
-                "required_actions": remaining_success,
-                "persona_overview": "; ".join(persona_overview) or "Không có.",
-                "dialogue_history": state.dialogue_history,
-                "policy_flags": state.policy_flags,
-                "user_action": state.user_action or "Chưa ghi nhận.",
-                "turn_count": state.turn_count,
-                "max_turns": state.max_turns,
-                "system_notice": state.system_notice,
-            }
-        )
+        return {
+            "event_title": node.title if node else event_id,
+            "scene_summary": state.scene_summary or "Chưa có dữ liệu.",
+            "success_criteria": remaining_success,
+            "completed_success_criteria": completed_success,
+            "partial_success_criteria": partial_success,
+            # Provide legacy key until downstream consumers migrate fully.
+            "required_actions": remaining_success,
+            "persona_overview": "; ".join(persona_overview) or "Không có.",
+            # Chỉ cửa sổ gần nhất; phần cũ hơn nằm trong bản tóm tắt hội thoại.
+            "dialogue_history": state.recent_dialogue(),
+            "conversation_summary": state.conversation.summary,
+            "policy_flags": state.policy_flags,
+            "user_action": state.user_action or "Chưa ghi nhận.",
+            "turn_count": state.turn_count,
+            "max_turns": state.max_turns,
+            "system_notice": state.system_notice,
+        }
 
+    def _apply_reply(state: RuntimeState, ai_reply: str) -> RuntimeState:
         state.ai_reply = ai_reply
         if not state.system_notice:
             state.turn_count = state.turn_count + 1
         return state
 
-    return respond
+    def respond(state: RuntimeState, _: RunnableConfig = None) -> RuntimeState:
+        return _apply_reply(state, responder_chain(_build_payload(state)))
+
+    async def arespond(state: RuntimeState, _: RunnableConfig = None) -> RuntimeState:
+        ai_reply = await ainvoke_chain(responder_chain, _build_payload(state))
+        return _apply_reply(state, ai_reply)
+
+    return RunnableLambda(respond, afunc=arespond, name="responder")
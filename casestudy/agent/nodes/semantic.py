@@ -1,27 +1,17 @@
 from __future__ import annotations
 
+import asyncio
 from typing import Any, Dict, List
 
-from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 
+from ..chains.base import ainvoke_chain
+from ..event_graph import EventNode
 from ..memory import LogicMemory
+from ..persona_digest import extract_persona_profiles
 from ..state import PersonaState, RuntimeState
 
 
-def _extract_persona_profiles(digest_text: str) -> Dict[str, str]:
-    profiles: Dict[str, str] = {}
-    for line in digest_text.splitlines():
-        stripped = line.strip()
-        if not stripped.startswith("- "):
-            continue
-        persona_id, _, description = stripped[2:].partition(":")
-        persona_id = persona_id.strip()
-        description = description.strip()
-        if persona_id:
-            profiles[persona_id] = description or "Chưa có mô tả."
-    return profiles
-
-
 def build_semantic_node(
     logic_memory: LogicMemory,
     scene_chain,
@@ -29,43 +19,44 @@ def build_semantic_node(
 ) -> Any:
     """
     Populate scene summary and active persona states using semantic memory chains.
+    Runs as a parallel branch, so it returns a partial update instead of the state.
+    Persona digests precomputed in `logic_memory.persona_digests` are served directly;
+    `persona_chain` only runs for personas that have no digest yet.
     """
 
-    def semantic(state: RuntimeState, _: RunnableConfig = None) -> RuntimeState:
-        event = logic_memory.get_event(state.current_event)
-        if not event:
-            return state
-
+    def _scene_payload(state: RuntimeState, node: EventNode) -> Dict[str, Any]:
         last_event_with_summary = state.event_summary.get("_last_scene_event")
         if last_event_with_summary != state.current_event:
             previous_summary = None
         else:
             previous_summary = state.scene_summary
 
-        description = event.get("description", "")
-        scene_summary = scene_chain(
-            {
-                "query": description,
-                "event_title": event.get("title", state.current_event),
-                "event_description": description,
-                "previous_summary": previous_summary or "Chưa có dữ liệu.",
-                "user_action": state.user_action or "Chưa ghi nhận.",
-            }
-        )
-        state.scene_summary = scene_summary
-        state.event_summary["_last_scene_event"] = state.current_event
-
-        persona_ids: List[str] = [
-            appearance["persona_id"]
-            for appearance in event.get("npc_appearance", [])
-            if appearance.get("persona_id") in logic_memory.personas
+        return {
+            "query": node.description,
+            "event_id": state.current_event,
+            "event_title": node.title,
+            "event_description": node.description,
+            "previous_summary": previous_summary or "Chưa có dữ liệu.",
+            "conversation_summary": state.conversation.summary,
+            "user_action": state.user_action or "Chưa ghi nhận.",
+        }
+
+    def _missing_digests(persona_ids: List[str]) -> List[str]:
+        return [
+            persona_id
+            for persona_id in persona_ids
+            if persona_id not in logic_memory.persona_digests
         ]
 
-        if persona_ids:
-            digest_text = persona_chain({"persona_ids": persona_ids})
-            persona_profiles = _extract_persona_profiles(digest_text)
-        else:
-            persona_profiles = {}
+    def _build_update(
+        state: RuntimeState,
+        scene_summary: str,
+        persona_ids: List[str],
+        digest_text: str,
+    ) -> Dict[str, Any]:
+        persona_profiles = dict(logic_memory.persona_digests)
+        if digest_text:
+            persona_profiles.update(extract_persona_profiles(digest_text))
 
         active_personas: Dict[str, PersonaState] = {}
         for persona_id in persona_ids:
@@ -79,7 +70,39 @@ def build_semantic_node(
                 profile=persona_profiles.get(persona_id),
             )
 
-        state.active_personas = active_personas
-        return state
+        return {
+            "scene_summary": scene_summary,
+            "active_personas": active_personas,
+            "branch_updates": {"_last_scene_event": state.current_event},
+        }
+
+    def semantic(state: RuntimeState, _: RunnableConfig = None) -> Dict[str, Any]:
+        node = logic_memory.get_node(state.current_event)
+        if node is None:
+            return {}
+
+        scene_summary = scene_chain(_scene_payload(state, node))
+        persona_ids = list(node.persona_ids)
+        missing_ids = _missing_digests(persona_ids)
+        digest_text = persona_chain({"persona_ids": missing_ids}) if missing_ids else ""
+        return _build_update(state, scene_summary, persona_ids, digest_text)
+
+    async def asemantic(state: RuntimeState, _: RunnableConfig = None) -> Dict[str, Any]:
+        node = logic_memory.get_node(state.current_event)
+        if node is None:
+            return {}
+
+        persona_ids = list(node.persona_ids)
+        missing_ids = _missing_digests(persona_ids)
+        # Digest nhân vật không phụ thuộc scene summary nên gọi đồng thời.
+        scene_task = ainvoke_chain(scene_chain, _scene_payload(state, node))
+        if missing_ids:
+            scene_summary, digest_text = await asyncio.gather(
+                scene_task,
+                ainvoke_chain(persona_chain, {"persona_ids": missing_ids}),
+            )
+        else:
+            scene_summary, digest_text = await scene_task, ""
+        return _build_update(state, scene_summary, persona_ids, digest_text)
 
-    return semantic
+    return RunnableLambda(semantic, afunc=asemantic, name="semantic")
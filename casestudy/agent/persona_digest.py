@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from casestudy.app.crud.case_crud import fetch_persona_digests, upsert_persona_digests
+
+from .memory import LogicMemory
+
+logger = logging.getLogger(__name__)
+
+
+def extract_persona_profiles(digest_text: str) -> Dict[str, str]:
+    """
+    Tách digest dạng `- persona_id: mô tả` thành map persona_id -> mô tả.
+    """
+    profiles: Dict[str, str] = {}
+    for line in digest_text.splitlines():
+        stripped = line.strip()
+        if not stripped.startswith("- "):
+            continue
+        persona_id, _, description = stripped[2:].partition(":")
+        persona_id = persona_id.strip()
+        description = description.strip()
+        if persona_id:
+            profiles[persona_id] = description or "Chưa có mô tả."
+    return profiles
+
+
+def persona_source_hash(persona: Dict[str, Any]) -> str:
+    """
+    Hash nội dung persona để biết digest đã lưu còn khớp dữ liệu case hay không.
+    """
+    encoded = json.dumps(persona, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def ensure_persona_digests(logic_memory: LogicMemory, persona_chain) -> Dict[str, str]:
+    """
+    Nạp digest của mọi persona trong case vào `logic_memory.persona_digests`.
+
+    Digest còn khớp hash trong MongoDB được dùng lại; persona mới hoặc đã chỉnh sửa
+    được tính bằng một lần gọi `persona_chain` rồi ghi lại vào MongoDB.
+    """
+    case_id = logic_memory.case_id
+    source_hashes = {
+        persona_id: persona_source_hash(persona)
+        for persona_id, persona in logic_memory.personas.items()
+    }
+
+    try:
+        stored = {doc["persona_id"]: doc for doc in fetch_persona_digests(case_id)}
+    except Exception as exc:  # pragma: no cover - phụ thuộc MongoDB ngoài hệ thống
+        logger.warning("Không đọc được persona digest của case '%s': %s", case_id, exc)
+        stored = {}
+
+    digests: Dict[str, str] = {}
+    for persona_id, source_hash in source_hashes.items():
+        doc = stored.get(persona_id)
+        if doc and doc.get("source_hash") == source_hash and doc.get("digest"):
+            digests[persona_id] = doc["digest"]
+
+    missing = [persona_id for persona_id in source_hashes if persona_id not in digests]
+    if missing:
+        computed = extract_persona_profiles(persona_chain({"persona_ids": missing}))
+        now = datetime.now(timezone.utc)
+        documents: List[Dict[str, Any]] = []
+        for persona_id in missing:
+            digest = computed.get(persona_id)
+            if not digest:
+                continue
+            digests[persona_id] = digest
+            documents.append(
+                {
+                    "persona_id": persona_id,
+                    "digest": digest,
+                    "source_hash": source_hashes[persona_id],
+                    "updated_at": now,
+                }
+            )
+        if documents:
+            try:
+                upsert_persona_digests(case_id, documents)
+            except Exception as exc:  # pragma: no cover - phụ thuộc MongoDB ngoài hệ thống
+                logger.warning("Không lưu được persona digest của case '%s': %s", case_id, exc)
+
+    logic_memory.persona_digests = digests
+    return digests
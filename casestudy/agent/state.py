@@ -1,12 +1,27 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Annotated, Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
+from .const import DIALOGUE_WINDOW_SIZE
+
 if TYPE_CHECKING:
     from .memory import LogicMemory
 
+
+def merge_branch_updates(
+    current: Optional[Dict[str, Any]],
+    update: Optional[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """
+    Reducer gom các cập nhật `event_summary` từ những nhánh chạy song song.
+    Trả về `None` để xóa vùng đệm sau khi node join đã hợp nhất.
+    """
+    if update is None:
+        return {}
+    return {**(current or {}), **update}
+
 class PersonaState(BaseModel):
     id: str
     name: str
@@ -15,6 +30,16 @@ class PersonaState(BaseModel):
     trust: float = 0.5
     profile: Optional[str] = None
 
+class ConversationMemory(BaseModel):
+    """
+    Tóm tắt cuốn chiếu của hội thoại: `summary` bao quát `summarized_count` dòng đầu của
+    `dialogue_history`, phần còn lại được đưa nguyên văn vào prompt.
+    """
+
+    summary: Optional[str] = None
+    summarized_count: int = 0
+
+
 class RuntimeState(BaseModel):
     case_id: str
     current_event: str
@@ -23,11 +48,27 @@ class RuntimeState(BaseModel):
     scene_summary: Optional[str] = None
     active_personas: Dict[str, PersonaState] = Field(default_factory=dict) 
     dialogue_history: List[Dict[str, str]] = Field(default_factory=list)
+    conversation: ConversationMemory = Field(default_factory=ConversationMemory)
     user_action: Optional[str] = None
     event_summary: Dict[str, Any] = Field(default_factory=dict)  # CE1, CE2...: pass/fail
     policy_flags: List[Dict[str, str]] = Field(default_factory=list)
     ai_reply: Optional[str] = None
     system_notice: Optional[str] = None
+    # Vùng đệm nội bộ của graph, không lưu xuống state store.
+    branch_updates: Annotated[Dict[str, Any], merge_branch_updates] = Field(
+        default_factory=dict, exclude=True
+    )
+
+    def recent_dialogue(self, limit: int = DIALOGUE_WINDOW_SIZE) -> List[Dict[str, str]]:
+        """
+        Các dòng hội thoại chưa được tóm tắt, tối đa `limit` dòng gần nhất.
+        """
+        start = min(self.conversation.summarized_count, len(self.dialogue_history))
+        return self.dialogue_history[start:][-limit:]
+
+    def reset_dialogue(self) -> None:
+        self.dialogue_history.clear()
+        self.conversation = ConversationMemory()
 
     def to_serializable(self) -> Dict[str, Any]:
         data = self.model_dump()
@@ -64,23 +105,25 @@ class RuntimeState(BaseModel):
         start_event: str,
         user_action: Optional[str] = None,
     ) -> "RuntimeState":
-        event = logic_memory.get_event(start_event) or {}
-        success_list = list(event.get("success_criteria", [])) if event else []
+        node = logic_memory.get_node(start_event)
+        success_list = list(node.criterion_ids) if node else []
 
         event_summary: Dict[str, Any] = {
             "_last_scene_event": None,
             "_last_persona_dialogue": [],
             start_event: "pending",
+            f"{start_event}_criteria": dict(node.criteria_labels) if node else {},
             f"{start_event}_remaining_success_criteria": list(success_list),
             f"{start_event}_completed_success_criteria": [],
             f"{start_event}_partial": [],
+            f"{start_event}_rubric_version": node.rubric_version if node else None,
             f"{start_event}_matched": [],
             f"{start_event}_scores": [],
             f"{start_event}_last_result": None,
             f"{start_event}_reason": None,
         }
 
-        max_turns = event.get("timeout_turn", 0) if event else 0
+        max_turns = node.timeout_turn if node else 0
 
         return cls(
             case_id=logic_memory.case_id,
@@ -1,12 +1,16 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
 
 from casestudy.app.dependencies.cases import (
+    get_bulk_import_service,
     get_case_service,
     get_case_draft_service,
 )
 from casestudy.app.schemas.case import (
+    CaseBulkImportPayload,
+    CaseBulkImportResponse,
     CaseCreatePayload,
     CaseCreateResponse,
     CaseDetailResponse,
@@ -14,6 +18,7 @@ from casestudy.app.schemas.case import (
     CaseDraftRequest,
     CaseDraftResponse,
 )
+from casestudy.app.services.bulk_import_service import BulkImportService
 from casestudy.app.services.case_service import CaseService
 from casestudy.app.services.case_draft_service import CaseDraftService
 
@@ -66,6 +71,48 @@ async def create_case_endpoint(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc)
         ) from exc
 
+# ==============================
+# Endpoint: POST /cases/bulk
+# ==============================
+@router.post(
+    "/bulk",
+    response_model=CaseBulkImportResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def bulk_import_cases_endpoint(
+    payload: CaseBulkImportPayload,
+    service: BulkImportService = Depends(get_bulk_import_service),
+) -> CaseBulkImportResponse:
+    """
+    Nhập nhiều case một lượt; semantic memory được sync trong nền,
+    theo dõi tiến độ qua GET /cases/bulk/{job_id}.
+    """
+    sources = ((f"cases[{idx}]", raw) for idx, raw in enumerate(payload.cases))
+    job = await run_in_threadpool(
+        service.import_cases, sources, sync_vectors=payload.sync_vectors
+    )
+    return job.to_response()
+
+
+@router.get(
+    "/bulk/{job_id}",
+    response_model=CaseBulkImportResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_bulk_import_job_endpoint(
+    job_id: str,
+    service: BulkImportService = Depends(get_bulk_import_service),
+) -> CaseBulkImportResponse:
+    """
+    Trạng thái một lượt bulk import (kết quả ghi MongoDB và sync semantic memory từng case).
+    """
+    job = service.get_job(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Không tìm thấy job '{job_id}'."
+        )
+    return job.to_response()
+
 # ==============================
 # Endpoint: POST /cases/draft
 # ==============================
@@ -82,7 +129,7 @@ async def draft_case_endpoint(
     Sinh bản nháp (draft) cho case bằng Gemini hoặc AI service.
     """
     try:
-        return service.draft_case(payload)
+        return await run_in_threadpool(service.draft_case, payload)
     except ValueError as exc:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)
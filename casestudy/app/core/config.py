@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Literal, Optional, Tuple
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -21,6 +21,22 @@ class Settings(BaseSettings):
     mongo_timeout_ms: int = Field(
         default=2_000, alias="MONGO_TIMEOUT_MS", description="Mongo client timeout (ms)."
     )
+    mongo_max_pool_size: int = Field(
+        default=50, alias="MONGO_MAX_POOL_SIZE", description="Số kết nối tối đa mỗi pool."
+    )
+    mongo_min_pool_size: int = Field(
+        default=0, alias="MONGO_MIN_POOL_SIZE", description="Số kết nối giữ sẵn trong pool."
+    )
+    mongo_max_idle_time_ms: int = Field(
+        default=300_000,
+        alias="MONGO_MAX_IDLE_TIME_MS",
+        description="Đóng kết nối rảnh quá thời gian này (ms).",
+    )
+    mongo_wait_queue_timeout_ms: int = Field(
+        default=5_000,
+        alias="MONGO_WAIT_QUEUE_TIMEOUT_MS",
+        description="Thời gian chờ tối đa khi pool đã dùng hết kết nối (ms).",
+    )
 
     # ====== Directory Configuration ======
     frontend_dir: Path = Field(
@@ -53,6 +69,126 @@ class Settings(BaseSettings):
     pinecone_persona_index: Optional[str] = Field(default=None, alias="PINECONE_PERSONA_INDEX")
     pinecone_policy_index: Optional[str] = Field(default=None, alias="PINECONE_POLICY_INDEX")
 
+    # ====== Semantic Memory Backend ======
+    semantic_backend: str = Field(
+        default="pinecone",
+        alias="SEMANTIC_BACKEND",
+        description="Backend semantic memory: 'pinecone' hoặc 'local' (NumPy trong tiến trình).",
+    )
+    local_vector_dir: Path = Field(
+        default_factory=lambda: Path(__file__).resolve().parents[2] / "semantic_memory",
+        alias="LOCAL_VECTOR_DIR",
+    )
+    local_vector_search: str = Field(
+        default="exact",
+        alias="LOCAL_VECTOR_SEARCH",
+        description="Chế độ top-k của backend local: 'exact' hoặc 'approx'.",
+    )
+
+    # ====== Embedding Cache ======
+    embedding_cache_enabled: bool = Field(default=True, alias="EMBEDDING_CACHE_ENABLED")
+    embedding_cache_path: Path = Field(
+        default_factory=lambda: Path(__file__).resolve().parents[2]
+        / "semantic_memory"
+        / "embedding_cache.sqlite3",
+        alias="EMBEDDING_CACHE_PATH",
+    )
+    embedding_cache_memory_size: int = Field(default=2_048, alias="EMBEDDING_CACHE_MEMORY_SIZE")
+
+    # ====== LogicMemory Registry ======
+    logic_memory_poll_seconds: float = Field(
+        default=5.0,
+        alias="LOGIC_MEMORY_POLL_SECONDS",
+        description="Chu kỳ kiểm tra phiên bản case khi không có change stream.",
+    )
+    logic_memory_watch: bool = Field(
+        default=True,
+        alias="LOGIC_MEMORY_WATCH",
+        description="Theo dõi collection case_versions bằng change stream (cần replica set/Atlas).",
+    )
+    logic_memory_cache_size: int = Field(default=128, alias="LOGIC_MEMORY_CACHE_SIZE")
+
+    # ====== Bulk Import ======
+    bulk_import_batch_size: int = Field(default=25, alias="BULK_IMPORT_BATCH_SIZE")
+    bulk_sync_workers: int = Field(
+        default=4,
+        alias="BULK_SYNC_WORKERS",
+        description="Số case được sync semantic memory song song trong nền.",
+    )
+
+    # ====== LLM Scheduler ======
+    llm_rpm_limit: int = Field(
+        default=500,
+        alias="LLM_RPM_LIMIT",
+        description="Số request LLM tối đa mỗi phút của cả tiến trình (theo quota OpenAI).",
+    )
+    llm_tpm_limit: int = Field(
+        default=200_000,
+        alias="LLM_TPM_LIMIT",
+        description="Số token LLM (prompt + completion) tối đa mỗi phút của cả tiến trình.",
+    )
+    llm_max_concurrency: int = Field(default=16, alias="LLM_MAX_CONCURRENCY")
+    llm_max_requeues: int = Field(
+        default=5,
+        alias="LLM_MAX_REQUEUES",
+        description="Số lần đưa lại request vào hàng đợi khi gặp 429/lỗi tạm thời trước khi báo lỗi.",
+    )
+    llm_completion_tokens_estimate: int = Field(
+        default=512,
+        alias="LLM_COMPLETION_TOKENS_ESTIMATE",
+        description="Số token completion giữ chỗ trước khi biết usage thực tế.",
+    )
+
+    # ====== LLM Response Cache ======
+    llm_cache_enabled: bool = Field(default=True, alias="LLM_CACHE_ENABLED")
+    llm_cache_backend: Literal["sqlite", "mongo", "memory"] = Field(
+        default="sqlite",
+        alias="LLM_CACHE_BACKEND",
+        description="Tầng lưu phản hồi sau LRU bộ nhớ: SQLite cục bộ, Mongo (dùng chung) hoặc không có.",
+    )
+    llm_cache_path: Path = Field(
+        default_factory=lambda: Path(__file__).resolve().parents[2]
+        / "semantic_memory"
+        / "llm_cache.sqlite3",
+        alias="LLM_CACHE_PATH",
+    )
+    llm_cache_collection: str = Field(default="llm_cache", alias="LLM_CACHE_COLLECTION")
+    llm_cache_memory_size: int = Field(default=1_024, alias="LLM_CACHE_MEMORY_SIZE")
+    llm_cache_ttl_seconds: float = Field(default=7 * 24 * 3600, alias="LLM_CACHE_TTL_SECONDS")
+    llm_cache_chains: str = Field(
+        default="scene,persona_digest,action",
+        alias="LLM_CACHE_CHAINS",
+        description="Các chain (phân tách bằng dấu phẩy) được phép dùng cache phản hồi LLM.",
+    )
+
+    @property
+    def llm_cache_chain_names(self) -> Tuple[str, ...]:
+        return tuple(name.strip() for name in self.llm_cache_chains.split(",") if name.strip())
+
+    # ====== Action Grading ======
+    action_prescore_enabled: bool = Field(
+        default=True,
+        alias="ACTION_PRESCORE_ENABLED",
+        description="Chấm sơ bộ tại chỗ các lượt chắc chắn không đạt (câu không phải hành động, hành động không liên quan) trước khi gửi cho LLM.",
+    )
+    action_small_model: Optional[str] = Field(
+        default=None,
+        alias="ACTION_SMALL_MODEL",
+        description="Model nhỏ chấm trước các lượt chưa rõ; chỉ lượt còn lưng chừng mới lên model chính.",
+    )
+    action_score_cache_enabled: bool = Field(
+        default=True,
+        alias="ACTION_SCORE_CACHE_ENABLED",
+        description="Dùng lại điểm từng tiêu chí giữa các học viên có hành động giống nhau.",
+    )
+    action_score_cache_size: int = Field(default=4_096, alias="ACTION_SCORE_CACHE_SIZE")
+    action_score_cache_ttl_seconds: float = Field(default=24 * 3600, alias="ACTION_SCORE_CACHE_TTL_SECONDS")
+    action_score_cache_similarity: float = Field(
+        default=0.95,
+        alias="ACTION_SCORE_CACHE_SIMILARITY",
+        description="Cosine tối thiểu để coi hai hành động là gần trùng (<=0 chỉ dùng khớp nguyên văn).",
+    )
+
     # ====== Pydantic Settings ======
     model_config = SettingsConfigDict(
         env_file=str(Path(__file__).resolve().parents[2] / ".env"),
@@ -1,12 +1,28 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
 
+from pymongo import DeleteMany, InsertOne, UpdateOne
 from pymongo.collection import Collection
 
 from casestudy.app.core.config import get_settings
 from casestudy.app.db.database import get_mongo_client
-from casestudy.app.models.case import CaseDocument
+from casestudy.app.models.case import CaseBundle, CaseDocument
+
+CASE_PARTS: Tuple[str, ...] = ("context", "personas", "skeleton")
+_PART_COLLECTIONS = {"context": "contexts", "personas": "personas", "skeleton": "skeletons"}
+
+# Các trường CaseDocument.from_dict cần, dùng cho màn hình danh sách.
+CASE_SUMMARY_PROJECTION: Dict[str, int] = {
+    "_id": 0,
+    "case_id": 1,
+    "topic": 1,
+    "initial_context.index_event.summary": 1,
+    "initial_context.index_event.who_first_on_scene": 1,
+    "initial_context.scene.location": 1,
+    "initial_context.scene.time": 1,
+}
 
 
 def _get_context_collection() -> Collection:
@@ -33,33 +49,133 @@ def _get_skeleton_collection() -> Collection:
     return client[settings.mongo_db].skeletons
 
 
+def _get_persona_digest_collection() -> Collection:
+    client = get_mongo_client()
+    if client is None:
+        raise RuntimeError("MongoDB client chưa sẵn sàng.")
+    settings = get_settings()
+    return client[settings.mongo_db].persona_digests
+
+
+def _get_case_version_collection() -> Collection:
+    client = get_mongo_client()
+    if client is None:
+        raise RuntimeError("MongoDB client chưa sẵn sàng.")
+    settings = get_settings()
+    return client[settings.mongo_db].case_versions
+
+
+def fetch_case_version(case_id: str) -> int:
+    """
+    Phiên bản nội dung hiện tại của case (0 nếu case chưa từng được ghi qua API).
+    """
+    document = _get_case_version_collection().find_one({"_id": case_id}, {"version": 1})
+    return int((document or {}).get("version", 0))
+
+
+def bump_case_versions(case_ids: Iterable[str]) -> None:
+    """
+    Tăng phiên bản của các case vừa ghi/xóa để cache LogicMemory của mọi tiến trình biết cần tải lại.
+    Document dùng `_id = case_id` để change stream của lệnh xóa vẫn biết case nào thay đổi.
+    """
+    now = datetime.now(timezone.utc)
+    operations = [
+        UpdateOne({"_id": case_id}, {"$inc": {"version": 1}, "$set": {"updated_at": now}}, upsert=True)
+        for case_id in dict.fromkeys(case_ids)
+    ]
+    if operations:
+        _get_case_version_collection().bulk_write(operations, ordered=False)
+
+
+def watch_case_versions():
+    """
+    Mở change stream trên `case_versions` (cần replica set, ví dụ Atlas).
+    """
+    return _get_case_version_collection().watch()
+
+
 def fetch_cases(limit: int) -> List[CaseDocument]:
     """
     Lấy danh sách case từ MongoDB, giới hạn theo tham số limit.
     """
     collection = _get_context_collection()
     cursor = (
-        collection.find({}, {"_id": 0})
+        collection.find({}, CASE_SUMMARY_PROJECTION)
         .sort("case_id", 1)
         .limit(limit)
     )
     return [CaseDocument.from_dict(doc) for doc in cursor]
 
 
+def fetch_case_bundle(
+    case_id: str,
+    *,
+    parts: Sequence[str] = CASE_PARTS,
+    projection: Optional[Mapping[str, Mapping[str, int]]] = None,
+) -> CaseBundle:
+    """
+    Đọc context/personas/skeleton của case trong một round-trip: aggregation trên
+    `contexts` rồi `$unionWith` sang personas và skeletons.
+
+    `parts` chọn phần cần lấy; `projection` (theo tên phần, ví dụ
+    `{"context": {"case_id": 1, "topic": 1}}`) giới hạn trường trả về.
+    """
+    unknown = set(parts) - set(CASE_PARTS)
+    if unknown:
+        raise ValueError(f"Phần dữ liệu case không hợp lệ: {sorted(unknown)}")
+    bundle = CaseBundle(case_id=case_id)
+    if not parts:
+        return bundle
+
+    projection = projection or {}
+    stages = [
+        (part, _bundle_part_pipeline(case_id, part, projection.get(part)))
+        for part in CASE_PARTS
+        if part in parts
+    ]
+    first_part, pipeline = stages[0]
+    for part, part_pipeline in stages[1:]:
+        pipeline.append(
+            {"$unionWith": {"coll": _PART_COLLECTIONS[part], "pipeline": part_pipeline}}
+        )
+
+    client = get_mongo_client()
+    if client is None:
+        raise RuntimeError("MongoDB client chưa sẵn sàng.")
+    collection = client[get_settings().mongo_db][_PART_COLLECTIONS[first_part]]
+
+    for document in collection.aggregate(pipeline):
+        part = document.pop("_part")
+        if part == "personas":
+            bundle.personas.append(document)
+        elif getattr(bundle, part) is None:
+            setattr(bundle, part, document)
+    return bundle
+
+
+def _bundle_part_pipeline(
+    case_id: str,
+    part: str,
+    projection: Optional[Mapping[str, int]],
+) -> List[Dict[str, Any]]:
+    pipeline: List[Dict[str, Any]] = [
+        {"$match": {"case_id": case_id}},
+        {"$project": {**(projection or {}), "_id": 0}},
+        {"$addFields": {"_part": part}},
+    ]
+    if part != "personas":
+        # Giống find_one: mỗi case chỉ lấy một context/skeleton.
+        pipeline.insert(1, {"$limit": 1})
+    return pipeline
+
+
 def fetch_case_documents(
     case_id: str,
 ) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]], Optional[Dict[str, Any]]]:
     """
     Lấy toàn bộ document (context/personas/skeleton) theo case_id.
     """
-    context_col = _get_context_collection()
-    persona_col = _get_persona_collection()
-    skeleton_col = _get_skeleton_collection()
-
-    context = context_col.find_one({"case_id": case_id}, {"_id": 0})
-    personas = list(persona_col.find({"case_id": case_id}, {"_id": 0}))
-    skeleton = skeleton_col.find_one({"case_id": case_id}, {"_id": 0})
-    return context, personas, skeleton
+    return fetch_case_bundle(case_id).as_tuple()
 
 
 def upsert_case_documents(
@@ -87,10 +203,67 @@ def upsert_case_documents(
         inserted_personas = len(personas)
 
     skeleton_col.insert_one(skeleton)
+    bump_case_versions([case_id])
 
     return inserted_personas, 1
 
 
+def bulk_replace_case_documents(
+    cases: List[Tuple[str, Dict[str, Any], List[Dict[str, Any]], Dict[str, Any]]],
+) -> Dict[str, int]:
+    """
+    Ghi đè nhiều case cùng lúc: mỗi collection chỉ tốn một lệnh `bulk_write`
+    (xóa theo danh sách case_id rồi insert bản mới).
+    Trả về số document đã ghi theo từng collection.
+    """
+    if not cases:
+        return {"contexts": 0, "personas": 0, "skeletons": 0}
+
+    case_ids = [case_id for case_id, _, _, _ in cases]
+    delete_old = DeleteMany({"case_id": {"$in": case_ids}})
+
+    context_ops = [delete_old] + [InsertOne(context) for _, context, _, _ in cases]
+    persona_ops = [delete_old] + [
+        InsertOne(persona) for _, _, personas, _ in cases for persona in personas
+    ]
+    skeleton_ops = [delete_old] + [InsertOne(skeleton) for _, _, _, skeleton in cases]
+
+    _get_context_collection().bulk_write(context_ops, ordered=True)
+    _get_persona_collection().bulk_write(persona_ops, ordered=True)
+    _get_skeleton_collection().bulk_write(skeleton_ops, ordered=True)
+    # Digest cũ không còn khớp dữ liệu mới.
+    _get_persona_digest_collection().delete_many({"case_id": {"$in": case_ids}})
+    bump_case_versions(case_ids)
+
+    return {
+        "contexts": len(context_ops) - 1,
+        "personas": len(persona_ops) - 1,
+        "skeletons": len(skeleton_ops) - 1,
+    }
+
+
+def fetch_persona_digests(case_id: str) -> List[Dict[str, Any]]:
+    """
+    Lấy các persona digest đã tính sẵn của case.
+    """
+    collection = _get_persona_digest_collection()
+    return list(collection.find({"case_id": case_id}, {"_id": 0}))
+
+
+def upsert_persona_digests(case_id: str, digests: List[Dict[str, Any]]) -> int:
+    """
+    Ghi (hoặc cập nhật) digest theo cặp (case_id, persona_id), trả về số digest đã ghi.
+    """
+    collection = _get_persona_digest_collection()
+    for digest in digests:
+        collection.replace_one(
+            {"case_id": case_id, "persona_id": digest["persona_id"]},
+            {**digest, "case_id": case_id},
+            upsert=True,
+        )
+    return len(digests)
+
+
 def delete_case_documents(case_id: str) -> int:
     """
     Xóa toàn bộ dữ liệu liên quan đến case_id khỏi MongoDB.
@@ -104,4 +277,7 @@ def delete_case_documents(case_id: str) -> int:
     total += context_col.delete_many({"case_id": case_id}).deleted_count
     total += persona_col.delete_many({"case_id": case_id}).deleted_count
     total += skeleton_col.delete_many({"case_id": case_id}).deleted_count
+    # Digest là dữ liệu dẫn xuất nên không tính vào số document đã xóa.
+    _get_persona_digest_collection().delete_many({"case_id": case_id})
+    bump_case_versions([case_id])
     return total
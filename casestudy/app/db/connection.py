@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import certifi
+from pymongo import AsyncMongoClient, MongoClient
+from pymongo.monitoring import ConnectionPoolListener
+
+from casestudy.app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMetrics(ConnectionPoolListener):
+    """
+    Đếm sự kiện connection pool của một client: số kết nối mở/đóng, đang mượn,
+    lượt checkout (thành công/thất bại) và thời gian chờ checkout.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.pool_clears = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def connection_created(self, event) -> None:
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_closed(self, event) -> None:
+        with self._lock:
+            self.connections_closed += 1
+
+    def connection_checked_out(self, event) -> None:
+        wait_ms = (getattr(event, "duration", None) or 0.0) * 1000
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def connection_checked_in(self, event) -> None:
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def connection_check_out_failed(self, event) -> None:
+        with self._lock:
+            self.checkout_failures += 1
+
+    def pool_cleared(self, event) -> None:
+        with self._lock:
+            self.pool_clears += 1
+
+    # Các sự kiện còn lại không cần đếm.
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_check_out_started(self, event) -> None:
+        pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "open": self.connections_created - self.connections_closed,
+                "in_use": self.checked_out,
+                "created": self.connections_created,
+                "closed": self.connections_closed,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "pool_clears": self.pool_clears,
+                "avg_wait_ms": round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait_ms, 3),
+            }
+
+
+class MongoConnectionManager:
+    """
+    Quản lý MongoClient (sync + async) dùng chung cho toàn tiến trình, mỗi URI một client.
+
+    Client chỉ được tạo ở lần dùng đầu tiên (kết nối lười), dùng chung pool với kích thước
+    cấu hình qua `MONGO_MAX_POOL_SIZE`/`MONGO_MIN_POOL_SIZE`... nên các request không phải
+    bắt tay TLS và chọn server lại từ đầu.
+    """
+
+    def __init__(self) -> None:
+        self.settings = get_settings()
+        self._lock = threading.Lock()
+        self._clients: Dict[str, MongoClient] = {}
+        self._async_clients: Dict[str, AsyncMongoClient] = {}
+        self._metrics: Dict[str, PoolMetrics] = {}
+        self._verified: set[str] = set()
+
+    def client(self, uri: Optional[str] = None) -> MongoClient:
+        uri = uri or self.settings.mongo_uri
+        with self._lock:
+            client = self._clients.get(uri)
+            if client is None:
+                client = MongoClient(uri, **self._client_options(uri, "sync"))
+                self._clients[uri] = client
+            return client
+
+    def async_client(self, uri: Optional[str] = None) -> AsyncMongoClient:
+        uri = uri or self.settings.mongo_uri
+        with self._lock:
+            client = self._async_clients.get(uri)
+            if client is None:
+                client = AsyncMongoClient(uri, **self._client_options(uri, "async"))
+                self._async_clients[uri] = client
+            return client
+
+    def database(self, name: Optional[str] = None, *, uri: Optional[str] = None):
+        return self.client(uri)[name or self.settings.mongo_db]
+
+    def verified_client(self, uri: Optional[str] = None) -> MongoClient:
+        """
+        Như `client()` nhưng ping server ở lần dùng đầu tiên để lỗi cấu hình lộ ra sớm.
+        Ping lỗi sẽ ném lại exception của pymongo và lần gọi sau sẽ thử lại.
+        """
+        uri = uri or self.settings.mongo_uri
+        client = self.client(uri)
+        if uri not in self._verified:
+            client.admin.command("ping")
+            self._verified.add(uri)
+        return client
+
+    def health(self, uri: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Ping server và trả về độ trễ cùng số liệu pool của mọi client đang mở.
+        """
+        uri = uri or self.settings.mongo_uri
+        started = time.perf_counter()
+        try:
+            self.client(uri).admin.command("ping")
+        except Exception as exc:
+            status: Dict[str, Any] = {"ok": False, "error": str(exc)}
+        else:
+            status = {"ok": True}
+        status["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        status["pools"] = self.pool_stats()
+        return status
+
+    def pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            metrics = dict(self._metrics)
+        return {key: value.snapshot() for key, value in metrics.items()}
+
+    def close(self) -> None:
+        """
+        Đóng mọi client (sync + async) và xóa cache. Gọi từ code async thì dùng `aclose`;
+        nếu đang có event loop chạy, việc đóng client async được lên lịch trên loop đó.
+        """
+        clients, async_clients = self._detach()
+        for client in clients:
+            client.close()
+        if not async_clients:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(_close_async_clients(async_clients))
+        else:
+            loop.create_task(_close_async_clients(async_clients))
+
+    async def aclose(self) -> None:
+        clients, async_clients = self._detach()
+        for client in clients:
+            client.close()
+        await _close_async_clients(async_clients)
+
+    def _detach(self) -> Tuple[List[MongoClient], List[AsyncMongoClient]]:
+        with self._lock:
+            clients = list(self._clients.values())
+            async_clients = list(self._async_clients.values())
+            self._clients.clear()
+            self._async_clients.clear()
+            self._metrics.clear()
+            self._verified.clear()
+        return clients, async_clients
+
+    def _client_options(self, uri: str, kind: str) -> Dict[str, Any]:
+        metrics = PoolMetrics()
+        # Khóa metrics không chứa URI để tránh lộ thông tin đăng nhập.
+        self._metrics[f"{kind}:{len(self._metrics) + 1}"] = metrics
+        options: Dict[str, Any] = {
+            "serverSelectionTimeoutMS": self.settings.mongo_timeout_ms,
+            "maxPoolSize": self.settings.mongo_max_pool_size,
+            "minPoolSize": self.settings.mongo_min_pool_size,
+            "maxIdleTimeMS": self.settings.mongo_max_idle_time_ms,
+            "waitQueueTimeoutMS": self.settings.mongo_wait_queue_timeout_ms,
+            "event_listeners": [metrics],
+        }
+        # Atlas (mongodb+srv) luôn cần TLS; URI khác tự khai báo tls trong query string.
+        if uri.startswith("mongodb+srv://"):
+            options.update(tls=True, tlsCAFile=certifi.where())
+        return options
+
+
+async def _close_async_clients(clients: List[AsyncMongoClient]) -> None:
+    for client in clients:
+        try:
+            await client.close()
+        except Exception as exc:  # pragma: no cover - client gắn với event loop đã đóng
+            logger.warning("Không đóng được AsyncMongoClient: %s", exc)
+
+
+_manager: Optional[MongoConnectionManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_connection_manager() -> MongoConnectionManager:
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = MongoConnectionManager()
+    return _manager
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from functools import lru_cache
 
+from casestudy.app.services.bulk_import_service import BulkImportService
 from casestudy.app.services.case_service import CaseService
 from casestudy.app.services.case_draft_service import CaseDraftService
 
@@ -14,3 +15,8 @@ def get_case_service() -> CaseService:
 @lru_cache
 def get_case_draft_service() -> CaseDraftService:
     return CaseDraftService()
+
+
+@lru_cache
+def get_bulk_import_service() -> BulkImportService:
+    return BulkImportService(get_case_service())
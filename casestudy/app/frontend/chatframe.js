@@ -604,10 +604,14 @@ const updateSummaryPanels = (state) => {
       ? state.event_summary[remainingKey]
       : [];
 
+  // Tiêu chí được lưu dạng ID ("C1"...), mô tả nằm ở `<event>_criteria`.
+  const criteriaLabels =
+    (currentEvent && state?.event_summary?.[`${currentEvent}_criteria`]) || {};
+
   const pickDescription = (item) => {
     if (!item) return "";
     if (typeof item === "string") {
-      return item;
+      return criteriaLabels[item] || item;
     }
     if (typeof item === "object") {
       return (
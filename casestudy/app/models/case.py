@@ -1,7 +1,7 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
 
 
 @dataclass(frozen=True)
@@ -29,3 +29,22 @@ class CaseDocument:
             time=scene.get("time"),
             who_first_on_scene=index_event.get("who_first_on_scene"),
         )
+
+
+@dataclass
+class CaseBundle:
+    """Toàn bộ dữ liệu một case (context/personas/skeleton) đọc trong một lượt truy vấn."""
+
+    case_id: str
+    context: Optional[Dict[str, Any]] = None
+    personas: List[Dict[str, Any]] = field(default_factory=list)
+    skeleton: Optional[Dict[str, Any]] = None
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.context or self.personas or self.skeleton)
+
+    def as_tuple(
+        self,
+    ) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        return self.context, self.personas, self.skeleton
@@ -45,6 +45,37 @@ class CaseCreateResponse(BaseModel):
     local_path: Optional[str] = None
 
 
+class CaseBulkImportPayload(BaseModel):
+    """
+    Payload cho endpoint /cases/bulk: danh sách case cần nhập cùng lúc.
+    """
+
+    cases: List[Dict[str, Any]]
+    sync_vectors: bool = True
+
+
+class CaseBulkImportItem(BaseModel):
+    case_id: Optional[str] = None
+    source: Optional[str] = None
+    status: str
+    error: Optional[str] = None
+    personas_count: int = 0
+    validate_ms: float = 0.0
+    write_ms: float = 0.0
+    sync_status: Optional[str] = None
+    sync_ms: Optional[float] = None
+    sync_stats: Optional[Dict[str, int]] = None
+
+
+class CaseBulkImportResponse(BaseModel):
+    job_id: str
+    imported: int
+    failed: int
+    total_ms: float
+    sync_pending: int
+    items: List[CaseBulkImportItem]
+
+
 class CaseDraftRequest(BaseModel):
     """
     Payload gửi tới endpoint /cases/draft để sinh dữ liệu gợi ý.
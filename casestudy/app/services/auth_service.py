@@ -4,12 +4,11 @@ from datetime import datetime, timezone
 import hashlib
 from typing import Any, Dict, Optional
 
-import certifi
 from bson.objectid import ObjectId
-from pymongo import MongoClient
 from pymongo.collection import Collection
 
 from casestudy.app.core.config import get_settings
+from casestudy.app.db.connection import get_connection_manager
 from casestudy.app.schemas.auth import LoginRequest, RegisterRequest
 
 
@@ -21,19 +20,8 @@ class AuthService:
         self.collection, self.session_collection = self._create_collections()
 
     def _create_collections(self) -> tuple[Collection, Collection]:
-        tls_kwargs: Dict[str, Any] = {}
-        try:
-            if "mongodb+srv://" in self.settings.mongo_uri:
-                tls_kwargs = {"tls": True, "tlsCAFile": certifi.where()}
-        except Exception:
-            tls_kwargs = {}
-
-        client = MongoClient(
-            self.settings.mongo_uri,
-            serverSelectionTimeoutMS=self.settings.mongo_timeout_ms,
-            **tls_kwargs,
-        )
-        db = client[self.settings.mongo_user_db]
+        # Client dùng chung nên tạo AuthService mỗi request không mở kết nối mới.
+        db = get_connection_manager().database(self.settings.mongo_user_db)
         return db["member"], db["SessionOwner"]
 
     @staticmethod
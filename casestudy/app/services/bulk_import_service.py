@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from casestudy.app.core.config import get_settings
+from casestudy.app.crud.case_crud import bulk_replace_case_documents
+from casestudy.app.schemas.case import (
+    CaseBulkImportItem,
+    CaseBulkImportResponse,
+    CaseCreatePayload,
+)
+from casestudy.app.services.case_service import CaseService
+
+logger = logging.getLogger(__name__)
+
+PreparedCase = Tuple[str, Dict[str, Any], List[Dict[str, Any]], Dict[str, Any]]
+
+
+@dataclass
+class BulkImportItem:
+    source: Optional[str]
+    case_id: Optional[str] = None
+    status: str = "pending"
+    error: Optional[str] = None
+    personas_count: int = 0
+    validate_ms: float = 0.0
+    # Thời gian ghi của cả batch chia đều cho từng case trong batch.
+    write_ms: float = 0.0
+    sync_status: Optional[str] = None
+    sync_ms: Optional[float] = None
+    sync_stats: Optional[Dict[str, int]] = None
+
+    def to_schema(self) -> CaseBulkImportItem:
+        return CaseBulkImportItem(
+            case_id=self.case_id,
+            source=self.source,
+            status=self.status,
+            error=self.error,
+            personas_count=self.personas_count,
+            validate_ms=round(self.validate_ms, 2),
+            write_ms=round(self.write_ms, 2),
+            sync_status=self.sync_status,
+            sync_ms=round(self.sync_ms, 2) if self.sync_ms is not None else None,
+            sync_stats=self.sync_stats,
+        )
+
+
+@dataclass
+class BulkImportJob:
+    job_id: str
+    items: List[BulkImportItem] = field(default_factory=list)
+    total_ms: float = 0.0
+    _futures: List[Future] = field(default_factory=list, repr=False)
+
+    @property
+    def imported(self) -> int:
+        return sum(1 for item in self.items if item.status == "imported")
+
+    @property
+    def failed(self) -> int:
+        return sum(1 for item in self.items if item.status not in ("imported", "pending"))
+
+    @property
+    def sync_pending(self) -> int:
+        return sum(1 for item in self.items if item.sync_status in ("queued", "running"))
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Chờ các lượt sync nền hoàn tất; trả False nếu hết thời gian chờ."""
+        _, not_done = wait(self._futures, timeout=timeout)
+        return not not_done
+
+    def to_response(self) -> CaseBulkImportResponse:
+        return CaseBulkImportResponse(
+            job_id=self.job_id,
+            imported=self.imported,
+            failed=self.failed,
+            total_ms=round(self.total_ms, 2),
+            sync_pending=self.sync_pending,
+            items=[item.to_schema() for item in self.items],
+        )
+
+
+@dataclass
+class _CaseSync:
+    """
+    Lượt sync nền của một case_id. Item đến khi lượt đang chờ được gộp vào lượt đó; item đến
+    khi đang chạy được giữ lại cho một lượt chạy tiếp theo (đọc dữ liệu Mongo mới nhất).
+    """
+
+    items: List[BulkImportItem] = field(default_factory=list)
+    future: Optional[Future] = None
+
+
+class BulkImportService:
+    """
+    Nhập nhiều case một lượt: kiểm tra từng case, ghi MongoDB theo batch bằng `bulk_write`
+    qua client dùng chung, rồi sync semantic memory trong nền với số worker giới hạn.
+    """
+
+    def __init__(
+        self,
+        case_service: Optional[CaseService] = None,
+        *,
+        sync_workers: Optional[int] = None,
+        max_jobs: int = 100,
+    ) -> None:
+        self.settings = get_settings()
+        self.case_service = case_service or CaseService()
+        self._sync_executor = ThreadPoolExecutor(
+            max_workers=max(1, sync_workers or self.settings.bulk_sync_workers),
+            thread_name_prefix="bulk-sync",
+        )
+        self._jobs: "OrderedDict[str, BulkImportJob]" = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._max_jobs = max_jobs
+        self._case_syncs: Dict[str, _CaseSync] = {}
+        self._sync_lock = threading.Lock()
+
+    def import_cases(
+        self,
+        sources: Iterable[Tuple[Optional[str], Any]],
+        *,
+        batch_size: Optional[int] = None,
+        sync_vectors: bool = True,
+    ) -> BulkImportJob:
+        """
+        `sources` là iterable các cặp (nhãn nguồn, dữ liệu case) — dữ liệu có thể là dict
+        theo schema CaseCreatePayload hoặc một Exception khi nguồn không đọc được.
+        Nguồn được đọc tuần tự nên có thể stream từ thư mục hoặc JSONL rất lớn.
+        """
+        started = time.perf_counter()
+        job = BulkImportJob(job_id=uuid.uuid4().hex)
+        self._register(job)
+        batch_size = max(1, batch_size or self.settings.bulk_import_batch_size)
+
+        batch: List[Tuple[BulkImportItem, PreparedCase]] = []
+        batch_ids: set[str] = set()
+        for source, raw in sources:
+            item = BulkImportItem(source=source)
+            job.items.append(item)
+            prepared = self._validate(item, raw)
+            if prepared is None:
+                continue
+            # Cùng case_id xuất hiện lại thì ghi batch hiện tại trước để giữ đúng thứ tự.
+            if prepared[0] in batch_ids or len(batch) >= batch_size:
+                self._write_batch(job, batch, sync_vectors)
+                batch, batch_ids = [], set()
+            batch.append((item, prepared))
+            batch_ids.add(prepared[0])
+        self._write_batch(job, batch, sync_vectors)
+
+        job.total_ms = (time.perf_counter() - started) * 1000
+        logger.info(
+            "Bulk import %s: %d case thành công, %d lỗi trong %.0f ms (%d case đang sync).",
+            job.job_id,
+            job.imported,
+            job.failed,
+            job.total_ms,
+            job.sync_pending,
+        )
+        return job
+
+    def get_job(self, job_id: str) -> Optional[BulkImportJob]:
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def _register(self, job: BulkImportJob) -> None:
+        with self._jobs_lock:
+            self._jobs[job.job_id] = job
+            while len(self._jobs) > self._max_jobs:
+                self._jobs.popitem(last=False)
+
+    def _validate(self, item: BulkImportItem, raw: Any) -> Optional[PreparedCase]:
+        started = time.perf_counter()
+        try:
+            if isinstance(raw, Exception):
+                raise ValueError(str(raw))
+            payload = raw if isinstance(raw, CaseCreatePayload) else CaseCreatePayload.model_validate(raw)
+            prepared = self.case_service.prepare_case(payload)
+            _check_case_structure(*prepared)
+        except (ValidationError, ValueError, TypeError) as exc:
+            item.status = "invalid"
+            item.error = str(exc)
+            prepared = None
+        else:
+            item.case_id = prepared[0]
+            item.personas_count = len(prepared[2])
+        item.validate_ms = (time.perf_counter() - started) * 1000
+        return prepared
+
+    def _write_batch(
+        self,
+        job: BulkImportJob,
+        batch: List[Tuple[BulkImportItem, PreparedCase]],
+        sync_vectors: bool,
+    ) -> None:
+        if not batch:
+            return
+        started = time.perf_counter()
+        try:
+            bulk_replace_case_documents([prepared for _, prepared in batch])
+        except Exception as exc:  # pragma: no cover - phụ thuộc MongoDB ngoài hệ thống
+            logger.warning("Không ghi được batch %d case lên MongoDB: %s", len(batch), exc)
+            for item, _ in batch:
+                item.status = "failed"
+                item.error = f"MongoDB: {exc}"
+            return
+        per_case_ms = (time.perf_counter() - started) * 1000 / len(batch)
+
+        for item, prepared in batch:
+            item.status = "imported"
+            item.write_ms = per_case_ms
+            if sync_vectors:
+                self._schedule_sync(job, item)
+            else:
+                item.sync_status = "skipped"
+
+    def _schedule_sync(self, job: BulkImportJob, item: BulkImportItem) -> None:
+        """
+        Mỗi case_id chỉ có một lượt sync nền tại một thời điểm (kể cả giữa các job import):
+        case trùng được gộp vào lượt đang chờ/đang chạy thay vì sync song song hai lần.
+        """
+        with self._sync_lock:
+            item.sync_status = "queued"
+            case_sync = self._case_syncs.get(item.case_id)
+            if case_sync is None:
+                case_sync = self._case_syncs[item.case_id] = _CaseSync(items=[item])
+                case_sync.future = self._sync_executor.submit(self._sync_case, item.case_id, case_sync)
+            else:
+                case_sync.items.append(item)
+            future = case_sync.future
+        if future not in job._futures:
+            job._futures.append(future)
+
+    def _sync_case(self, case_id: str, case_sync: _CaseSync) -> None:
+        while True:
+            with self._sync_lock:
+                items, case_sync.items = case_sync.items, []
+                if not items:
+                    del self._case_syncs[case_id]
+                    return
+                for item in items:
+                    item.sync_status = "running"
+            started = time.perf_counter()
+            try:
+                stats, error = self.case_service.sync_semantic_memory(case_id)
+            except Exception as exc:  # pragma: no cover - phụ thuộc dịch vụ ngoài
+                stats, error = None, str(exc)
+            sync_ms = (time.perf_counter() - started) * 1000
+            for item in items:
+                item.sync_ms = sync_ms
+                item.sync_stats = stats
+                if stats is not None:
+                    item.sync_status = "done"
+                else:
+                    item.sync_status = "failed"
+                    item.error = error
+
+
+def _check_case_structure(
+    case_id: str,
+    context: Dict[str, Any],
+    personas: List[Dict[str, Any]],
+    skeleton: Dict[str, Any],
+) -> None:
+    """
+    Kiểm tra tối thiểu để agent chạy được case: có canon event (kèm id) và persona có id.
+    """
+    events = skeleton.get("canon_events")
+    if not isinstance(events, list) or not events:
+        raise ValueError(f"Case '{case_id}': skeleton thiếu danh sách canon_events.")
+    missing_event_ids = [idx for idx, event in enumerate(events, start=1) if not (event or {}).get("id")]
+    if missing_event_ids:
+        raise ValueError(f"Case '{case_id}': canon event thứ {missing_event_ids} thiếu id.")
+    missing_persona_ids = [idx for idx, persona in enumerate(personas, start=1) if not persona.get("id")]
+    if missing_persona_ids:
+        raise ValueError(f"Case '{case_id}': persona thứ {missing_persona_ids} thiếu id.")
@@ -13,6 +13,7 @@ import httpx
 
 from casestudy.app.core.config import get_settings
 from casestudy.app.schemas.case import CaseDraftRequest, CaseDraftResponse
+from casestudy.utils.llm_scheduler import PRIORITY_DRAFT, estimate_tokens, get_llm_scheduler
 
 logger = logging.getLogger(__name__)
 
@@ -212,9 +213,18 @@ class CaseDraftService:
             "max_tokens": max_tokens,
         }
 
-        try:
+        def _post() -> httpx.Response:
             response = httpx.post(self.openai_endpoint, headers=headers, json=body, timeout=40)
             response.raise_for_status()
+            return response
+
+        try:
+            response = get_llm_scheduler().run(
+                _post,
+                tokens=estimate_tokens(SYSTEM_PROMPT + prompt_text) + max_tokens,
+                priority=PRIORITY_DRAFT,
+                used_tokens=_response_total_tokens,
+            )
         except httpx.HTTPStatusError as exc:
             detail = (exc.response.text or "").strip()
             logger.error("OpenAI request failed (%s): %s", exc.response.status_code, detail, exc_info=True)
@@ -795,3 +805,10 @@ def normalize_slug_base(value: str) -> str:
     base = slugify(value, fallback="case")
     base = re.sub(r"[-_]\d+$", "", base)
     return base or "case"
+
+
+def _response_total_tokens(response: httpx.Response) -> Optional[int]:
+    try:
+        return (response.json().get("usage") or {}).get("total_tokens")
+    except (ValueError, AttributeError):
+        return None
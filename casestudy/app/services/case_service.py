@@ -26,10 +26,7 @@ from casestudy.app.schemas.case import (
 from casestudy.utils.load import load_case_from_local
 from casestudy.utils.save import save_case
 if TYPE_CHECKING:
-    from casestudy.utils.semantic_extract import (
-        configure_paths as configure_semantic_paths,
-        sync_case_to_pinecone,
-    )
+    from casestudy.utils.semantic_extract import sync_semantic_memory
 
 
 logger = logging.getLogger(__name__)
@@ -134,11 +131,7 @@ class CaseService:
         *,
         persist_local: bool = True,
     ) -> CaseCreateResponse:
-        case_id = self._resolve_case_id(payload)
-        existed_in_mongo = self._case_exists_in_mongo(case_id)
-        context = self._prepare_context(case_id, payload.context)
-        personas = self._prepare_personas(case_id, payload.personas)
-        skeleton = self._prepare_skeleton(case_id, payload.skeleton)
+        case_id, context, personas, skeleton = self.prepare_case(payload)
 
         cleanup_dir = None
         local_path = None
@@ -177,9 +170,8 @@ class CaseService:
             shutil.rmtree(cleanup_dir, ignore_errors=True)
 
         if mongo_succeeded:
-            pinecone_stats, pinecone_error = self._sync_semantic_memory(
-                case_id, force_rebuild=existed_in_mongo
-            )
+            # Sync theo diff: chỉ document thay đổi được embed lại, không xóa trắng namespace.
+            pinecone_stats, pinecone_error = self.sync_semantic_memory(case_id)
             personas_count = len(saved_personas)
             message = f"Đã lưu case '{case_id}' lên MongoDB."
             if pinecone_stats:
@@ -226,21 +218,19 @@ class CaseService:
 
         return deleted_docs
 
-    def _case_exists_in_mongo(self, case_id: str) -> bool:
-        normalized_id = (case_id or "").strip()
-        if not normalized_id:
-            return False
-        try:
-            context, personas, skeleton = fetch_case_documents(normalized_id)
-        except Exception as exc:  # pragma: no cover - Mongo connection issues
-            logger.debug(
-                "Không kiểm tra được case '%s' trong MongoDB: %s",
-                normalized_id,
-                exc,
-                exc_info=True,
-            )
-            return False
-        return any([context, personas, skeleton])
+    def prepare_case(
+        self, payload: CaseCreatePayload
+    ) -> Tuple[str, Dict[str, Any], List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Chuẩn hóa payload thành bộ (case_id, context, personas, skeleton) sẵn sàng ghi MongoDB.
+        """
+        case_id = self._resolve_case_id(payload)
+        return (
+            case_id,
+            self._prepare_context(case_id, payload.context),
+            self._prepare_personas(case_id, payload.personas),
+            self._prepare_skeleton(case_id, payload.skeleton),
+        )
 
     @staticmethod
     def _resolve_case_id(payload: CaseCreatePayload) -> str:
@@ -327,21 +317,23 @@ class CaseService:
 
         return target_dir
 
-    def _sync_semantic_memory(
+    def sync_semantic_memory(
         self, case_id: str, *, force_rebuild: bool = False
     ) -> Tuple[Optional[Dict[str, int]], Optional[str]]:
         """
-        Sau khi lưu MongoDB thành công, đẩy nội dung case lên Pinecone để phục vụ tìm kiếm ngữ nghĩa.
+        Sau khi lưu MongoDB thành công, đẩy nội dung case lên semantic memory
+        (Pinecone hoặc backend local theo SEMANTIC_BACKEND) để phục vụ tìm kiếm ngữ nghĩa.
         """
         settings = get_settings()
         openai_key = settings.openai_api_key or os.getenv("OPENAI_API_KEY")
         pinecone_key = getattr(settings, "pinecone_api_key", None) or os.getenv("PINECONE_API_KEY")
+        uses_pinecone = (settings.semantic_backend or "pinecone").strip().lower() == "pinecone"
 
         if not openai_key:
             warning = "OPENAI_API_KEY chưa cấu hình, bỏ qua Pinecone sync."
             logger.info(warning)
             return None, warning
-        if not pinecone_key:
+        if uses_pinecone and not pinecone_key:
             warning = "PINECONE_API_KEY chưa cấu hình, bỏ qua Pinecone sync."
             logger.info(warning)
             return None, warning
@@ -350,13 +342,9 @@ class CaseService:
         self._ensure_env_var("PINECONE_API_KEY", pinecone_key)
         self._ensure_env_var("PINECONE_ENVIRONMENT", getattr(settings, "pinecone_environment", None))
         try:
-            from casestudy.utils.semantic_extract import (
-                configure_paths as configure_semantic_paths,
-                sync_case_to_pinecone,
-            )
+            from casestudy.utils.semantic_extract import sync_semantic_memory
 
-            configure_semantic_paths(case_id)
-            stats = sync_case_to_pinecone(case_id, force_rebuild=force_rebuild)
+            stats = sync_semantic_memory(case_id, force_rebuild=force_rebuild)
             return stats, None
         except Exception as exc:  # pragma: no cover - external dependency
             logger.warning("Không sync Pinecone cho case '%s': %s", case_id, exc, exc_info=True)
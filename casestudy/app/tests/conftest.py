@@ -0,0 +1,4 @@
+import os
+
+# Một số module tạo client OpenAI ngay khi import; test không gọi API thật.
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
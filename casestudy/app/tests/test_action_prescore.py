@@ -0,0 +1,66 @@
+import json
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+
+from casestudy.agent.chains import ActionPreScorer, create_action_evaluator_chain, grading_metrics
+from casestudy.agent.chains.action import normalize_success_criteria
+from casestudy.agent.chains.action_prescore import has_negation, normalize_text
+
+
+def _rubric(*criteria):
+    return normalize_success_criteria(list(criteria))
+
+
+class _TopicEmbeddings:
+    """Embedding giả: mỗi chiều ứng với một chủ đề, nhận theo từ khóa đã bỏ dấu."""
+
+    TOPICS = ("115", "nep", "aed", "ten")
+
+    def embed_documents(self, texts):
+        from casestudy.agent.chains.action_prescore import fold_vietnamese
+
+        return [
+            [1.0 if topic in fold_vietnamese(text) else 0.0 for topic in self.TOPICS] + [0.01]
+            for text in texts
+        ]
+
+
+SPLINT = _rubric({"description": "Cố định chân gãy", "levels": [{"score": 5, "descriptor": "Bó nẹp cố định chân gãy"}]})
+
+
+def test_normalize_text_keeps_diacritics():
+    assert normalize_text("  Bó NẸP, cố định!! ") == "bó nẹp cố định"
+    assert normalize_text("Bó nẹp") != normalize_text("Bỏ nẹp")
+    assert has_negation("Không gọi 115") and not has_negation("Cầm máu")
+
+
+def test_related_actions_are_never_passed_locally():
+    scorer = ActionPreScorer(_TopicEmbeddings())
+
+    assert scorer.score("Bó nẹp cố định chân gãy", SPLINT) is None
+    assert scorer.score("Bỏ nẹp cố định chân gãy", SPLINT) is None
+    assert scorer.score("Bó nẹp cố định chân gãy sai cách", SPLINT) is None
+
+
+def test_unrelated_action_is_scored_one_locally():
+    result = ActionPreScorer(_TopicEmbeddings()).score("hỏi tên nạn nhân", _rubric("Gọi 115", "Mang AED"))
+    assert [item["score"] for item in result.values()] == [1, 1]
+
+
+def test_without_embeddings_only_non_attempts_are_local():
+    scorer = ActionPreScorer()
+
+    assert scorer.score("hỏi tên nạn nhân", _rubric("Gọi 115")) is None
+    assert [item["score"] for item in scorer.score("Tiếp tục!", _rubric("Gọi 115", "Mang AED")).values()] == [1, 1]
+    assert scorer.score("đá", _rubric("Gọi 115")) is None
+
+
+def test_early_results_are_counted_as_local():
+    llm = GenericFakeChatModel(messages=iter([json.dumps({"evaluations": []})]))
+    chain = create_action_evaluator_chain(llm)
+    grading_metrics.reset()
+
+    assert chain({"user_action": "gọi 115", "success_criteria": []})["status"] == "pass"
+    assert chain({"user_action": "", "success_criteria": ["Gọi 115"]})["status"] == "pending"
+
+    assert grading_metrics.snapshot()["by_grader"]["local"] == 2
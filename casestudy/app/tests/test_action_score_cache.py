@@ -0,0 +1,95 @@
+import json
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+
+from casestudy.agent.chains import CriterionScoreCache, create_action_evaluator_chain
+from casestudy.agent.chains.action import normalize_success_criteria
+
+SCOPE = ("case", "model", "CE1")
+
+
+def _criteria(*descriptions):
+    rubric = normalize_success_criteria(list(descriptions))
+    return [(f"c{idx}", criterion) for idx, criterion in enumerate(rubric, start=1)]
+
+
+def test_exact_hit_ignores_case_punctuation_and_spacing():
+    cache = CriterionScoreCache()
+    criteria = _criteria("Gọi 115", "Mang AED")
+    cache.store(SCOPE, criteria, "Gọi 115 ngay", {1: {"score": 5, "analysis": "a"}, 2: {"score": 1}})
+
+    hits, _ = cache.lookup(SCOPE, criteria, "  GỌI 115   ngay! ")
+
+    assert hits == {1: {"score": 5, "analysis": "a"}, 2: {"score": 1, "analysis": ""}}
+
+
+def test_diacritics_distinguish_actions():
+    cache = CriterionScoreCache()
+    criteria = _criteria("Bó nẹp cố định chân")
+    cache.store(SCOPE, criteria, "Bó nẹp cố định chân", {1: {"score": 5}})
+
+    assert cache.lookup(SCOPE, criteria, "Bỏ nẹp cố định chân")[0] == {}
+    assert cache.lookup(SCOPE, criteria, "bo nep co dinh chan")[0] == {}
+
+
+def test_editing_a_criterion_invalidates_only_that_criterion():
+    cache = CriterionScoreCache()
+    criteria = _criteria("Gọi 115", "Mang AED")
+    cache.store(SCOPE, criteria, "gọi 115", {1: {"score": 5}, 2: {"score": 1}})
+
+    edited = _criteria("Gọi 115", "Mang AED và túi sơ cứu")
+    hits, _ = cache.lookup(SCOPE, edited, "gọi 115")
+
+    assert list(hits) == [1]
+
+
+def test_scope_separates_events():
+    cache = CriterionScoreCache()
+    criteria = _criteria("Gọi 115")
+    cache.store(SCOPE, criteria, "gọi 115", {1: {"score": 5}})
+
+    assert cache.lookup(("case", "model", "CE2"), criteria, "gọi 115")[0] == {}
+
+
+class _KeywordEmbeddings:
+    def embed_query(self, text):
+        folded = text.lower()
+        return [1.0 if "115" in folded else 0.0, 1.0 if "aed" in folded else 0.0, 0.05]
+
+
+def test_near_duplicate_action_reuses_score():
+    cache = CriterionScoreCache(embeddings=_KeywordEmbeddings(), similarity=0.95)
+    criteria = _criteria("Gọi 115")
+    _, vector = cache.lookup(SCOPE, criteria, "gọi 115")
+    cache.store(SCOPE, criteria, "gọi 115", {1: {"score": 5}}, vector)
+
+    assert cache.lookup(SCOPE, criteria, "tôi gọi 115 cấp cứu")[0] == {1: {"score": 5, "analysis": ""}}
+    assert cache.lookup(SCOPE, criteria, "mang AED")[0] == {}
+
+
+def test_negated_action_does_not_reuse_near_duplicate_score():
+    cache = CriterionScoreCache(embeddings=_KeywordEmbeddings(), similarity=0.95)
+    criteria = _criteria("Gọi 115")
+    _, vector = cache.lookup(SCOPE, criteria, "gọi 115")
+    cache.store(SCOPE, criteria, "gọi 115", {1: {"score": 5}}, vector)
+
+    assert cache.lookup(SCOPE, criteria, "không gọi 115")[0] == {}
+
+
+def test_chain_grades_only_uncached_criteria():
+    responses = [
+        {"evaluations": [{"id": 1, "score": 5, "analysis": "a"}, {"id": 2, "score": 2, "analysis": "b"}]},
+        {"evaluations": [{"id": 1, "score": 4, "analysis": "c"}]},
+    ]
+    llm = GenericFakeChatModel(messages=iter(json.dumps(item) for item in responses))
+    chain = create_action_evaluator_chain(llm, score_cache=CriterionScoreCache(), case_id="case")
+    payload = {"user_action": "Gọi 115", "event_id": "CE1", "success_criteria": ["Gọi 115", "Mang AED"]}
+
+    first = chain(payload)
+    second = chain({**payload, "user_action": "gọi 115!"})
+    edited = chain({**payload, "success_criteria": ["Gọi 115", "Mang AED và túi sơ cứu"]})
+
+    assert first["grader"] == "llm"
+    assert second["grader"] == "cache"
+    assert [item["score"] for item in second["scores"]] == [5, 2]
+    assert [item["score"] for item in edited["scores"]] == [5, 4]
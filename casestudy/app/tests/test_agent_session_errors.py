@@ -0,0 +1,26 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from casestudy.agent.memory_registry import LogicMemoryRegistry
+from api_casestudy.routers import agent as agent_router
+from api_casestudy.services import agent_service
+
+
+def _missing_case(case_id):
+    raise ValueError(f"Không tìm thấy dữ liệu case_id '{case_id}' trong MongoDB, thử đọc từ local.")
+
+
+def test_unknown_case_returns_404(monkeypatch):
+    registry = LogicMemoryRegistry(loader=_missing_case, version_reader=lambda case_id: None)
+    monkeypatch.setattr(agent_service, "get_logic_memory_registry", lambda: registry)
+    service = agent_service.AgentService(state_repo=object(), async_state_repo=object())
+    app = FastAPI()
+    app.include_router(agent_router.router)
+    app.dependency_overrides[agent_router.get_agent_service] = lambda: service
+    client = TestClient(app)
+
+    single = client.post("/agent/sessions", json={"case_id": "missing"})
+    bulk = client.post("/agent/sessions/bulk", json={"case_id": "missing", "count": 2})
+
+    assert (single.status_code, bulk.status_code) == (404, 404)
+    assert "missing" in single.json()["detail"]
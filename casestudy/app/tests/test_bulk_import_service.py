@@ -0,0 +1,61 @@
+import threading
+import time
+
+from casestudy.app.services import bulk_import_service
+from casestudy.app.services.bulk_import_service import BulkImportService
+
+
+class _FakeCaseService:
+    def __init__(self):
+        self.syncs = []
+        self.active = {}
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def prepare_case(self, payload):
+        return (
+            payload.case_id,
+            payload.context,
+            payload.personas,
+            payload.skeleton,
+        )
+
+    def sync_semantic_memory(self, case_id):
+        with self._lock:
+            self.syncs.append(case_id)
+            self.active[case_id] = self.active.get(case_id, 0) + 1
+            self.max_active = max(self.max_active, self.active[case_id])
+        time.sleep(0.05)
+        with self._lock:
+            self.active[case_id] -= 1
+        return {"scene": 1}, None
+
+
+def _case(case_id):
+    return {
+        "case_id": case_id,
+        "context": {},
+        "personas": [{"id": "P1"}],
+        "skeleton": {"canon_events": [{"id": "CE1"}]},
+    }
+
+
+def test_duplicate_case_ids_share_one_background_sync(monkeypatch):
+    monkeypatch.setattr(bulk_import_service, "bulk_replace_case_documents", lambda cases: None)
+    case_service = _FakeCaseService()
+    service = BulkImportService(case_service, sync_workers=4)
+
+    sources = [
+        ("a1", _case("case_a")),
+        ("b", _case("case_b")),
+        ("a2", _case("case_a")),
+        ("a3", _case("case_a")),
+    ]
+    job = service.import_cases(sources, batch_size=10)
+    other = service.import_cases([("a4", _case("case_a"))])
+
+    assert job.wait(5) and other.wait(5)
+    assert case_service.max_active == 1
+    assert case_service.syncs.count("case_a") <= 2
+    assert [item.sync_status for item in job.items + other.items] == ["done"] * 5
+    assert service._case_syncs == {}
@@ -0,0 +1,63 @@
+from casestudy.agent.event_graph import EventGraph
+
+
+def _node(success_criteria):
+    graph = EventGraph.compile(
+        {"CE1": {"title": "Sự kiện", "success_criteria": success_criteria}},
+        ["CE1"],
+        {},
+    )
+    return graph.get("CE1")
+
+
+def _summary(node, completed):
+    return {
+        "CE1_criteria": dict(node.criteria_labels),
+        "CE1_remaining_success_criteria": [cid for cid in node.criterion_ids if cid not in completed],
+        "CE1_completed_success_criteria": list(completed),
+        "CE1_partial": [],
+        "CE1_rubric_version": node.rubric_version,
+    }
+
+
+def test_criterion_ids_survive_reorder_and_prefer_explicit_ids():
+    first = _node(["Hỏi tên bệnh nhân", "Đo huyết áp"])
+    reordered = _node(["Đo huyết áp", "Hỏi tên bệnh nhân"])
+    assert set(first.criterion_ids) == set(reordered.criterion_ids)
+    assert first.rubric_version != reordered.rubric_version
+
+    explicit = _node([{"id": "ask_name", "description": "Hỏi tên bệnh nhân"}, "Hỏi tên bệnh nhân"])
+    assert explicit.criterion_ids[0] == "ask_name"
+    assert len(set(explicit.criterion_ids)) == 2
+
+
+def test_reconcile_remaps_progress_after_rubric_edit():
+    old = _node(["Hỏi tên bệnh nhân", "Đo huyết áp", "Ghi hồ sơ"])
+    summary = _summary(old, [old.criterion_ids[1]])
+
+    new = _node(["Giải thích thủ thuật", "Ghi hồ sơ đầy đủ", "Đo huyết áp", "Hỏi tên bệnh nhân"])
+    assert new.reconcile(summary) is True
+
+    by_label = {label: cid for cid, label in new.criteria_labels.items()}
+    assert summary["CE1_completed_success_criteria"] == [by_label["Đo huyết áp"]]
+    assert set(summary["CE1_remaining_success_criteria"]) == set(new.criterion_ids) - {
+        by_label["Đo huyết áp"]
+    }
+    assert summary["CE1_criteria"] == dict(new.criteria_labels)
+    assert new.reconcile(summary) is False
+
+
+def test_reconcile_translates_legacy_positional_ids():
+    node = _node(["Hỏi tên bệnh nhân", "Đo huyết áp"])
+    summary = {
+        "CE1_criteria": {"C1": "Hỏi tên bệnh nhân", "C2": "Đo huyết áp"},
+        "CE1_remaining_success_criteria": ["C2"],
+        "CE1_completed_success_criteria": ["C1"],
+        "CE1_partial": ["C2"],
+    }
+
+    node.reconcile(summary)
+
+    assert summary["CE1_completed_success_criteria"] == [node.criterion_ids[0]]
+    assert summary["CE1_remaining_success_criteria"] == [node.criterion_ids[1]]
+    assert summary["CE1_partial"] == [node.criterion_ids[1]]
@@ -0,0 +1,56 @@
+import asyncio
+import threading
+import time
+
+from api_casestudy.services.bootstrap_cache import BootstrapSnapshot, BootstrapSnapshotCache
+from api_casestudy.services.graph_cache import CompiledGraphCache
+
+
+def test_concurrent_gets_build_once_and_release_build_locks():
+    calls = []
+
+    def builder(case_id, model_name):
+        calls.append(case_id)
+        time.sleep(0.05)
+        return (case_id, model_name)
+
+    cache = CompiledGraphCache(builder, max_size=2)
+    threads = [threading.Thread(target=cache.get, args=("case_a", "m")) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for idx in range(5):
+        cache.get(f"case_{idx}", "m")
+
+    assert calls.count("case_a") == 1
+    assert len(cache._build_locks) == 0
+    assert cache.stats()["size"] == 2
+    assert cache.invalidate("case_4") == 1
+
+
+def test_bootstrap_snapshot_is_tied_to_its_logic_memory():
+    cache = BootstrapSnapshotCache(max_size=4)
+    key = ("case_a", "CE1", "m")
+    first_memory, second_memory = object(), object()
+
+    def build(memory):
+        async def _build():
+            await asyncio.sleep(0.01)
+            return BootstrapSnapshot(key=key, state={}, logic_memory=memory)
+
+        return _build
+
+    async def scenario():
+        return await asyncio.gather(
+            *(cache.aget_or_create(key, first_memory, build(first_memory)) for _ in range(4))
+        )
+
+    results = asyncio.run(scenario())
+    assert [built for _, built in results].count(True) == 1
+    assert len(cache._abuild_locks) == 0
+
+    assert cache.get(key, first_memory) is results[0][0]
+    assert cache.get(key, second_memory) is None
+    assert cache.invalidate("case_a") == 1
@@ -0,0 +1,110 @@
+import threading
+import time
+
+import httpx
+import openai
+import pytest
+
+from casestudy.utils.llm_scheduler import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    LLMScheduler,
+    TokenBucket,
+)
+
+
+def _rate_limit_error(retry_after="0.05"):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, request=request, headers={"retry-after": retry_after})
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(per_minute=60)
+    now = time.monotonic()
+    bucket.take(60, now)
+
+    assert bucket.wait_time(1, now) == pytest.approx(1.0, rel=0.05)
+
+
+def test_interactive_is_served_before_background():
+    scheduler = LLMScheduler(rpm=1000, tpm=1_000_000, max_concurrency=1)
+    holder = scheduler.acquire(1)
+    order = []
+
+    def call(name, priority):
+        scheduler.run(lambda: order.append(name), tokens=1, priority=priority)
+
+    background = threading.Thread(target=call, args=("background", PRIORITY_BACKGROUND))
+    background.start()
+    time.sleep(0.05)
+    interactive = threading.Thread(target=call, args=("interactive", PRIORITY_INTERACTIVE))
+    interactive.start()
+    time.sleep(0.05)
+    scheduler.release(holder)
+    background.join(1)
+    interactive.join(1)
+
+    assert order == ["interactive", "background"]
+
+
+def test_rate_limit_pauses_queue_and_requeues():
+    scheduler = LLMScheduler(rpm=1000, tpm=1_000_000)
+    attempts = []
+
+    def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise _rate_limit_error()
+        return "ok"
+
+    assert scheduler.run(flaky, tokens=10) == "ok"
+    assert attempts[1] - attempts[0] >= 0.04
+    stats = scheduler.stats()
+    assert (stats["rate_limited"], stats["requeues"], stats["in_flight"]) == (1, 1, 0)
+
+
+def test_non_transient_error_releases_slot():
+    scheduler = LLMScheduler(rpm=1000, tpm=1_000_000, max_concurrency=1)
+
+    with pytest.raises(ValueError):
+        scheduler.run(lambda: (_ for _ in ()).throw(ValueError("bad")), tokens=1)
+
+    assert scheduler.stats()["in_flight"] == 0
+    assert scheduler.run(lambda: "next", tokens=1) == "next"
+
+
+def test_requeues_are_bounded():
+    scheduler = LLMScheduler(rpm=1000, tpm=1_000_000, max_requeues=2)
+    calls = []
+
+    def always_limited():
+        calls.append(1)
+        raise _rate_limit_error("0.01")
+
+    with pytest.raises(openai.RateLimitError):
+        scheduler.run(always_limited, tokens=1)
+    assert len(calls) == 3
+
+
+def test_query_embeddings_are_requeued_by_the_scheduler(monkeypatch):
+    from langchain_openai import OpenAIEmbeddings
+
+    from casestudy.utils import semantic_extract
+
+    scheduler = LLMScheduler(rpm=1000, tpm=1_000_000)
+    monkeypatch.setattr(semantic_extract, "get_llm_scheduler", lambda: scheduler)
+    calls = []
+
+    def flaky(self, texts, chunk_size=None, **kwargs):
+        calls.append(list(texts))
+        if len(calls) == 1:
+            raise _rate_limit_error("0.01")
+        return [[1.0, 0.0] for _ in texts]
+
+    monkeypatch.setattr(OpenAIEmbeddings, "embed_documents", flaky)
+    embeddings = semantic_extract.ScheduledOpenAIEmbeddings(model="text-embedding-3-small", max_retries=0)
+
+    assert embeddings.embed_query("xin chào") == [1.0, 0.0]
+    assert len(calls) == 2
+    assert scheduler.stats()["requeues"] == 1
@@ -0,0 +1,33 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from casestudy.utils.local_vector_store import MANIFEST_FILENAME, LocalVectorStore
+
+
+def _replace(store, tag, size=4):
+    texts = [f"{tag}-{idx}" for idx in range(size)]
+    vectors = [[float(idx + 1), 1.0, 0.0] for idx in range(size)]
+    store.replace_vectors(texts, vectors, [{"tag": tag} for _ in texts], ids=texts)
+
+
+def test_reader_reloads_after_another_store_syncs(tmp_path):
+    reader = LocalVectorStore(None, directory=tmp_path)
+    assert reader.similarity_search_by_vector([1.0, 1.0, 0.0], k=2) == []
+
+    _replace(LocalVectorStore(None, directory=tmp_path), "v1")
+    assert [doc.metadata["tag"] for doc in reader.similarity_search_by_vector([1.0, 1.0, 0.0])] == ["v1"] * 4
+
+    _replace(LocalVectorStore(None, directory=tmp_path), "v2", size=2)
+    assert reader.ids() == ["v2-0", "v2-1"]
+
+
+def test_concurrent_syncs_leave_one_consistent_snapshot(tmp_path):
+    stores = [LocalVectorStore(None, directory=tmp_path) for _ in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda pair: _replace(pair[1], f"s{pair[0]}", size=pair[0] + 1), enumerate(stores)))
+
+    fresh = LocalVectorStore(None, directory=tmp_path)
+    tags = {doc.metadata["tag"] for doc in fresh.get_by_ids(fresh.ids())}
+    assert len(tags) == 1
+    assert len(fresh.ids()) == int(tags.pop()[1:]) + 1
+    assert not list(tmp_path.glob("*.tmp"))
+    assert (tmp_path / MANIFEST_FILENAME).exists()
@@ -0,0 +1,40 @@
+import asyncio
+
+from casestudy.app.db.connection import MongoConnectionManager
+
+URI = "mongodb://127.0.0.1:1/"
+
+
+def test_close_releases_sync_and_async_clients(monkeypatch):
+    manager = MongoConnectionManager()
+    sync_client = manager.client(URI)
+    async_client = manager.async_client(URI)
+    closed = []
+    monkeypatch.setattr(sync_client, "close", lambda: closed.append("sync"))
+
+    async def close_async():
+        closed.append("async")
+
+    monkeypatch.setattr(async_client, "close", close_async)
+
+    manager.close()
+
+    assert closed == ["sync", "async"]
+    assert manager.pool_stats() == {}
+    assert manager.client(URI) is not sync_client
+    assert manager.async_client(URI) is not async_client
+    manager.close()
+
+
+def test_aclose_inside_event_loop():
+    manager = MongoConnectionManager()
+
+    async def scenario():
+        first = manager.async_client(URI)
+        manager.client(URI)
+        await manager.aclose()
+        return first, manager.async_client(URI)
+
+    first, second = asyncio.run(scenario())
+    assert first is not second
+    manager.close()
@@ -0,0 +1,19 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from casestudy.utils import semantic_extract
+
+
+def test_load_indices_uses_the_case_argument(monkeypatch, tmp_path):
+    settings = semantic_extract.get_app_settings().model_copy(
+        update={"semantic_backend": "local", "local_vector_dir": tmp_path}
+    )
+    monkeypatch.setattr(semantic_extract, "get_app_settings", lambda: settings)
+    case_ids = [f"case_{idx:03d}" for idx in range(8)]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(semantic_extract.load_indices, case_ids))
+
+    for case_id, stores in zip(case_ids, results):
+        assert [store.directory for store in stores] == [
+            tmp_path / case_id / label for label in semantic_extract.SEMANTIC_LABELS
+        ]
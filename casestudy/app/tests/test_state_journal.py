@@ -0,0 +1,136 @@
+import itertools
+
+import pytest
+
+from casestudy.agent import RuntimeState
+from api_casestudy.core.config import get_settings
+from api_casestudy.services import state_repository
+from api_casestudy.services.state_journal import apply_state_delta, diff_states
+
+
+def _match(value, condition):
+    if isinstance(condition, dict):
+        for op, operand in condition.items():
+            if op == "$in" and value not in operand:
+                return False
+            if op == "$lte" and (value is None or value > operand):
+                return False
+            if op == "$gte" and (value is None or value < operand):
+                return False
+        return True
+    return value == condition
+
+
+def _sort_key(sort):
+    def key(document):
+        return tuple(
+            (document.get(field) is not None, document.get(field) or 0) for field, _ in sort
+        )
+
+    return key
+
+
+class _Cursor(list):
+    def sort(self, sort):
+        return _Cursor(sorted(self, key=_sort_key(sort)))
+
+
+class FakeCollection:
+    """Collection MongoDB tối giản trong bộ nhớ, đủ cho các truy vấn của repository."""
+
+    def __init__(self):
+        self.documents = []
+        self._ids = itertools.count(1)
+
+    def create_index(self, *args, **kwargs):
+        return None
+
+    def insert_one(self, document):
+        document = dict(document, _id=next(self._ids))
+        self.documents.append(document)
+
+    def find(self, query):
+        return _Cursor(
+            doc for doc in self.documents
+            if all(_match(doc.get(field), cond) for field, cond in query.items())
+        )
+
+    def find_one(self, query, sort=None):
+        matches = self.find(query)
+        if sort:
+            matches = sorted(matches, key=_sort_key(sort), reverse=sort[0][1] < 0)
+        return matches[0] if matches else None
+
+
+@pytest.fixture
+def repository(monkeypatch):
+    settings = get_settings().model_copy(
+        update={"state_persistence_mode": "delta", "state_checkpoint_interval": 3}
+    )
+    monkeypatch.setattr(state_repository, "get_settings", lambda: settings)
+    collections = {"runtime_states": FakeCollection(), "turn_logs": FakeCollection()}
+    monkeypatch.setattr(
+        state_repository, "get_mongo_client", lambda: {settings.state_db: collections}
+    )
+    return state_repository.ConversationStateRepository()
+
+
+def _run_turns(repository, event_turns):
+    """Ghi turn log như graph: turn_count về 0 ở mỗi event mới, hội thoại dài dần."""
+    state = RuntimeState(case_id="case", current_event=event_turns[0][0])
+    expected = []
+    for event_id, turns in event_turns:
+        state.current_event = event_id
+        state.turn_count = 0
+        for turn in range(1, turns + 1):
+            state.turn_count = turn
+            state.user_action = f"{event_id}-{turn}"
+            state.dialogue_history.append({"role": "user", "content": state.user_action})
+            state.event_summary[f"{event_id}_last"] = turn
+            repository.append_turn(
+                session_id="s1", case_id="case", user_action=state.user_action, state=state
+            )
+            expected.append(state.to_serializable())
+    return expected
+
+
+def test_diff_and_apply_roundtrip():
+    before = {"turn_count": 1, "dialogue_history": [{"c": "a"}], "event_summary": {"x": 1, "y": 2}}
+    after = {"turn_count": 0, "dialogue_history": [{"c": "a"}, {"c": "b"}], "event_summary": {"x": 3}}
+    assert apply_state_delta(before, diff_states(before, after)) == after
+
+
+def test_list_turns_replays_across_event_transition(repository):
+    expected = _run_turns(repository, [("CE1", 3), ("CE2", 3)])
+
+    turns = repository.list_turns("s1")
+
+    assert [turn["sequence"] for turn in turns] == [1, 2, 3, 4, 5, 6]
+    assert [turn["turn_index"] for turn in turns] == [1, 2, 3, 1, 2, 3]
+    assert [turn["state"] for turn in turns] == expected
+
+
+def test_reconstruct_state_uses_sequence_not_turn_index(repository):
+    expected = _run_turns(repository, [("CE1", 3), ("CE2", 2), ("CE3", 2)])
+
+    assert repository.reconstruct_state("s1") == expected[-1]
+    assert len(repository.reconstruct_state("s1")["dialogue_history"]) == 7
+    for sequence, state in enumerate(expected, start=1):
+        assert repository.reconstruct_state("s1", sequence) == state
+
+
+def test_sequence_continues_after_process_restart(repository, monkeypatch):
+    _run_turns(repository, [("CE1", 2)])
+    collections = {
+        "runtime_states": repository._state_collection,
+        "turn_logs": repository._turn_collection,
+    }
+    monkeypatch.setattr(
+        state_repository, "get_mongo_client", lambda: {get_settings().state_db: collections}
+    )
+    restarted = state_repository.ConversationStateRepository()
+    state = RuntimeState(case_id="case", current_event="CE2", turn_count=1, user_action="x")
+
+    restarted.append_turn(session_id="s1", case_id="case", user_action="x", state=state)
+
+    assert [turn["sequence"] for turn in restarted.list_turns("s1")] == [1, 2, 3]
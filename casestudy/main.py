@@ -68,9 +68,18 @@ def render_state(state: RuntimeState) -> None:
     partial_key = f"{state.current_event}_partial"
     scores_key = f"{state.current_event}_scores"
 
-    remaining = state.event_summary.get(remaining_key, [])
-    completed = state.event_summary.get(completed_key, [])
-    partial = state.event_summary.get(partial_key, [])
+    # Tiêu chí được lưu dạng ID ("C1"...), mô tả nằm ở `<event>_criteria`.
+    labels = state.event_summary.get(f"{state.current_event}_criteria") or {}
+
+    def describe(key: str) -> list:
+        return [
+            labels.get(item, item) if isinstance(item, str) else item
+            for item in state.event_summary.get(key, [])
+        ]
+
+    remaining = describe(remaining_key)
+    completed = describe(completed_key)
+    partial = describe(partial_key)
     scores = state.event_summary.get(scores_key, [])
 
     print("\n[Success Criteria Debug]")
@@ -0,0 +1,123 @@
+# =============================================
+# 📦 bulk_import.py — Nhập nhiều case vào MongoDB + semantic memory
+# =============================================
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from casestudy.app.services.bulk_import_service import BulkImportService
+
+CaseSource = Tuple[Optional[str], Any]
+
+CASE_FILES = ("context.json", "personas.json", "skeleton.json")
+
+
+def iter_case_sources(path: Path) -> Iterator[CaseSource]:
+    """
+    Đọc tuần tự từng case từ:
+    - file .jsonl: mỗi dòng một object {case_id?, context, personas, skeleton};
+    - một thư mục case (chứa context/personas/skeleton hoặc thư mục con logic_memory);
+    - thư mục chứa nhiều thư mục case như trên.
+    Nguồn lỗi được trả về dạng Exception để service ghi nhận mà không dừng cả lượt nhập.
+    """
+    path = Path(path)
+    if path.is_file():
+        yield from _iter_jsonl(path)
+        return
+    if not path.is_dir():
+        yield str(path), FileNotFoundError(f"Không tìm thấy '{path}'.")
+        return
+    if _data_dir(path) is not None:
+        yield _read_case_folder(path)
+        return
+    for child in sorted(path.iterdir()):
+        if child.is_dir():
+            yield _read_case_folder(child)
+        elif child.suffix == ".jsonl":
+            yield from _iter_jsonl(child)
+
+
+def _iter_jsonl(path: Path) -> Iterator[CaseSource]:
+    with path.open("r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            label = f"{path.name}:{line_no}"
+            try:
+                yield label, json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield label, ValueError(f"JSON không hợp lệ: {exc}")
+
+
+def _data_dir(folder: Path) -> Optional[Path]:
+    for candidate in (folder, folder / "logic_memory"):
+        if candidate.is_dir() and (candidate / "context.json").exists():
+            return candidate
+    return None
+
+
+def _read_case_folder(folder: Path) -> CaseSource:
+    data_dir = _data_dir(folder)
+    if data_dir is None:
+        return folder.name, FileNotFoundError("Thiếu context.json trong thư mục case.")
+    try:
+        payload: Dict[str, Any] = {}
+        for filename in CASE_FILES:
+            with (data_dir / filename).open("r", encoding="utf-8") as f:
+                payload[filename[: -len(".json")]] = json.load(f)
+    except (OSError, json.JSONDecodeError) as exc:
+        return folder.name, exc
+    payload["case_id"] = payload["context"].get("case_id") or folder.name
+    return folder.name, payload
+
+
+# -------------------------
+# 🚀 Chạy từ terminal
+# -------------------------
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Nhập nhiều case (thư mục case hoặc file JSONL) vào MongoDB và semantic memory."
+    )
+    parser.add_argument("path", type=Path, help="Thư mục chứa các case, một thư mục case hoặc file .jsonl.")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="Số case ghi MongoDB mỗi lần bulk_write (mặc định BULK_IMPORT_BATCH_SIZE).",
+    )
+    parser.add_argument(
+        "--no-sync",
+        action="store_true",
+        help="Chỉ ghi MongoDB, bỏ qua sync semantic memory.",
+    )
+    args = parser.parse_args()
+
+    service = BulkImportService()
+    job = service.import_cases(
+        iter_case_sources(args.path),
+        batch_size=args.batch_size,
+        sync_vectors=not args.no_sync,
+    )
+    job.wait()
+
+    for item in job.items:
+        icon = "✅" if item.status == "imported" and item.sync_status != "failed" else "❌"
+        sync_ms = f"{item.sync_ms:.0f}" if item.sync_ms is not None else "-"
+        print(
+            f"{icon} {item.case_id or item.source}: {item.status}"
+            f" | validate {item.validate_ms:.0f} ms | write {item.write_ms:.0f} ms"
+            f" | sync {item.sync_status or '-'} {sync_ms} ms"
+        )
+        if item.error:
+            print(f"   ↳ {item.error}")
+    print(
+        f"📊 {job.imported} case đã nhập, {job.failed} lỗi;"
+        f" ghi MongoDB trong {job.total_ms:.0f} ms."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional
+
+_MISSING = object()
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_cache_text(text: Optional[str]) -> str:
+    """
+    Chuẩn hóa văn bản làm khóa cache: bỏ khoảng trắng thừa, chữ thường, bỏ dấu câu cuối.
+    """
+    cleaned = _WHITESPACE_RE.sub(" ", (text or "").strip()).casefold()
+    return cleaned.rstrip(" .!?…")
+
+
+def hash_text(text: Optional[str]) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """
+    Cache LRU giới hạn kích thước, tùy chọn TTL, an toàn đa luồng và có bộ đếm hit/miss.
+    """
+
+    def __init__(self, max_size: int = 256, *, ttl_seconds: Optional[float] = None) -> None:
+        self.max_size = max(1, max_size)
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._entries.get(key, _MISSING)
+            if item is not _MISSING and self._is_expired(item[0]):
+                del self._entries[key]
+                self.evictions += 1
+                item = _MISSING
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Đọc mà không đổi thứ tự LRU và không tính hit/miss (dùng khi kiểm tra lại sau lock build).
+        """
+        with self._lock:
+            item = self._entries.get(key, _MISSING)
+            if item is not _MISSING and self._is_expired(item[0]):
+                del self._entries[key]
+                self.evictions += 1
+                item = _MISSING
+            return default if item is _MISSING else item[1]
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._entries.pop(key, _MISSING)
+            return default if item is _MISSING else item[1]
+
+    def pop_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Xóa mọi entry có khóa thỏa `predicate`, trả về số entry bị xóa.
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def values(self) -> List[Any]:
+        with self._lock:
+            return [value for stored_at, value in self._entries.values() if not self._is_expired(stored_at)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _is_expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds
+
+
+class KeyedLocks:
+    """
+    Một lock cho mỗi khóa đang được dùng; entry bị bỏ khi không còn ai giữ hoặc chờ lock,
+    nên số lock không tăng theo số khóa từng gặp. `factory` là `threading.Lock` hoặc `asyncio.Lock`.
+    """
+
+    def __init__(self, factory: Callable[[], Any] = threading.Lock) -> None:
+        self._factory = factory
+        self._locks: Dict[Hashable, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def hold(self, key: Hashable) -> Iterator[Any]:
+        """
+        Trả về lock của `key` (chưa acquire) trong khối `with`; người gọi tự `with`/`async with` nó.
+        """
+        with self._lock:
+            slot = self._locks.get(key)
+            if slot is None:
+                slot = self._locks[key] = [self._factory(), 0]
+            slot[1] += 1
+        try:
+            yield slot[0]
+        finally:
+            with self._lock:
+                slot[1] -= 1
+                if not slot[1]:
+                    del self._locks[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._locks)
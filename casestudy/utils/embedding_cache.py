@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from casestudy.utils.cache import LRUCache, hash_text
+
+EmbeddingKey = Tuple[str, str]
+
+# SQLite giới hạn số tham số trong một câu lệnh, nên tra cứu theo từng lô.
+_SQLITE_LOOKUP_CHUNK = 500
+
+
+class EmbeddingDiskStore:
+    """
+    Lưu embedding xuống SQLite theo khóa `(model, sha256(text))`, vector dạng float32.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL,"
+                " text_hash TEXT NOT NULL,"
+                " vector BLOB NOT NULL,"
+                " PRIMARY KEY (model, text_hash))"
+            )
+            self._conn.commit()
+
+    def get_many(self, model: str, hashes: Sequence[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            for start in range(0, len(unique), _SQLITE_LOOKUP_CHUNK):
+                chunk = unique[start : start + _SQLITE_LOOKUP_CHUNK]
+                placeholders = ",".join("?" for _ in chunk)
+                rows = self._conn.execute(
+                    "SELECT text_hash, vector FROM embeddings"
+                    f" WHERE model = ? AND text_hash IN ({placeholders})",
+                    (model, *chunk),
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model: str, items: Dict[str, np.ndarray]) -> None:
+        if not items:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                [
+                    (model, text_hash, np.asarray(vector, dtype=np.float32).tobytes())
+                    for text_hash, vector in items.items()
+                ],
+            )
+            self._conn.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Bọc một model embedding với cache 2 tầng: LRU trong bộ nhớ và SQLite trên đĩa.
+
+    Khóa là `(model, sha256(text))` nên tài liệu không đổi nội dung và các truy vấn lặp lại
+    (mô tả canon event, câu hỏi persona...) không phải gọi lại API embedding.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        *,
+        model_name: str,
+        disk_store: Optional[EmbeddingDiskStore] = None,
+        memory_size: int = 2_048,
+    ) -> None:
+        self.underlying = underlying
+        self.model_name = model_name
+        self.disk_store = disk_store
+        self.memory = LRUCache(max_size=memory_size)
+        self._stats_lock = threading.Lock()
+        self.disk_hits = 0
+        self.computed = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors, missing = self._lookup(texts)
+        if missing:
+            computed = self.underlying.embed_documents([texts[pos] for pos in missing[0]])
+            self._store(texts, vectors, missing, computed)
+        return [vector.tolist() for vector in vectors]
+
+    def embed_query(self, text: str) -> List[float]:
+        vectors, missing = self._lookup([text])
+        if missing:
+            self._store([text], vectors, missing, [self.underlying.embed_query(text)])
+        return vectors[0].tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors, missing = self._lookup(texts)
+        if missing:
+            computed = await self.underlying.aembed_documents([texts[pos] for pos in missing[0]])
+            self._store(texts, vectors, missing, computed)
+        return [vector.tolist() for vector in vectors]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vectors, missing = self._lookup([text])
+        if missing:
+            self._store([text], vectors, missing, [await self.underlying.aembed_query(text)])
+        return vectors[0].tolist()
+
+    def stats(self) -> Dict[str, Any]:
+        memory_stats = self.memory.stats()
+        with self._stats_lock:
+            return {
+                "model": self.model_name,
+                "memory": memory_stats,
+                "disk_hits": self.disk_hits,
+                "computed": self.computed,
+            }
+
+    def _lookup(self, texts: Sequence[str]):
+        """
+        Trả về danh sách vector (None ở vị trí chưa có) và `(vị trí cần tính, hash tương ứng)`.
+        Các text trùng nhau trong cùng lô chỉ được tính một lần.
+        """
+        hashes = [hash_text(text) for text in texts]
+        vectors: List[Optional[np.ndarray]] = [
+            self.memory.get((self.model_name, text_hash)) for text_hash in hashes
+        ]
+
+        pending = [pos for pos, vector in enumerate(vectors) if vector is None]
+        if pending and self.disk_store is not None:
+            from_disk = self.disk_store.get_many(self.model_name, [hashes[pos] for pos in pending])
+            for pos in pending:
+                vector = from_disk.get(hashes[pos])
+                if vector is not None:
+                    vectors[pos] = vector
+                    self.memory.set((self.model_name, hashes[pos]), vector)
+            with self._stats_lock:
+                self.disk_hits += sum(1 for pos in pending if hashes[pos] in from_disk)
+
+        first_position: Dict[str, int] = {}
+        for pos, vector in enumerate(vectors):
+            if vector is None:
+                first_position.setdefault(hashes[pos], pos)
+        if not first_position:
+            return vectors, None
+        return vectors, (list(first_position.values()), hashes)
+
+    def _store(
+        self,
+        texts: Sequence[str],
+        vectors: List[Optional[np.ndarray]],
+        missing: Tuple[List[int], List[str]],
+        computed: Sequence[Sequence[float]],
+    ) -> None:
+        positions, hashes = missing
+        fresh: Dict[str, np.ndarray] = {}
+        for pos, vector in zip(positions, computed):
+            array = np.asarray(vector, dtype=np.float32)
+            fresh[hashes[pos]] = array
+            self.memory.set((self.model_name, hashes[pos]), array)
+        for pos in range(len(texts)):
+            if vectors[pos] is None:
+                vectors[pos] = fresh[hashes[pos]]
+        if self.disk_store is not None:
+            self.disk_store.put_many(self.model_name, fresh)
+        with self._stats_lock:
+            self.computed += len(fresh)
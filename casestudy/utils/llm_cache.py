@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, Generation
+
+from casestudy.app.core.config import get_settings
+from casestudy.utils.cache import LRUCache, hash_text
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseDiskStore:
+    """
+    Lưu phản hồi LLM xuống SQLite theo khóa sha256(llm_string + prompt).
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses ("
+                " cache_key TEXT PRIMARY KEY,"
+                " namespace TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str, ttl_seconds: Optional[float]) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, created_at FROM llm_responses WHERE cache_key = ?", (key,)
+            ).fetchone()
+        if row is None or (ttl_seconds and time.time() - row[1] > ttl_seconds):
+            return None
+        return json.loads(row[0])
+
+    def put(self, key: str, namespace: str, payload: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (cache_key, namespace, payload, created_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, namespace, json.dumps(payload, ensure_ascii=False), time.time()),
+            )
+            self._conn.commit()
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        with self._lock:
+            if namespace is None:
+                self._conn.execute("DELETE FROM llm_responses")
+            else:
+                self._conn.execute("DELETE FROM llm_responses WHERE namespace = ?", (namespace,))
+            self._conn.commit()
+
+
+class LLMResponseMongoStore:
+    """
+    Lưu phản hồi LLM vào một collection MongoDB, dùng chung giữa các instance API.
+    TTL index trên `created_at` để Mongo tự dọn bản ghi hết hạn.
+    """
+
+    def __init__(self, collection, ttl_seconds: Optional[float]) -> None:
+        self.collection = collection
+        if ttl_seconds:
+            self.collection.create_index("created_at", expireAfterSeconds=int(ttl_seconds))
+
+    def get(self, key: str, ttl_seconds: Optional[float]) -> Optional[List[Dict[str, Any]]]:
+        document = self.collection.find_one({"_id": key}, {"payload": 1, "created_at": 1})
+        if document is None:
+            return None
+        # TTL monitor của Mongo chạy theo chu kỳ nên vẫn tự kiểm tra hạn.
+        created_at = document.get("created_at")
+        if ttl_seconds and isinstance(created_at, datetime):
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            if datetime.now(timezone.utc) - created_at > timedelta(seconds=ttl_seconds):
+                return None
+        return document.get("payload")
+
+    def put(self, key: str, namespace: str, payload: List[Dict[str, Any]]) -> None:
+        self.collection.replace_one(
+            {"_id": key},
+            {"namespace": namespace, "payload": payload, "created_at": datetime.now(timezone.utc)},
+            upsert=True,
+        )
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        self.collection.delete_many({} if namespace is None else {"namespace": namespace})
+
+
+class LLMResponseCache(BaseCache):
+    """
+    Cache phản hồi LLM khớp chính xác cho một chain (`namespace`), gắn vào ChatOpenAI qua
+    tham số `cache`. Khóa gồm `llm_string` của LangChain (model, temperature, stop...) và
+    prompt đã render; tầng LRU trong bộ nhớ đứng trước tầng lưu trữ (SQLite hoặc Mongo).
+
+    Chỉ lưu nội dung message, không lưu metadata token usage của lần gọi gốc.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        *,
+        memory: LRUCache,
+        store=None,
+        ttl_seconds: Optional[float] = None,
+    ) -> None:
+        self.namespace = namespace
+        self.memory = memory
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self._stats_lock = threading.Lock()
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.store_errors = 0
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        key = self._key(prompt, llm_string)
+        payload = self.memory.get(key)
+        if payload is not None:
+            self._count("memory_hits")
+            return _to_generations(payload)
+        if self.store is not None:
+            try:
+                payload = self.store.get(key, self.ttl_seconds)
+            except Exception as exc:
+                logger.warning("Không đọc được LLM cache (%s): %s", self.namespace, exc)
+                self._count("store_errors")
+                payload = None
+            if payload is not None:
+                self.memory.set(key, payload)
+                self._count("store_hits")
+                return _to_generations(payload)
+        self._count("misses")
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        payload = [_serialize_generation(generation) for generation in return_val]
+        key = self._key(prompt, llm_string)
+        self.memory.set(key, payload)
+        if self.store is not None:
+            try:
+                self.store.put(key, self.namespace, payload)
+            except Exception as exc:
+                logger.warning("Không ghi được LLM cache (%s): %s", self.namespace, exc)
+                self._count("store_errors")
+
+    def clear(self, **kwargs: Any) -> None:
+        self.memory.clear()
+        if self.store is not None:
+            self.store.clear(self.namespace)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            hits = self.memory_hits + self.store_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "store_errors": self.store_errors,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            }
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        return hash_text(f"{llm_string}\n{prompt}")
+
+    def _count(self, field: str) -> None:
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+
+def _serialize_generation(generation: Generation) -> Dict[str, Any]:
+    if isinstance(generation, ChatGeneration):
+        return {"content": generation.message.content}
+    return {"content": generation.text}
+
+
+def _to_generations(payload: List[Dict[str, Any]]) -> List[Generation]:
+    return [ChatGeneration(message=AIMessage(content=item.get("content", ""))) for item in payload]
+
+
+_caches: Dict[str, LLMResponseCache] = {}
+_shared: Dict[str, Any] = {}
+_caches_lock = threading.Lock()
+
+
+def get_llm_response_cache(namespace: str) -> Optional[LLMResponseCache]:
+    """
+    Cache phản hồi cho chain `namespace`, hoặc None nếu cache tắt hay chain không nằm trong
+    `LLM_CACHE_CHAINS`. Các chain dùng chung tầng bộ nhớ và tầng lưu trữ của tiến trình.
+    """
+    settings = get_settings()
+    if not settings.llm_cache_enabled or namespace not in settings.llm_cache_chain_names:
+        return None
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            if not _shared:
+                _shared["memory"] = LRUCache(
+                    max_size=settings.llm_cache_memory_size,
+                    ttl_seconds=settings.llm_cache_ttl_seconds,
+                )
+                _shared["store"] = _build_store(settings)
+            cache = LLMResponseCache(
+                namespace,
+                memory=_shared["memory"],
+                store=_shared["store"],
+                ttl_seconds=settings.llm_cache_ttl_seconds,
+            )
+            _caches[namespace] = cache
+        return cache
+
+
+def _build_store(settings):
+    backend = settings.llm_cache_backend
+    try:
+        if backend == "sqlite":
+            return LLMResponseDiskStore(settings.llm_cache_path)
+        if backend == "mongo":
+            from casestudy.app.db.connection import get_connection_manager
+
+            collection = get_connection_manager().database()[settings.llm_cache_collection]
+            return LLMResponseMongoStore(collection, settings.llm_cache_ttl_seconds)
+    except Exception as exc:
+        logger.warning("Không mở được LLM cache '%s', chỉ dùng cache bộ nhớ: %s", backend, exc)
+    return None
+
+
+def llm_cache_stats() -> Dict[str, Any]:
+    """
+    Số liệu hit/miss theo chain và tầng bộ nhớ dùng chung.
+    """
+    with _caches_lock:
+        caches = dict(_caches)
+        memory = _shared.get("memory")
+    settings = get_settings()
+    return {
+        "enabled": settings.llm_cache_enabled,
+        "backend": settings.llm_cache_backend,
+        "memory": memory.stats() if memory is not None else None,
+        "chains": {namespace: cache.stats() for namespace, cache in caches.items()},
+    }
@@ -0,0 +1,490 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, TypeVar
+
+import httpx
+import openai
+
+from casestudy.app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Lớp ưu tiên: số nhỏ được phục vụ trước.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BOOTSTRAP = 1
+PRIORITY_DRAFT = 2
+PRIORITY_BACKGROUND = 3
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_BOOTSTRAP: "bootstrap",
+    PRIORITY_DRAFT: "draft",
+    PRIORITY_BACKGROUND: "background",
+}
+
+# Ước lượng token khi giữ chỗ; số thực tế được đối chiếu lại sau khi có usage.
+_CHARS_PER_TOKEN = 3
+
+_priority: ContextVar[int] = ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+# Đánh dấu đang giữ một slot để lời gọi lồng nhau (ví dụ _generate gọi _stream) không xin thêm.
+_holding: ContextVar[bool] = ContextVar("llm_holding_slot", default=False)
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    return -(-len(text or "") // _CHARS_PER_TOKEN)
+
+
+@contextmanager
+def llm_priority(priority: int) -> Iterator[None]:
+    """
+    Đặt lớp ưu tiên cho mọi lời gọi LLM trong khối `with` (kể cả node chạy song song).
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+class TokenBucket:
+    """
+    Bucket nạp đều `per_minute` đơn vị mỗi phút, chứa tối đa `per_minute` đơn vị.
+    Số dư có thể âm (khi usage thực tế vượt ước lượng hoặc server báo 429).
+    """
+
+    def __init__(self, per_minute: int) -> None:
+        self.capacity = float(max(1, per_minute))
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, amount: float) -> None:
+        self.level = min(self.capacity, self.level + amount)
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    tokens: int = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    event: Optional[threading.Event] = field(default=None, compare=False)
+    future: Optional[asyncio.Future] = field(default=None, compare=False)
+    loop: Optional[asyncio.AbstractEventLoop] = field(default=None, compare=False)
+    granted: bool = field(default=False, compare=False)
+    cancelled: bool = field(default=False, compare=False)
+
+
+@dataclass
+class Ticket:
+    priority: int
+    seq: int
+    tokens: int
+    active: bool = True
+
+
+class LLMScheduler:
+    """
+    Hàng đợi LLM dùng chung cho cả tiến trình: mỗi request giữ chỗ trong hai token bucket
+    (request/phút và token/phút) và một slot đồng thời, theo thứ tự lớp ưu tiên rồi thứ tự
+    đến. Khi hết quota, request nằm chờ thay vì lỗi; khi server trả 429 thì cả hàng đợi tạm
+    dừng theo `retry-after` và request được xếp lại đúng vị trí cũ.
+    """
+
+    def __init__(
+        self,
+        *,
+        rpm: int,
+        tpm: int,
+        max_concurrency: int = 16,
+        max_requeues: int = 5,
+    ) -> None:
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+        self._max_concurrency = max(1, max_concurrency)
+        self.max_requeues = max(0, max_requeues)
+        self._lock = threading.Lock()
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._timer: Optional[threading.Timer] = None
+        self._timer_due = 0.0
+        self._admitted: Dict[int, int] = {priority: 0 for priority in PRIORITY_NAMES}
+        self._wait_ms: Dict[int, float] = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self._max_wait_ms: Dict[int, float] = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self.rate_limited = 0
+        self.requeues = 0
+
+    # ------------------------------------------------------------------ giữ/trả slot
+
+    def acquire(self, tokens: int, *, priority: Optional[int] = None, seq: Optional[int] = None) -> Ticket:
+        waiter = self._enqueue(tokens, priority, seq, event=threading.Event())
+        waiter.event.wait()
+        return Ticket(waiter.priority, waiter.seq, waiter.tokens)
+
+    async def aacquire(
+        self, tokens: int, *, priority: Optional[int] = None, seq: Optional[int] = None
+    ) -> Ticket:
+        loop = asyncio.get_running_loop()
+        waiter = self._enqueue(tokens, priority, seq, future=loop.create_future(), loop=loop)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter.granted
+                waiter.cancelled = True
+            if granted:
+                self.release(Ticket(waiter.priority, waiter.seq, waiter.tokens))
+            raise
+        return Ticket(waiter.priority, waiter.seq, waiter.tokens)
+
+    def release(self, ticket: Ticket, used_tokens: Optional[int] = None) -> None:
+        """
+        Trả slot; nếu biết số token thực tế thì hoàn/trừ thêm phần chênh lệch so với giữ chỗ.
+        """
+        if not ticket.active:
+            return
+        ticket.active = False
+        with self._lock:
+            self._in_flight -= 1
+            if used_tokens is not None:
+                self._tokens.adjust(ticket.tokens - used_tokens)
+        self._dispatch()
+
+    def pause(self, seconds: float) -> None:
+        """
+        Dừng cấp slot mới trong `seconds` giây (server báo 429).
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._dispatch()
+
+    # ------------------------------------------------------------------ chạy lời gọi
+
+    def run(
+        self,
+        func: Callable[[], T],
+        *,
+        tokens: int,
+        priority: Optional[int] = None,
+        used_tokens: Optional[Callable[[T], Optional[int]]] = None,
+    ) -> T:
+        if _holding.get():
+            return func()
+        seq: Optional[int] = None
+        attempt = 0
+        while True:
+            ticket = self.acquire(tokens, priority=priority, seq=seq)
+            seq = ticket.seq
+            holding = _holding.set(True)
+            try:
+                result = func()
+            except Exception as exc:
+                self.release(ticket)
+                delay = self.requeue_delay(exc, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                self.release(ticket)
+                raise
+            finally:
+                _holding.reset(holding)
+            self.release(ticket, used_tokens(result) if used_tokens else None)
+            return result
+
+    async def arun(
+        self,
+        func: Callable[[], Awaitable[T]],
+        *,
+        tokens: int,
+        priority: Optional[int] = None,
+        used_tokens: Optional[Callable[[T], Optional[int]]] = None,
+    ) -> T:
+        if _holding.get():
+            return await func()
+        seq: Optional[int] = None
+        attempt = 0
+        while True:
+            ticket = await self.aacquire(tokens, priority=priority, seq=seq)
+            seq = ticket.seq
+            holding = _holding.set(True)
+            try:
+                result = await func()
+            except Exception as exc:
+                self.release(ticket)
+                delay = self.requeue_delay(exc, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                self.release(ticket)
+                raise
+            finally:
+                _holding.reset(holding)
+            self.release(ticket, used_tokens(result) if used_tokens else None)
+            return result
+
+    def stream(
+        self,
+        factory: Callable[[], Iterator[T]],
+        *,
+        tokens: int,
+        priority: Optional[int] = None,
+    ) -> Iterator[T]:
+        """
+        Như `run` cho lời gọi stream: giữ slot tới khi stream kết thúc, chỉ xếp lại hàng đợi
+        nếu lỗi xảy ra trước chunk đầu tiên.
+        """
+        if _holding.get():
+            yield from factory()
+            return
+        seq: Optional[int] = None
+        attempt = 0
+        while True:
+            ticket = self.acquire(tokens, priority=priority, seq=seq)
+            seq = ticket.seq
+            started = False
+            try:
+                for chunk in factory():
+                    started = True
+                    yield chunk
+            except Exception as exc:
+                self.release(ticket)
+                delay = None if started else self.requeue_delay(exc, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                self.release(ticket)
+                raise
+            self.release(ticket)
+            return
+
+    async def astream(
+        self,
+        factory: Callable[[], AsyncIterator[T]],
+        *,
+        tokens: int,
+        priority: Optional[int] = None,
+    ) -> AsyncIterator[T]:
+        if _holding.get():
+            async for chunk in factory():
+                yield chunk
+            return
+        seq: Optional[int] = None
+        attempt = 0
+        while True:
+            ticket = await self.aacquire(tokens, priority=priority, seq=seq)
+            seq = ticket.seq
+            started = False
+            try:
+                async for chunk in factory():
+                    started = True
+                    yield chunk
+            except Exception as exc:
+                self.release(ticket)
+                delay = None if started else self.requeue_delay(exc, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                self.release(ticket)
+                raise
+            self.release(ticket)
+            return
+
+    def requeue_delay(self, exc: Exception, attempt: int) -> Optional[float]:
+        """
+        Số giây request phải chờ trước khi xếp lại hàng đợi, hoặc None nếu lỗi không tạm thời
+        hay đã hết số lần xếp lại. Với 429, cả hàng đợi tạm dừng theo `retry-after` nên bản
+        thân request không phải chờ thêm; lỗi kết nối/5xx chỉ làm chậm riêng request đó.
+        """
+        status = _status_code(exc)
+        transient = status == 429 or (status is not None and status >= 500) or isinstance(
+            exc, (openai.APIConnectionError, httpx.TransportError)
+        )
+        if not transient or attempt >= self.max_requeues:
+            return None
+        delay = _retry_after(exc) or min(2.0 ** attempt, 30.0)
+        with self._lock:
+            self.requeues += 1
+            if status == 429:
+                self.rate_limited += 1
+        if status == 429:
+            logger.warning("LLM bị giới hạn tốc độ (429), tạm dừng hàng đợi %.1f giây.", delay)
+            self.pause(delay)
+            return 0.0
+        logger.info("Lỗi LLM tạm thời (%s), thử lại sau %.1f giây.", exc, delay)
+        return delay
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            depth = {name: 0 for name in PRIORITY_NAMES.values()}
+            for waiter in self._queue:
+                if not waiter.cancelled and not waiter.granted:
+                    depth[PRIORITY_NAMES.get(waiter.priority, str(waiter.priority))] += 1
+            self._requests._refill(now)
+            self._tokens._refill(now)
+            return {
+                "queue_depth": depth,
+                "in_flight": self._in_flight,
+                "max_concurrency": self._max_concurrency,
+                "paused_for_s": round(max(0.0, self._paused_until - now), 2),
+                "requests_available": round(self._requests.level, 1),
+                "tokens_available": round(self._tokens.level, 1),
+                "rate_limited": self.rate_limited,
+                "requeues": self.requeues,
+                "admitted": {PRIORITY_NAMES[p]: count for p, count in self._admitted.items()},
+                "avg_wait_ms": {
+                    PRIORITY_NAMES[p]: round(self._wait_ms[p] / count, 2) if count else 0.0
+                    for p, count in self._admitted.items()
+                },
+                "max_wait_ms": {PRIORITY_NAMES[p]: round(ms, 2) for p, ms in self._max_wait_ms.items()},
+            }
+
+    # ------------------------------------------------------------------ nội bộ
+
+    def _enqueue(self, tokens: int, priority: Optional[int], seq: Optional[int], **signal) -> _Waiter:
+        waiter = _Waiter(
+            priority=current_priority() if priority is None else priority,
+            seq=next(self._seq) if seq is None else seq,
+            tokens=max(1, int(tokens)),
+            enqueued_at=time.monotonic(),
+            **signal,
+        )
+        with self._lock:
+            heapq.heappush(self._queue, waiter)
+        self._dispatch()
+        return waiter
+
+    def _dispatch(self) -> None:
+        granted: List[_Waiter] = []
+        with self._lock:
+            now = time.monotonic()
+            while self._queue:
+                head = self._queue[0]
+                if head.cancelled:
+                    heapq.heappop(self._queue)
+                    continue
+                if self._in_flight >= self._max_concurrency:
+                    break
+                wait = max(
+                    self._paused_until - now,
+                    self._requests.wait_time(1, now),
+                    self._tokens.wait_time(head.tokens, now),
+                )
+                if wait > 0:
+                    self._schedule(now + wait)
+                    break
+                heapq.heappop(self._queue)
+                self._requests.take(1, now)
+                self._tokens.take(head.tokens, now)
+                self._in_flight += 1
+                head.granted = True
+                waited_ms = (now - head.enqueued_at) * 1000
+                self._admitted[head.priority] = self._admitted.get(head.priority, 0) + 1
+                self._wait_ms[head.priority] = self._wait_ms.get(head.priority, 0.0) + waited_ms
+                self._max_wait_ms[head.priority] = max(self._max_wait_ms.get(head.priority, 0.0), waited_ms)
+                granted.append(head)
+        for waiter in granted:
+            if waiter.event is not None:
+                waiter.event.set()
+            else:
+                waiter.loop.call_soon_threadsafe(_resolve, waiter.future)
+
+    def _schedule(self, due: float) -> None:
+        # Gọi khi đang giữ self._lock.
+        if self._timer is not None and self._timer.is_alive() and self._timer_due <= due:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer_due = due
+        self._timer = threading.Timer(max(0.0, due - time.monotonic()), self._dispatch)
+        self._timer.daemon = True
+        self._timer.start()
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def _status_code(exc: Exception) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        value = float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """
+    Scheduler dùng chung của tiến trình, cấu hình qua LLM_* trong settings.
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                settings = get_settings()
+                _scheduler = LLMScheduler(
+                    rpm=settings.llm_rpm_limit,
+                    tpm=settings.llm_tpm_limit,
+                    max_concurrency=settings.llm_max_concurrency,
+                    max_requeues=settings.llm_max_requeues,
+                )
+    return _scheduler
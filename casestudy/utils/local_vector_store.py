@@ -0,0 +1,408 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+MANIFEST_FILENAME = "manifest.json"
+# Tên file của định dạng cũ (trước khi có manifest), vẫn đọc được khi chưa có manifest.
+VECTORS_FILENAME = "vectors.npy"
+DOCUMENTS_FILENAME = "documents.json"
+
+SEARCH_MODE_EXACT = "exact"
+SEARCH_MODE_APPROX = "approx"
+
+# Dưới ngưỡng này tìm kiếm xấp xỉ không nhanh hơn nhân ma trận trực tiếp.
+APPROX_MIN_VECTORS = 2_048
+APPROX_PROJECTION_DIM = 64
+APPROX_OVERSAMPLE = 8
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _matches(metadata: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+    if not filter:
+        return True
+    for key, expected in filter.items():
+        value = metadata.get(key)
+        if isinstance(expected, dict) and "$in" in expected:
+            if value not in expected["$in"]:
+                return False
+        elif value != expected:
+            return False
+    return True
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Semantic memory chạy trong tiến trình cho một cặp (label, case_id).
+
+    Embedding được chuẩn hóa và lưu thành ma trận NumPy (mở bằng memory-map) cùng file
+    documents JSON; top-k tính bằng tích vô hướng (cosine).
+    Mỗi lần ghi tạo một snapshot với tên file riêng rồi trỏ `manifest.json` sang snapshot đó
+    bằng một lần `os.replace`, nên người đọc luôn thấy một cặp vectors/documents khớp nhau và
+    các lần sync đồng thời không ghi đè file tạm của nhau. Store tự nạp lại khi manifest trên
+    đĩa đổi (ví dụ sau khi một tiến trình khác sync xong case).
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        *,
+        directory: Optional[Path] = None,
+        search_mode: str = SEARCH_MODE_EXACT,
+    ) -> None:
+        if search_mode not in (SEARCH_MODE_EXACT, SEARCH_MODE_APPROX):
+            raise ValueError(f"search_mode không hợp lệ: {search_mode}")
+        self._embedding = embedding
+        self.directory = Path(directory) if directory else None
+        self.search_mode = search_mode
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._projection: Optional[np.ndarray] = None
+        self._projected: Optional[np.ndarray] = None
+        self._snapshot: Optional[Tuple[int, int]] = None
+        if self.directory is not None:
+            self._load()
+
+    # ------------------------------------------------------------------ #
+    # VectorStore API
+    # ------------------------------------------------------------------ #
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        directory: Optional[Path] = None,
+        search_mode: str = SEARCH_MODE_EXACT,
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        store = cls(embedding, directory=directory, search_mode=search_mode)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        vectors = self._embedding.embed_documents(texts)
+        return self.add_vectors(texts, vectors, metadatas, ids=ids)
+
+    def add_vectors(
+        self,
+        texts: Sequence[str],
+        vectors: Sequence[Sequence[float]],
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+        *,
+        ids: Optional[Sequence[str]] = None,
+    ) -> List[str]:
+        """
+        Thêm (hoặc ghi đè theo id) các vector đã embed sẵn rồi lưu xuống đĩa.
+        """
+        if not texts:
+            return []
+        metadatas, ids, new_rows = self._prepare_rows(texts, vectors, metadatas, ids)
+        with self._lock:
+            self._refresh()
+            replaced = set(ids)
+            keep = [pos for pos, doc_id in enumerate(self._ids) if doc_id not in replaced]
+            self._ids = [self._ids[pos] for pos in keep] + ids
+            self._texts = [self._texts[pos] for pos in keep] + list(texts)
+            self._metadatas = [self._metadatas[pos] for pos in keep] + metadatas
+            if self._matrix is not None and keep:
+                self._matrix = np.vstack([np.asarray(self._matrix[keep]), new_rows])
+            else:
+                self._matrix = new_rows
+            self._reset_projection()
+            self._persist()
+        return ids
+
+    def replace_vectors(
+        self,
+        texts: Sequence[str],
+        vectors: Sequence[Sequence[float]],
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+        *,
+        ids: Optional[Sequence[str]] = None,
+    ) -> List[str]:
+        """
+        Thay toàn bộ nội dung store trong một lần ghi (dùng khi rebuild namespace).
+        """
+        metadatas, ids, new_rows = self._prepare_rows(texts, vectors, metadatas, ids)
+        with self._lock:
+            self._ids = ids
+            self._texts = list(texts)
+            self._metadatas = metadatas
+            self._matrix = new_rows if ids else None
+            self._reset_projection()
+            self._persist()
+        return ids
+
+    @staticmethod
+    def _prepare_rows(texts, vectors, metadatas, ids):
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in texts]
+        if not texts:
+            return metadatas, ids, None
+        new_rows = _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1))
+        return metadatas, ids, new_rows
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        with self._lock:
+            self._refresh()
+            if ids is None:
+                self._ids, self._texts, self._metadatas = [], [], []
+                self._matrix = None
+            else:
+                removed = set(ids)
+                keep = [pos for pos, doc_id in enumerate(self._ids) if doc_id not in removed]
+                self._ids = [self._ids[pos] for pos in keep]
+                self._texts = [self._texts[pos] for pos in keep]
+                self._metadatas = [self._metadatas[pos] for pos in keep]
+                self._matrix = np.asarray(self._matrix[keep]) if self._matrix is not None and keep else None
+            self._reset_projection()
+            self._persist()
+        return True
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        with self._lock:
+            self._refresh()
+            positions = {doc_id: pos for pos, doc_id in enumerate(self._ids)}
+            return [self._document(positions[doc_id]) for doc_id in ids if doc_id in positions]
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        vector = self._embedding.embed_query(query)
+        return self.similarity_search_by_vector(vector, k=k, filter=filter)
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        vector = self._embedding.embed_query(query)
+        return self._search(vector, k, filter)
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return [doc for doc, _ in self._search(embedding, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        return self._cosine_relevance_score_fn
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            self._refresh()
+            return list(self._ids)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._ids)
+
+    # ------------------------------------------------------------------ #
+    # Search
+    # ------------------------------------------------------------------ #
+
+    def _search(
+        self,
+        embedding: Sequence[float],
+        k: int,
+        filter: Optional[Dict[str, Any]],
+    ) -> List[Tuple[Document, float]]:
+        with self._lock:
+            self._refresh()
+            matrix = self._matrix
+            if matrix is None or not len(self._ids) or k <= 0:
+                return []
+            query = _normalize(np.asarray(embedding, dtype=np.float32))
+
+            candidates: Optional[np.ndarray] = None
+            if filter:
+                candidates = np.array(
+                    [pos for pos, meta in enumerate(self._metadatas) if _matches(meta, filter)],
+                    dtype=np.int64,
+                )
+                if not candidates.size:
+                    return []
+            elif self.search_mode == SEARCH_MODE_APPROX and len(self._ids) >= APPROX_MIN_VECTORS:
+                candidates = self._approx_candidates(query, k * APPROX_OVERSAMPLE)
+
+            if candidates is None:
+                scores = matrix @ query
+                positions = np.arange(len(scores))
+            else:
+                scores = np.asarray(matrix[candidates]) @ query
+                positions = candidates
+
+            top = min(k, len(scores))
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            return [(self._document(int(positions[i])), float(scores[i])) for i in best]
+
+    def _approx_candidates(self, query: np.ndarray, count: int) -> np.ndarray:
+        """
+        Lọc ứng viên bằng phép chiếu ngẫu nhiên xuống chiều thấp, sau đó xếp hạng chính xác.
+        """
+        if self._projection is None:
+            rng = np.random.default_rng(0)
+            dim = self._matrix.shape[1]
+            self._projection = rng.standard_normal((dim, APPROX_PROJECTION_DIM)).astype(np.float32)
+            self._projected = np.asarray(self._matrix) @ self._projection
+        scores = self._projected @ (query @ self._projection)
+        count = min(count, len(scores))
+        return np.argpartition(-scores, count - 1)[:count]
+
+    def _reset_projection(self) -> None:
+        self._projection = None
+        self._projected = None
+
+    def _document(self, position: int) -> Document:
+        return Document(
+            id=self._ids[position],
+            page_content=self._texts[position],
+            metadata=dict(self._metadatas[position]),
+        )
+
+    # ------------------------------------------------------------------ #
+    # Persistence
+    # ------------------------------------------------------------------ #
+
+    def _snapshot_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = (self.directory / MANIFEST_FILENAME).stat()
+        except FileNotFoundError:
+            return None
+        # Manifest luôn được thay bằng file mới nên inode đổi sau mỗi lần ghi.
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _refresh(self) -> None:
+        """
+        Nạp lại snapshot nếu manifest trên đĩa đã đổi kể từ lần đọc/ghi gần nhất.
+        Gọi khi đang giữ `self._lock`.
+        """
+        if self.directory is None:
+            return
+        if self._snapshot_stamp() != self._snapshot:
+            self._load()
+            self._reset_projection()
+
+    def _read_manifest(self) -> Optional[Dict[str, str]]:
+        try:
+            with (self.directory / MANIFEST_FILENAME).open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _load(self) -> None:
+        # Snapshot có thể bị writer khác dọn giữa lúc đọc manifest và mở file: đọc lại manifest.
+        for _ in range(3):
+            stamp = self._snapshot_stamp()
+            manifest = self._read_manifest()
+            if manifest is None:
+                documents_path = self.directory / DOCUMENTS_FILENAME
+                vectors_path = self.directory / VECTORS_FILENAME
+            else:
+                documents_path = self.directory / manifest["documents"]
+                vectors_path = self.directory / manifest["vectors"]
+            try:
+                with documents_path.open("r", encoding="utf-8") as f:
+                    payload = json.load(f)
+                ids = payload.get("ids", [])
+                matrix = np.load(vectors_path, mmap_mode="r") if ids else None
+            except FileNotFoundError:
+                if manifest is None:
+                    self._snapshot = stamp
+                    return
+                continue
+            self._ids = ids
+            self._texts = payload.get("texts", [])
+            self._metadatas = payload.get("metadatas", [])
+            self._matrix = matrix
+            self._snapshot = stamp
+            return
+        raise RuntimeError(f"Không đọc được snapshot vector store tại '{self.directory}'.")
+
+    def _persist(self) -> None:
+        if self.directory is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        previous = self._read_manifest() or {
+            "vectors": VECTORS_FILENAME,
+            "documents": DOCUMENTS_FILENAME,
+        }
+        generation = uuid.uuid4().hex
+        manifest = {
+            "vectors": f"vectors-{generation}.npy",
+            "documents": f"documents-{generation}.json",
+        }
+        vectors_path = self.directory / manifest["vectors"]
+
+        matrix = self._matrix if self._matrix is not None else np.zeros((0, 0), dtype=np.float32)
+        np.save(vectors_path, np.asarray(matrix, dtype=np.float32))
+        with (self.directory / manifest["documents"]).open("w", encoding="utf-8") as f:
+            json.dump(
+                {"ids": self._ids, "texts": self._texts, "metadatas": self._metadatas},
+                f,
+                ensure_ascii=False,
+            )
+        # Mở memory-map trước khi swap: writer khác có thể dọn snapshot này ngay sau đó.
+        if self._matrix is not None:
+            self._matrix = np.load(vectors_path, mmap_mode="r")
+        tmp_manifest = self.directory / f"manifest-{generation}.tmp"
+        with tmp_manifest.open("w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        stat = tmp_manifest.stat()
+        os.replace(tmp_manifest, self.directory / MANIFEST_FILENAME)
+        self._snapshot = (stat.st_ino, stat.st_mtime_ns)
+
+        # Dọn snapshot vừa bị thay; reader đang memory-map file cũ vẫn đọc được trên POSIX.
+        for name in (previous.get("vectors"), previous.get("documents")):
+            if not name or name in manifest.values():
+                continue
+            try:
+                (self.directory / name).unlink()
+            except OSError:
+                pass
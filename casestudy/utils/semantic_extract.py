@@ -4,8 +4,14 @@ import argparse
 import json
 import logging
 import os
+import random
+import threading
 import time
-from typing import Any, Dict, Iterable, List, Tuple
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import openai
 
 from dotenv import load_dotenv
 from langchain.docstore.document import Document
@@ -14,9 +20,13 @@ from langchain_pinecone import PineconeVectorStore
 from pinecone import Pinecone
 from pinecone.exceptions import ServiceException
 
+from casestudy.utils.cache import hash_text
 from casestudy.utils.document_builder import build_documents
+from casestudy.utils.embedding_cache import CachedEmbeddings, EmbeddingDiskStore
+from casestudy.utils.llm_scheduler import PRIORITY_BACKGROUND, estimate_tokens, get_llm_scheduler
+from casestudy.utils.local_vector_store import LocalVectorStore
 from casestudy.app.core.config import get_settings as get_app_settings
-from casestudy.app.db.database import get_mongo_client as get_app_mongo_client
+from casestudy.app.crud.case_crud import fetch_case_bundle
 
 # ---------------------------------------------------------------------------- #
 #                               ENV CONFIGURATION                              #
@@ -27,7 +37,65 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
 
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
-embeddings = OpenAIEmbeddings(model=EMBEDDING_MODEL)
+
+
+class ScheduledOpenAIEmbeddings(OpenAIEmbeddings):
+    """
+    OpenAIEmbeddings đi qua LLM scheduler dùng chung (theo `llm_priority` hiện tại), để cả
+    embedding truy vấn cũng được xếp lại hàng đợi khi gặp 429/lỗi tạm thời. Lời gọi nằm trong
+    một lượt scheduler khác (batch sync) chạy thẳng, không xếp hàng lần hai.
+    """
+
+    def embed_documents(
+        self, texts: List[str], chunk_size: Optional[int] = None, **kwargs: Any
+    ) -> List[List[float]]:
+        embed = super().embed_documents
+        return get_llm_scheduler().run(
+            lambda: embed(texts, chunk_size=chunk_size, **kwargs),
+            tokens=sum(estimate_tokens(text) for text in texts),
+        )
+
+    def embed_query(self, text: str, **kwargs: Any) -> List[float]:
+        embed = super().embed_query
+        return get_llm_scheduler().run(lambda: embed(text, **kwargs), tokens=estimate_tokens(text))
+
+    async def aembed_documents(
+        self, texts: List[str], chunk_size: Optional[int] = None, **kwargs: Any
+    ) -> List[List[float]]:
+        embed = super().aembed_documents
+        return await get_llm_scheduler().arun(
+            lambda: embed(texts, chunk_size=chunk_size, **kwargs),
+            tokens=sum(estimate_tokens(text) for text in texts),
+        )
+
+    async def aembed_query(self, text: str, **kwargs: Any) -> List[float]:
+        embed = super().aembed_query
+        return await get_llm_scheduler().arun(lambda: embed(text, **kwargs), tokens=estimate_tokens(text))
+
+
+def _build_embeddings():
+    """
+    OpenAIEmbeddings bọc cache (model, sha256(text)) dùng chung cho sync tài liệu và truy vấn.
+    Retry do scheduler đảm nhiệm nên client OpenAI không tự retry (`max_retries=0`).
+    """
+    base = ScheduledOpenAIEmbeddings(model=EMBEDDING_MODEL, max_retries=0)
+    settings = get_app_settings()
+    if not settings.embedding_cache_enabled:
+        return base
+    try:
+        disk_store = EmbeddingDiskStore(settings.embedding_cache_path)
+    except Exception as exc:
+        logger.warning(f"Không mở được embedding cache trên đĩa, chỉ dùng cache bộ nhớ: {exc}")
+        disk_store = None
+    return CachedEmbeddings(
+        base,
+        model_name=EMBEDDING_MODEL,
+        disk_store=disk_store,
+        memory_size=settings.embedding_cache_memory_size,
+    )
+
+
+embeddings = _build_embeddings()
 
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_ENVIRONMENT = os.getenv("PINECONE_ENVIRONMENT", "asia-southeast1-gcp")
@@ -46,24 +114,26 @@ INDEX_NAME_BY_LABEL = {
 
 DEFAULT_NAMESPACE = "default"
 BATCH_SIZE_DEFAULT = 64
-
-CASE_ID: str | None = None
-
-# ---------------------------------------------------------------------------- #
-#                              CORE CONFIGURATION                              #
-# ---------------------------------------------------------------------------- #
-
-def configure_paths(case_id: str) -> None:
-    """Chỉ cần ghi nhận case_id hiện tại để dùng làm namespace Pinecone."""
-    global CASE_ID
-    CASE_ID = case_id
-    logger.info(f"Đã cấu hình namespace: {case_id}")
-
-
-def _ensure_configured() -> None:
-    if CASE_ID is None:
-        raise RuntimeError("Semantic namespace chưa được cấu hình. Hãy gọi configure_paths(case_id) trước.")
-
+DELETE_BATCH_SIZE = 1_000
+
+SYNC_EMBED_WORKERS = int(os.getenv("SYNC_EMBED_WORKERS", "4"))
+SYNC_UPSERT_WORKERS = int(os.getenv("SYNC_UPSERT_WORKERS", "4"))
+SYNC_MAX_RETRIES = int(os.getenv("SYNC_MAX_RETRIES", "5"))
+SYNC_RETRY_BASE_DELAY = float(os.getenv("SYNC_RETRY_BASE_DELAY", "1.0"))
+SYNC_RETRY_MAX_DELAY = float(os.getenv("SYNC_RETRY_MAX_DELAY", "30.0"))
+
+# Lỗi mạng/giới hạn tốc độ có thể thử lại; lỗi khác (sai dữ liệu, sai key) dừng ngay.
+TRANSIENT_ERRORS = (
+    ServiceException,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+SEMANTIC_BACKEND_PINECONE = "pinecone"
+SEMANTIC_BACKEND_LOCAL = "local"
+SEMANTIC_LABELS = ("scene", "persona", "policy")
 
 def normalize_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
     """Chuyển mọi giá trị phức tạp sang chuỗi JSON để đảm bảo tương thích Pinecone."""
@@ -76,54 +146,377 @@ def normalize_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
     return normalized
 
 
+def document_id(document: Document) -> str:
+    """
+    ID cố định cho một Document: `case_id:type:entity_id:hash(nội dung + metadata)`.
+
+    Nội dung không đổi thì ID không đổi, nên lần sync sau chỉ cần upsert ID mới
+    và xóa ID không còn xuất hiện.
+    """
+    metadata = normalize_metadata(document.metadata)
+    entity_id = (
+        metadata.get("event_id")
+        or metadata.get("persona_id")
+        or metadata.get("policy_id")
+        or ""
+    )
+    fingerprint = hash_text(
+        document.page_content + "\x00" + json.dumps(metadata, ensure_ascii=False, sort_keys=True)
+    )
+    return ":".join(
+        [
+            str(metadata.get("case_id") or "unknown_case"),
+            str(metadata.get("type") or "doc"),
+            str(entity_id),
+            fingerprint[:24],
+        ]
+    )
+
+
+def _with_ids(documents: List[Document]) -> Tuple[List[Document], List[str]]:
+    """Gắn ID cố định, bỏ các Document trùng ID (trùng hoàn toàn nội dung)."""
+    unique: Dict[str, Document] = {}
+    for document in documents:
+        unique.setdefault(document_id(document), document)
+    return list(unique.values()), list(unique.keys())
+
+
+def get_semantic_backend() -> str:
+    """Backend semantic memory đang dùng, cấu hình qua SEMANTIC_BACKEND."""
+    backend = (get_app_settings().semantic_backend or SEMANTIC_BACKEND_PINECONE).strip().lower()
+    if backend not in (SEMANTIC_BACKEND_PINECONE, SEMANTIC_BACKEND_LOCAL):
+        raise RuntimeError(f"SEMANTIC_BACKEND không hợp lệ: '{backend}'.")
+    return backend
+
+
 # ---------------------------------------------------------------------------- #
 #                              MAIN SYNC FUNCTION                              #
 # ---------------------------------------------------------------------------- #
 
+def sync_semantic_memory(
+    case_id: str,
+    *,
+    batch_size: int = BATCH_SIZE_DEFAULT,
+    force_rebuild: bool = False,
+    on_batch: Optional[Callable[["LabelProgress"], None]] = None,
+) -> Dict[str, int]:
+    """
+    Đồng bộ semantic memory của case lên backend đang cấu hình (Pinecone hoặc local).
+    """
+    sync = (
+        sync_case_to_local
+        if get_semantic_backend() == SEMANTIC_BACKEND_LOCAL
+        else sync_case_to_pinecone
+    )
+    return sync(case_id, batch_size=batch_size, force_rebuild=force_rebuild, on_batch=on_batch)
+
+
 def sync_case_to_pinecone(
     case_id: str,
     *,
     batch_size: int = BATCH_SIZE_DEFAULT,
     force_rebuild: bool = False,
+    on_batch: Optional[Callable[["LabelProgress"], None]] = None,
 ) -> Dict[str, int]:
     """
     Đọc dữ liệu case từ MongoDB, embedding bằng OpenAI và đẩy lên Pinecone theo từng index.
+
+    Sync theo diff: chỉ upsert Document có ID mới và xóa ID không còn trong case,
+    upsert luôn chạy trước xóa nên namespace không có lúc nào bị trống.
+    `force_rebuild` upsert lại toàn bộ Document thay vì chỉ phần thay đổi.
+    Các batch của mọi label chạy chung một pipeline embedding → upsert (xem `_run_pipeline`).
     """
-    _ensure_configured()
     documents_map = _build_documents_from_mongo(case_id)
     namespace = case_id
-    stats: Dict[str, int] = {}
     pinecone_client = _get_pinecone_client()
 
-    for label, documents in documents_map.items():
-        index_name = INDEX_NAME_BY_LABEL.get(label)
-        if not index_name:
+    labels = [label for label in documents_map if INDEX_NAME_BY_LABEL.get(label)]
+    for label in documents_map:
+        if label not in labels:
             logger.warning(f"Bỏ qua label '{label}' (chưa cấu hình index).")
-            continue
-        if not documents:
-            logger.info(f"Không có tài liệu nào cho nhóm '{label}'.")
-            stats[label] = 0
-            continue
+    if not labels:
+        raise RuntimeError("Chưa cấu hình Pinecone index cho bất kỳ nhóm tài liệu nào.")
 
-        index = pinecone_client.Index(index_name)
-        if force_rebuild:
-            logger.info(f"🧹 Xóa namespace '{namespace}' trong index '{index_name}'...")
-            index.delete(namespace=namespace, delete_all=True)
+    indexes = {label: pinecone_client.Index(INDEX_NAME_BY_LABEL[label]) for label in labels}
+    with ThreadPoolExecutor(max_workers=len(labels)) as pool:
+        plans = dict(
+            zip(
+                labels,
+                pool.map(
+                    lambda label: _plan_pinecone_label(
+                        indexes[label], namespace, label, documents_map[label], force_rebuild
+                    ),
+                    labels,
+                ),
+            )
+        )
 
-        inserted = _upsert_documents(
-            index=index,
+    def upsert(job: "_BatchJob", vectors: List[List[float]]) -> None:
+        indexes[job.label].upsert(
+            vectors=[
+                {
+                    "id": doc_id,
+                    "values": vector,
+                    "metadata": {
+                        **normalize_metadata(document.metadata),
+                        PINECONE_TEXT_KEY: document.page_content,
+                    },
+                }
+                for doc_id, document, vector in zip(job.ids, job.documents, vectors)
+            ],
             namespace=namespace,
-            label=label,
-            documents=documents,
-            batch_size=batch_size,
         )
-        stats[label] = inserted
 
-    if not stats:
-        raise RuntimeError("Chưa cấu hình Pinecone index cho bất kỳ nhóm tài liệu nào.")
+    progress = _run_pipeline(
+        {label: plan[0] for label, plan in plans.items()},
+        upsert,
+        batch_size=batch_size,
+        on_batch=on_batch,
+    )
+
+    stats: Dict[str, int] = {}
+    for label, (pending, stale_ids, total) in plans.items():
+        for _, batch in _batched(stale_ids, DELETE_BATCH_SIZE):
+            _with_backoff(
+                lambda batch=batch: indexes[label].delete(ids=batch, namespace=namespace),
+                progress[label],
+                f"xóa {len(batch)} vectors",
+            )
+        progress[label].deleted = len(stale_ids)
+        logger.info(
+            f"[{label}] upsert {progress[label].upserted}, giữ nguyên {total - len(pending)}, "
+            f"xóa {len(stale_ids)}, retry {progress[label].retries} (namespace={namespace})"
+        )
+        stats[label] = progress[label].upserted
+    return stats
+
+
+def _plan_pinecone_label(
+    index,
+    namespace: str,
+    label: str,
+    documents: List[Document],
+    force_rebuild: bool,
+) -> Tuple[List[Tuple[str, Document]], List[str], int]:
+    """
+    Tính diff cho một label: (Document cần upsert, ID cần xóa, tổng số Document).
+    """
+    documents, ids = _with_ids(documents)
+    existing_ids = _list_namespace_ids(index, namespace)
+
+    if existing_ids is None:
+        # Index không hỗ trợ liệt kê ID: không tính được diff.
+        if force_rebuild:
+            logger.info(f"🧹 Xóa namespace '{namespace}' của nhóm '{label}'...")
+            index.delete(namespace=namespace, delete_all=True)
+        return list(zip(ids, documents)), [], len(ids)
+
+    pending = [
+        (doc_id, document)
+        for doc_id, document in zip(ids, documents)
+        if force_rebuild or doc_id not in existing_ids
+    ]
+    return pending, sorted(existing_ids - set(ids)), len(ids)
+
+
+def _list_namespace_ids(index, namespace: str) -> set[str] | None:
+    """Liệt kê toàn bộ vector ID trong namespace; trả None nếu index không hỗ trợ."""
+    try:
+        existing: set[str] = set()
+        for page in index.list(namespace=namespace):
+            existing.update(page)
+        return existing
+    except Exception as exc:
+        logger.warning(f"Không liệt kê được vector ID trong namespace '{namespace}': {exc}")
+        return None
+
+
+def sync_case_to_local(
+    case_id: str,
+    *,
+    batch_size: int = BATCH_SIZE_DEFAULT,
+    force_rebuild: bool = False,
+    on_batch: Optional[Callable[["LabelProgress"], None]] = None,
+) -> Dict[str, int]:
+    """
+    Embedding tài liệu của case và ghi vào LocalVectorStore (một store cho mỗi label).
+    Store local luôn được ghi lại toàn bộ trong một lần thay file nên `force_rebuild`
+    không tạo ra khoảng trống nào cho các session đang đọc.
+    """
+    documents_map = _build_documents_from_mongo(case_id)
+    prepared = {label: _with_ids(documents_map.get(label, [])) for label in SEMANTIC_LABELS}
+    vectors_by_id: Dict[str, List[float]] = {}
+    lock = threading.Lock()
+
+    def collect(job: "_BatchJob", vectors: List[List[float]]) -> None:
+        with lock:
+            vectors_by_id.update(zip(job.ids, vectors))
+
+    _run_pipeline(
+        {
+            label: list(zip(ids, documents))
+            for label, (documents, ids) in prepared.items()
+        },
+        collect,
+        batch_size=batch_size,
+        on_batch=on_batch,
+    )
+
+    stats: Dict[str, int] = {}
+    for label, (documents, ids) in prepared.items():
+        _load_local_vectorstore(case_id, label).replace_vectors(
+            [doc.page_content for doc in documents],
+            [vectors_by_id[doc_id] for doc_id in ids],
+            [normalize_metadata(doc.metadata) for doc in documents],
+            ids=ids,
+        )
+        stats[label] = len(ids)
+        logger.info(f"✅ Đã ghi {len(ids)} vectors cho '{label}' (local, case={case_id})")
     return stats
 
 
+# ---------------------------------------------------------------------------- #
+#                         EMBEDDING / UPSERT PIPELINE                          #
+# ---------------------------------------------------------------------------- #
+
+@dataclass
+class LabelProgress:
+    """Tiến độ sync của một label, cập nhật sau mỗi batch."""
+
+    label: str
+    documents: int = 0
+    batches_total: int = 0
+    batches_done: int = 0
+    upserted: int = 0
+    deleted: int = 0
+    retries: int = 0
+    embed_seconds: float = 0.0
+    upsert_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+
+@dataclass
+class _BatchJob:
+    label: str
+    number: int
+    ids: List[str]
+    documents: List[Document]
+
+
+def _run_pipeline(
+    pending_by_label: Dict[str, List[Tuple[str, Document]]],
+    upsert: Callable[[_BatchJob, List[List[float]]], None],
+    *,
+    batch_size: int,
+    on_batch: Optional[Callable[[LabelProgress], None]] = None,
+    embed_workers: Optional[int] = None,
+    upsert_workers: Optional[int] = None,
+) -> Dict[str, LabelProgress]:
+    """
+    Chạy embedding và upsert song song cho mọi label.
+
+    Batch nào embed xong được đẩy ngay sang nhóm worker upsert, nên thời gian chờ mạng
+    của embedding và upsert chồng lên nhau thay vì nối tiếp từng batch một.
+    Số worker mỗi tầng bị giới hạn bởi SYNC_EMBED_WORKERS / SYNC_UPSERT_WORKERS.
+    """
+    progress: Dict[str, LabelProgress] = {}
+    jobs: List[_BatchJob] = []
+    for label, pending in pending_by_label.items():
+        label_jobs = [
+            _BatchJob(
+                label=label,
+                number=number,
+                ids=[doc_id for doc_id, _ in batch],
+                documents=[document for _, document in batch],
+            )
+            for number, (_, batch) in enumerate(_batched(pending, batch_size), start=1)
+        ]
+        progress[label] = LabelProgress(
+            label=label, documents=len(pending), batches_total=len(label_jobs)
+        )
+        jobs.extend(label_jobs)
+    if not jobs:
+        return progress
+
+    def embed(job: _BatchJob) -> List[List[float]]:
+        started = time.perf_counter()
+        texts = [doc.page_content for doc in job.documents]
+        # Sync chạy nền: nhường quota OpenAI cho lượt chơi và khởi tạo session. Scheduler đã
+        # tự xếp lại batch gặp 429/lỗi tạm thời nên không bọc thêm `_with_backoff`.
+        vectors = get_llm_scheduler().run(
+            lambda: embeddings.embed_documents(texts),
+            tokens=sum(estimate_tokens(text) for text in texts),
+            priority=PRIORITY_BACKGROUND,
+        )
+        label_progress = progress[job.label]
+        with label_progress._lock:
+            label_progress.embed_seconds += time.perf_counter() - started
+        return vectors
+
+    def store(job: _BatchJob, vectors: List[List[float]]) -> None:
+        started = time.perf_counter()
+        _with_backoff(
+            lambda: upsert(job, vectors),
+            progress[job.label],
+            f"upsert batch {job.number}",
+        )
+        label_progress = progress[job.label]
+        with label_progress._lock:
+            label_progress.upsert_seconds += time.perf_counter() - started
+            label_progress.batches_done += 1
+            label_progress.upserted += len(job.ids)
+        logger.info(
+            f"[{job.label}] batch {job.number}/{label_progress.batches_total} xong "
+            f"({len(job.ids)} docs, {label_progress.upserted}/{label_progress.documents})"
+        )
+        if on_batch is not None:
+            on_batch(label_progress)
+
+    embed_pool = ThreadPoolExecutor(max_workers=embed_workers or SYNC_EMBED_WORKERS)
+    upsert_pool = ThreadPoolExecutor(max_workers=upsert_workers or SYNC_UPSERT_WORKERS)
+    try:
+        embed_futures = {embed_pool.submit(embed, job): job for job in jobs}
+        upsert_futures = []
+        for future in as_completed(embed_futures):
+            upsert_futures.append(upsert_pool.submit(store, embed_futures[future], future.result()))
+        done, _ = wait(upsert_futures, return_when=FIRST_EXCEPTION)
+        for future in done:
+            future.result()
+    finally:
+        # Khi một batch lỗi hẳn, hủy các batch chưa chạy thay vì tiếp tục gọi API.
+        embed_pool.shutdown(wait=True, cancel_futures=True)
+        upsert_pool.shutdown(wait=True, cancel_futures=True)
+    return progress
+
+
+def _with_backoff(
+    operation: Callable[[], Any],
+    progress: LabelProgress,
+    description: str,
+    *,
+    max_retries: int = SYNC_MAX_RETRIES,
+) -> Any:
+    """
+    Thử lại lỗi tạm thời với exponential backoff + jitter; hết lượt thì ném lỗi ra ngoài.
+    """
+    for attempt in range(1, max_retries + 1):
+        try:
+            return operation()
+        except TRANSIENT_ERRORS as exc:
+            if attempt == max_retries:
+                logger.error(f"[{progress.label}] {description} thất bại sau {attempt} lần: {exc}")
+                raise
+            delay = min(SYNC_RETRY_MAX_DELAY, SYNC_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+            delay += random.uniform(0, SYNC_RETRY_BASE_DELAY)
+            with progress._lock:
+                progress.retries += 1
+            logger.warning(
+                f"[{progress.label}] Lỗi tạm thời khi {description}: {exc}. "
+                f"Thử lại sau {delay:.1f}s ({attempt}/{max_retries})..."
+            )
+            time.sleep(delay)
+
+
 # ---------------------------------------------------------------------------- #
 #                           BUILD DOCUMENTS FROM MONGO                         #
 # ---------------------------------------------------------------------------- #
@@ -139,80 +532,18 @@ def _build_documents_from_mongo(case_id: str) -> Dict[str, List[Document]]:
 
 
 def _fetch_case_payload(case_id: str) -> Tuple[Dict, List[Dict], Dict]:
-    client = get_app_mongo_client()
-    if client is None:
-        raise RuntimeError("Không thể khởi tạo Mongo client để đọc dữ liệu case.")
-
-    settings = get_app_settings()
-    db = client[settings.mongo_db]
-
-    context = db.contexts.find_one({"case_id": case_id}, {"_id": 0})
+    try:
+        context, personas, skeleton = fetch_case_bundle(case_id).as_tuple()
+    except RuntimeError as exc:
+        raise RuntimeError("Không thể khởi tạo Mongo client để đọc dữ liệu case.") from exc
     if not context:
         raise ValueError(f"Không tìm thấy context cho case_id '{case_id}'.")
-
-    personas = list(db.personas.find({"case_id": case_id}, {"_id": 0}))
-    skeleton = db.skeletons.find_one({"case_id": case_id}, {"_id": 0})
     if not skeleton:
         raise ValueError(f"Không tìm thấy skeleton cho case_id '{case_id}'.")
 
     return context, personas, skeleton
 
 
-# ---------------------------------------------------------------------------- #
-#                         UPSERT DOCUMENTS TO PINECONE                         #
-# ---------------------------------------------------------------------------- #
-
-def _upsert_documents(
-    *,
-    index,
-    namespace: str,
-    label: str,
-    documents: List[Document],
-    batch_size: int,
-    max_retries: int = 3,
-    retry_delay: float = 2.5,
-) -> int:
-    """
-    Upsert các Document lên Pinecone một cách an toàn, có retry và logging.
-    Dùng PineconeVectorStore.add_documents() để đảm bảo đồng bộ embedding và metadata.
-    """
-    total_inserted = 0
-    if not documents:
-        return 0
-
-    vector_store = PineconeVectorStore(
-        index=index,
-        embedding=embeddings,
-        namespace=namespace,
-        text_key=PINECONE_TEXT_KEY,
-    )
-
-    for offset, batch in _batched(documents, batch_size):
-        for attempt in range(1, max_retries + 1):
-            try:
-                logger.info(
-                    f"[{label}] Upserting batch {offset // batch_size + 1} "
-                    f"({len(batch)} docs) vào namespace '{namespace}'..."
-                )
-                vector_store.add_documents(batch)
-                total_inserted += len(batch)
-                break
-            except ServiceException as e:
-                logger.warning(
-                    f"Lỗi mạng khi upsert batch {offset // batch_size + 1}: {e}. "
-                    f"Thử lại ({attempt}/{max_retries})..."
-                )
-                time.sleep(retry_delay)
-            except Exception as e:
-                logger.error(
-                    f"Lỗi nghiêm trọng khi upsert batch {offset // batch_size + 1}: {e}",
-                    exc_info=True,
-                )
-                raise
-    logger.info(f"✅ Đã upsert {total_inserted} vectors cho '{label}' (namespace={namespace})")
-    return total_inserted
-
-
 def _batched(items: List[Any], size: int) -> Iterable[Tuple[int, List[Any]]]:
     if size <= 0:
         size = BATCH_SIZE_DEFAULT
@@ -224,9 +555,14 @@ def _batched(items: List[Any], size: int) -> Iterable[Tuple[int, List[Any]]]:
 #                           LOAD EXISTING INDICES                              #
 # ---------------------------------------------------------------------------- #
 
-def load_indices():
-    _ensure_configured()
-    namespace = CASE_ID or DEFAULT_NAMESPACE
+def load_indices(case_id: str):
+    """
+    Store scene/persona/policy của một case; `case_id` là namespace Pinecone (hoặc thư mục local).
+    Namespace được truyền theo từng lời gọi vì graph của nhiều case có thể được dựng song song.
+    """
+    namespace = case_id or DEFAULT_NAMESPACE
+    if get_semantic_backend() == SEMANTIC_BACKEND_LOCAL:
+        return tuple(_load_local_vectorstore(namespace, label) for label in SEMANTIC_LABELS)
     scene_store = _load_pinecone_vectorstore(PINECONE_SCENE_INDEX, namespace, "scene")
     persona_store = _load_pinecone_vectorstore(PINECONE_PERSONA_INDEX, namespace, "persona")
     policy_store = _load_pinecone_vectorstore(PINECONE_POLICY_INDEX, namespace, "policy")
@@ -249,6 +585,15 @@ def _load_pinecone_vectorstore(index_name: str, namespace: str, label: str):
     )
 
 
+def _load_local_vectorstore(case_id: str, label: str) -> LocalVectorStore:
+    settings = get_app_settings()
+    return LocalVectorStore(
+        embeddings,
+        directory=settings.local_vector_dir / case_id / label,
+        search_mode=settings.local_vector_search,
+    )
+
+
 # ---------------------------------------------------------------------------- #
 #                            PINECONE CONNECTION                               #
 # ---------------------------------------------------------------------------- #
@@ -271,7 +616,7 @@ def _get_pinecone_client() -> Pinecone:
 # ---------------------------------------------------------------------------- #
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Đồng bộ dữ liệu case lên Pinecone.")
+    parser = argparse.ArgumentParser(description="Đồng bộ semantic memory của case (Pinecone hoặc local).")
     parser.add_argument("case_id", help="Case ID cần sync semantic memory.")
     parser.add_argument(
         "--batch-size",
@@ -282,14 +627,13 @@ if __name__ == "__main__":
     parser.add_argument(
         "--force",
         action="store_true",
-        help="Xóa namespace cũ trước khi upsert (delete_all).",
+        help="Upsert lại toàn bộ documents thay vì chỉ phần thay đổi.",
     )
     args = parser.parse_args()
 
-    configure_paths(args.case_id)
-    result = sync_case_to_pinecone(
+    result = sync_semantic_memory(
         args.case_id,
         batch_size=args.batch_size,
         force_rebuild=args.force,
     )
-    print(f"✅ Đồng bộ Pinecone thành công cho case '{args.case_id}': {result}")
+    print(f"✅ Đồng bộ semantic memory ({get_semantic_backend()}) thành công cho case '{args.case_id}': {result}")